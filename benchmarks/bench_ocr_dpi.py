@@ -0,0 +1,70 @@
+"""
+Latency / accuracy trade-off of the OCR detection and recognition resolutions.
+
+Runs OcrExtractor over a folder of scanned PDFs once per (detection_dpi, recognition_dpi)
+setting and reports the mean and p95 time per document and the accuracy against a
+ground-truth CSV (`filename,date` with dates as dd/mm/yyyy), or the agreement with the
+first setting when no ground truth is given.
+
+    python benchmarks/bench_ocr_dpi.py test-data/scanned --settings 300:300,200:300,150:300
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "source", "models"))
+
+from image_pdf import OcrExtractor
+
+
+def load_ground_truth(csv_path):
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return {row["filename"]: (row["date"] or None) for row in csv.DictReader(f)}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    index = min(int(round(q / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Folder of scanned PDF files")
+    parser.add_argument("--settings", default="300:300,200:300,150:300",
+                        help="Comma separated detection_dpi:recognition_dpi pairs")
+    parser.add_argument("--ground-truth", help="CSV with filename,date columns")
+    parser.add_argument("--max-pages", type=int, default=10)
+    args = parser.parse_args()
+
+    files = sorted(f for f in os.listdir(args.folder) if f.lower().endswith(".pdf"))
+    if not files:
+        sys.exit(f"No PDF files in {args.folder}")
+    truth = load_ground_truth(args.ground_truth) if args.ground_truth else None
+    settings = [tuple(int(v) for v in pair.split(":")) for pair in args.settings.split(",")]
+
+    reference = None
+    print(f"{'det dpi':>8} {'rec dpi':>8} {'mean s':>8} {'p95 s':>8} {'accuracy':>9}")
+    for detection_dpi, recognition_dpi in settings:
+        extractor = OcrExtractor(max_pages=args.max_pages, pool_workers=0,
+                                 detection_dpi=detection_dpi, recognition_dpi=recognition_dpi)
+        results, latencies = {}, []
+        for name in files:
+            start = time.perf_counter()
+            results[name] = extractor.extract(os.path.join(args.folder, name))
+            latencies.append(time.perf_counter() - start)
+
+        expected = truth if truth is not None else (reference or results)
+        correct = sum(1 for name in files if results[name] == expected.get(name))
+        reference = reference or results
+        print(f"{detection_dpi:>8} {recognition_dpi:>8} "
+              f"{sum(latencies) / len(latencies):>8.2f} {percentile(latencies, 95):>8.2f} "
+              f"{correct / len(files):>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
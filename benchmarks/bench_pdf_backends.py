@@ -0,0 +1,87 @@
+"""
+Throughput and date agreement of the PDF text backends (pdf.text_backend in config.yaml).
+
+Runs PdfExtractor over a folder of text PDFs once per installed backend and reports
+pages per second for the text extraction alone, counted over every page read, with the
+pages that gave no text in a column of their own, the mean time per document for the
+date extraction, and how often the date agrees with a ground-truth CSV (`filename,date`
+with dates as dd/mm/yyyy), or with PyPDF2 when no ground truth is given.
+
+    python benchmarks/bench_pdf_backends.py test-data/text --max-pages 10
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "source", "models"))
+
+from pdf import PdfExtractor
+from pdf_backends import available_backends, DEFAULT_BACKEND
+
+
+def load_ground_truth(csv_path):
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return {row["filename"]: (row["date"] or None) for row in csv.DictReader(f)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Folder of text PDF files")
+    parser.add_argument("--backends", help="Comma separated backends, all installed ones by default")
+    parser.add_argument("--ground-truth", help="CSV with filename,date columns")
+    parser.add_argument("--max-pages", type=int, default=10)
+    args = parser.parse_args()
+
+    files = sorted(f for f in os.listdir(args.folder) if f.lower().endswith(".pdf"))
+    if not files:
+        sys.exit(f"No PDF files in {args.folder}")
+    truth = load_ground_truth(args.ground_truth) if args.ground_truth else None
+    backends = args.backends.split(",") if args.backends else available_backends()
+    # PyPDF2 first, it is the reference when there is no ground truth
+    backends.sort(key=lambda name: name != DEFAULT_BACKEND)
+
+    reference = None
+    print(f"{'backend':>10} {'pages/s':>9} {'empty':>6} {'doc mean s':>11} {'agreement':>10} {'errors':>7}")
+    for name in backends:
+        extractor = PdfExtractor(text_backend=name)
+        if extractor.backend.name != name:
+            print(f"{name:>10} not installed")
+            continue
+
+        # raw text extraction throughput, every page up to max_pages, empty ones included
+        pages, empty, errors = 0, 0, 0
+        start = time.perf_counter()
+        for file in files:
+            try:
+                with extractor.open_document(os.path.join(args.folder, file)) as document:
+                    for i in range(min(args.max_pages, document.num_pages)):
+                        pages += 1
+                        if not document.page_text(i):
+                            empty += 1
+            except Exception:
+                errors += 1
+        text_time = time.perf_counter() - start
+
+        # date extraction as the pipeline runs it (stops at the first date line)
+        results = {}
+        start = time.perf_counter()
+        for file in files:
+            try:
+                results[file] = extractor.extract(os.path.join(args.folder, file), args.max_pages)
+            except Exception:
+                results[file] = None
+        date_time = time.perf_counter() - start
+
+        expected = truth if truth is not None else (reference or results)
+        agree = sum(1 for file in files if results[file] == expected.get(file))
+        reference = reference or results
+        print(f"{name:>10} {pages / text_time:>9.1f} {empty:>6} {date_time / len(files):>11.4f} "
+              f"{agree / len(files):>10.1%} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+End-to-end benchmark of PipelineExtractor on a synthetic corpus with known dates.
+
+Generates the corpus (see corpus.py) if it does not exist yet, then runs every kind of
+document (text PDFs, scanned PDFs, DOCX) through PipelineExtractor.extract_date, each kind
+in a fresh process, and reports per kind:
+
+- throughput (documents per second) and p50 / p95 latency
+- peak RSS of the process
+- accuracy against the ground truth
+- the paths taken (text, ocr, fallback, docx) and the mean time per pipeline stage
+
+The results are compared with the thresholds in benchmarks/thresholds.yaml and the script
+exits with status 1 when one of them is not met, so it can gate a CI job. Only the kinds
+with limits in the file are gated: scanned_pdf has none, see THRESHOLDS_HEADER.
+
+    python benchmarks/bench_pipeline.py --count 20
+    python benchmarks/bench_pipeline.py --kinds text_pdf,docx --json results.json
+    python benchmarks/bench_pipeline.py --write-thresholds --repeat 5   # store the current results as the new baseline
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "source", "models"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import KINDS, generate_corpus, load_corpus
+
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.yaml")
+
+# Margins applied by --write-thresholds to the measured results
+LATENCY_MARGIN = 1.5
+THROUGHPUT_MARGIN = 0.67
+RSS_MARGIN = 1.25
+ACCURACY_MARGIN = 0.02
+
+THRESHOLDS_HEADER = """\
+# Regression limits checked by bench_pipeline.py, per kind of document, on the default
+# corpus (--count 20 --seed 7) and CPU only. Written by --write-thresholds from the results
+# of the reference machine (with the margins of thresholds_from): after an intended change,
+# or on a new CI machine, run it again there instead of editing the limits by hand.
+# scanned_pdf is not gated: its run needs the PaddleOCR and VietOCR models, which the CI
+# machine does not have, and its throughput on CPU depends on the model versions more than
+# on this code. Its results are reported but not checked until limits are written for it
+# with --kinds scanned_pdf --write-thresholds on a machine with the models.
+"""
+
+
+def percentile(values, q):
+    values = sorted(values)
+    index = min(int(round(q / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def peak_rss_mb():
+    try:
+        # ru_maxrss is kept across exec on Linux: a spawned process would report its parent's peak
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_kind(folder, rows, max_pdf_pages, raster_cache):
+    """
+    Run one kind of document through a new PipelineExtractor. Runs in its own process
+    so the peak RSS is that of this kind only.
+
+    :return: Dict of results.
+    """
+    os.chdir(ROOT)  # config/config.yaml is read relative to the repo root
+    from pipeline import PipelineExtractor
+    from source.timing import collect
+
+    start = time.perf_counter()
+    pipeline = PipelineExtractor(max_pdf_pages=max_pdf_pages, ocr_pool_workers=0)
+    if not raster_cache:
+        # measure rendering, not cache reads from a previous run
+        pipeline.ocr_extractor.raster_cache = None
+    # warm-up: models are loaded on first use, keep that out of the latencies
+    pipeline.extract_date(os.path.join(folder, rows[0]["filename"]))
+    startup_seconds = time.perf_counter() - start
+
+    latencies, correct, paths, stages, misses = [], 0, {}, {}, []
+    run_start = time.perf_counter()
+    for row in rows:
+        with collect() as timings:
+            doc_start = time.perf_counter()
+            date = pipeline.extract_date(os.path.join(folder, row["filename"]))
+            latencies.append(time.perf_counter() - doc_start)
+        expected = row["date"] or None
+        if date == expected:
+            correct += 1
+        else:
+            misses.append({"filename": row["filename"], "format": row["format"], "expected": expected, "got": date})
+        path = timings.path or "none"
+        paths[path] = paths.get(path, 0) + 1
+        for stage, seconds in timings.to_dict().items():
+            stages[stage] = stages.get(stage, 0.0) + seconds
+    run_seconds = time.perf_counter() - run_start
+
+    return {
+        "documents": len(rows),
+        "docs_per_second": round(len(rows) / run_seconds, 3),
+        "p50_seconds": round(percentile(latencies, 50), 4),
+        "p95_seconds": round(percentile(latencies, 95), 4),
+        "peak_rss_mb": peak_rss_mb(),
+        "accuracy": round(correct / len(rows), 4),
+        "startup_seconds": round(startup_seconds, 2),
+        "paths": paths,
+        "stage_mean_seconds": {stage: round(seconds / len(rows), 4) for stage, seconds in stages.items()},
+        "misses": misses,
+    }
+
+
+def check_thresholds(results, thresholds):
+    """
+    :return: List of failure messages, empty if every threshold is met.
+    """
+    failures = []
+    for kind, result in results.items():
+        limits = thresholds.get(kind) or {}
+        checks = [
+            ("min_accuracy", "accuracy", lambda value, limit: value >= limit),
+            ("min_docs_per_second", "docs_per_second", lambda value, limit: value >= limit),
+            ("max_p50_seconds", "p50_seconds", lambda value, limit: value <= limit),
+            ("max_p95_seconds", "p95_seconds", lambda value, limit: value <= limit),
+            ("max_peak_rss_mb", "peak_rss_mb", lambda value, limit: value <= limit),
+        ]
+        for limit_name, metric, passes in checks:
+            limit = limits.get(limit_name)
+            value = result.get(metric)
+            if limit is None or value is None:
+                continue
+            if not passes(value, limit):
+                failures.append(f"{kind}: {metric} {value} is past {limit_name} {limit}")
+    return failures
+
+
+def worst_of(runs):
+    """
+    One result made of the worst value of every metric over several runs of a kind.
+    """
+    result = dict(runs[0])
+    result["docs_per_second"] = min(run["docs_per_second"] for run in runs)
+    result["accuracy"] = min(run["accuracy"] for run in runs)
+    for metric in ("p50_seconds", "p95_seconds", "peak_rss_mb"):
+        values = [run[metric] for run in runs if run[metric] is not None]
+        result[metric] = max(values) if values else None
+    return result
+
+
+def significant(value, digits=3):
+    return float(f"{value:.{digits}g}")
+
+
+def thresholds_from(results):
+    """
+    Thresholds a little looser than the given results, for --write-thresholds.
+    """
+    thresholds = {}
+    for kind, result in results.items():
+        thresholds[kind] = {
+            "min_accuracy": round(max(result["accuracy"] - ACCURACY_MARGIN, 0), 3),
+            "min_docs_per_second": significant(result["docs_per_second"] * THROUGHPUT_MARGIN),
+            "max_p50_seconds": significant(result["p50_seconds"] * LATENCY_MARGIN),
+            "max_p95_seconds": significant(result["p95_seconds"] * LATENCY_MARGIN),
+        }
+        if result["peak_rss_mb"] is not None:
+            thresholds[kind]["max_peak_rss_mb"] = round(result["peak_rss_mb"] * RSS_MARGIN)
+    return thresholds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Corpus folder, generated there if it has no ground_truth.csv. "
+                                         "Defaults to ./cache/bench_corpus/seed<seed>_n<count>")
+    parser.add_argument("--count", type=int, default=20, help="Documents per kind when generating the corpus")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--font", help="TTF font with Vietnamese glyphs for the scanned pages")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="Comma separated kinds to run")
+    parser.add_argument("--max-pdf-pages", type=int, default=10)
+    parser.add_argument("--raster-cache", action="store_true", help="Keep the raster cache of config.yaml enabled")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS)
+    parser.add_argument("--write-thresholds", action="store_true",
+                        help="Write the results (with margins) to --thresholds instead of checking them")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Run every kind this many times and keep the worst value of each metric")
+    parser.add_argument("--json", help="Also write the full results to this file")
+    args = parser.parse_args()
+
+    kinds = args.kinds.split(",")
+    folder = args.corpus or os.path.join(ROOT, "cache", "bench_corpus", f"seed{args.seed}_n{args.count}")
+    if not os.path.exists(os.path.join(folder, "ground_truth.csv")):
+        print(f"Generating corpus in {folder}")
+        generate_corpus(folder, args.count, args.seed, KINDS, args.font)
+    rows = load_corpus(folder)
+
+    results = {}
+    for kind in kinds:
+        kind_rows = [row for row in rows if row["kind"] == kind]
+        if not kind_rows:
+            print(f"No {kind} documents in {folder}")
+            continue
+        runs = []
+        for _ in range(args.repeat):
+            # a fresh process per run: separate peak RSS, models loaded only where needed
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                runs.append(pool.submit(run_kind, folder, kind_rows, args.max_pdf_pages, args.raster_cache).result())
+        results[kind] = worst_of(runs)
+
+    print(f"{'kind':>12} {'docs':>5} {'docs/s':>8} {'p50 s':>8} {'p95 s':>8} {'rss MB':>8} {'accuracy':>9}  paths")
+    for kind, result in results.items():
+        rss = f"{result['peak_rss_mb']:.0f}" if result["peak_rss_mb"] is not None else "n/a"
+        print(f"{kind:>12} {result['documents']:>5} {result['docs_per_second']:>8.2f} "
+              f"{result['p50_seconds']:>8.3f} {result['p95_seconds']:>8.3f} {rss:>8} "
+              f"{result['accuracy']:>9.1%}  {result['paths']}")
+    for kind, result in results.items():
+        stages = ", ".join(f"{stage} {seconds * 1000:.1f}ms" for stage, seconds in
+                           sorted(result["stage_mean_seconds"].items(), key=lambda item: -item[1]))
+        print(f"{kind:>12} mean per stage: {stages}")
+        for miss in result["misses"][:5]:
+            print(f"{'':>12} miss {miss['filename']} ({miss['format']}): expected {miss['expected']}, got {miss['got']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if args.write_thresholds:
+        thresholds = {}
+        if os.path.exists(args.thresholds):
+            with open(args.thresholds, "r", encoding="utf-8") as f:
+                thresholds = yaml.safe_load(f) or {}
+        thresholds.update(thresholds_from(results))
+        with open(args.thresholds, "w", encoding="utf-8") as f:
+            f.write(THRESHOLDS_HEADER)
+            f.write(f"# python {' '.join(sys.argv)}\n"
+                    f"# {os.cpu_count()} CPU, Python {platform.python_version()}, {platform.system()}\n")
+            yaml.safe_dump(thresholds, f, sort_keys=False)
+        print(f"Wrote thresholds to {args.thresholds}")
+        return
+
+    if not os.path.exists(args.thresholds):
+        print(f"No thresholds file at {args.thresholds}, nothing to check")
+        return
+    with open(args.thresholds, "r", encoding="utf-8") as f:
+        thresholds = yaml.safe_load(f) or {}
+    for kind in results:
+        if not thresholds.get(kind):
+            print(f"NOT GATED {kind}: no limits in {args.thresholds}")
+    failures = check_thresholds(results, thresholds)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if failures:
+        sys.exit(1)
+    print("All thresholds met")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Accuracy parity of the ONNX Runtime VietOCR recognizer with the PyTorch predictor.
+
+Runs both backends over a fixture set of line images and reports how often they read the
+same text, their character error rate relative to each other (and to the labels, if any),
+how often the date parsed from their texts agrees, and the time per line on CPU. Exits
+with status 1 when the ONNX backend is not close enough to switch `ocr.recognizer` to onnx.
+
+The fixture set is a folder of line images with an optional labels.csv (filename,text).
+Without --fixtures, date lines are rendered with noise into ./cache/vietocr_fixtures
+(better: crops of real scans, e.g. those kept by crop_images in config.yaml).
+
+    python source/models/vietocr_onnx.py --quantize
+    python benchmarks/check_vietocr_onnx.py --count 200
+    python benchmarks/check_vietocr_onnx.py --fixtures test-data/date_lines --float
+"""
+import os
+import sys
+import csv
+import time
+import random
+import argparse
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "source", "models"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import DATE_FORMATS, fold, load_font
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def cer(reference, hypothesis):
+    return edit_distance(reference, hypothesis) / max(len(reference), 1)
+
+
+def generate_fixtures(folder, count, seed, font_path=None):
+    """
+    Render `count` date lines, one image per line, with labels.csv.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(count):
+        font, vietnamese_font = load_font(font_path, rng.randint(22, 34))
+        day, month, year = rng.randint(1, 28), rng.randint(1, 12), rng.randint(2015, 2025)
+        template = rng.choice(list(DATE_FORMATS.values()))
+        text = template.format(d=day, m=month, dd=f"{day:02d}", mm=f"{month:02d}", y=year)
+        text = text if vietnamese_font else fold(text)
+
+        left, top, right, bottom = font.getbbox(text)
+        image = Image.new("L", (right + 20, bottom - top + 16), 255)
+        ImageDraw.Draw(image).text((10, 8 - top), text, fill=0, font=font)
+        image = image.rotate(rng.uniform(-1.0, 1.0), resample=Image.BICUBIC, expand=False, fillcolor=255)
+        pixels = np.asarray(image, dtype=np.float32) + np_rng.normal(0, 10, (image.height, image.width))
+        filename = f"line_{i:04d}.png"
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(os.path.join(folder, filename))
+        rows.append({"filename": filename, "text": text})
+
+    with open(os.path.join(folder, "labels.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["filename", "text"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def load_fixtures(folder):
+    """
+    :return: List of (filename, PIL image, label or None).
+    """
+    labels = {}
+    labels_path = os.path.join(folder, "labels.csv")
+    if os.path.exists(labels_path):
+        with open(labels_path, newline="", encoding="utf-8") as f:
+            labels = {row["filename"]: row["text"] for row in csv.DictReader(f)}
+    fixtures = []
+    for filename in sorted(os.listdir(folder)):
+        if filename.lower().endswith(IMAGE_EXTENSIONS):
+            image = Image.open(os.path.join(folder, filename)).convert("RGB")
+            fixtures.append((filename, image, labels.get(filename)))
+    return fixtures
+
+
+def run(recognizer, images, batch_size):
+    """
+    :return: Tuple (texts, seconds per line one by one, seconds per line in batches).
+    """
+    start = time.perf_counter()
+    texts = [recognizer.predict(image) for image in images]
+    single = (time.perf_counter() - start) / len(images)
+
+    start = time.perf_counter()
+    batched = []
+    for i in range(0, len(images), batch_size):
+        batched += recognizer.predict_batch(images[i:i + batch_size])
+    batch = (time.perf_counter() - start) / len(images)
+    return texts, single, batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="Folder of line images with an optional labels.csv")
+    parser.add_argument("--count", type=int, default=100, help="Lines to render when no --fixtures is given")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--font", help="TTF font with Vietnamese glyphs for the rendered lines")
+    parser.add_argument("--onnx-path", default=os.path.join(ROOT, "source", "weights", "vietocr_onnx"))
+    parser.add_argument("--float", action="store_true", help="Check the float export, not the int8 parts")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads of both backends")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--min-date-agreement", type=float, default=1.0,
+                        help="Minimum share of lines whose parsed date is the same with both backends")
+    parser.add_argument("--max-cer", type=float, default=0.01,
+                        help="Maximum character error rate of ONNX against PyTorch")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)  # config/config.yaml and the weights path are relative to the repo root
+    from ocr import build_torch_vietocr
+    from vietocr_onnx import OnnxRecognizer
+    from date_regex import DateRegexExtractor
+
+    folder = args.fixtures or os.path.join(ROOT, "cache", "vietocr_fixtures", f"seed{args.seed}_n{args.count}")
+    if not args.fixtures and not os.path.exists(os.path.join(folder, "labels.csv")):
+        print(f"Rendering {args.count} date lines in {folder}")
+        generate_fixtures(folder, args.count, args.seed, args.font)
+    fixtures = load_fixtures(folder)
+    if not fixtures:
+        sys.exit(f"No line images in {folder}")
+    images = [image for _, image, _ in fixtures]
+
+    backends = {
+        "torch": build_torch_vietocr(device="cpu", threads=args.threads),
+        "onnx": OnnxRecognizer(args.onnx_path, quantized=not args.float, threads=args.threads),
+    }
+    print(f"{len(images)} lines from {folder}, ONNX parts: {backends['onnx'].parts}")
+
+    results = {}
+    for name, recognizer in backends.items():
+        recognizer.predict(images[0])  # warm-up
+        results[name] = run(recognizer, images, args.batch_size)
+
+    regex = DateRegexExtractor()
+    torch_texts, onnx_texts = results["torch"][0], results["onnx"][0]
+    same_text = sum(a == b for a, b in zip(torch_texts, onnx_texts)) / len(images)
+    relative_cer = float(np.mean([cer(a, b) for a, b in zip(torch_texts, onnx_texts)]))
+    date_agreement = sum(regex.extract_and_format_date(a) == regex.extract_and_format_date(b)
+                         for a, b in zip(torch_texts, onnx_texts)) / len(images)
+
+    labelled = [(i, label) for i, (_, _, label) in enumerate(fixtures) if label is not None]
+    print(f"{'backend':>8} {'ms/line':>8} {'ms/line batched':>16} {'CER vs labels':>14}")
+    for name, (texts, single, batch) in results.items():
+        label_cer = f"{np.mean([cer(label, texts[i]) for i, label in labelled]):.4f}" if labelled else "n/a"
+        print(f"{name:>8} {single * 1000:>8.1f} {batch * 1000:>16.1f} {label_cer:>14}")
+    speedup = results["torch"][1] / results["onnx"][1]
+    print(f"ONNX vs PyTorch: same text {same_text:.1%}, CER {relative_cer:.4f}, "
+          f"same date {date_agreement:.1%}, {speedup:.2f}x faster per line")
+
+    differences = [(filename, a, b) for (filename, _, _), a, b in zip(fixtures, torch_texts, onnx_texts) if a != b]
+    for filename, a, b in differences[:20]:
+        print(f"  {filename}: torch {a!r} / onnx {b!r}")
+
+    failures = []
+    if date_agreement < args.min_date_agreement:
+        failures.append(f"date agreement {date_agreement:.1%} is below {args.min_date_agreement:.1%}")
+    if relative_cer > args.max_cer:
+        failures.append(f"CER against PyTorch {relative_cer:.4f} is above {args.max_cer}")
+    for failure in failures:
+        print(f"PARITY FAILED: {failure}")
+    if failures:
+        sys.exit(1)
+    print("ONNX backend matches PyTorch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Synthetic contract corpus with known dates, for bench_pipeline.py.
+
+Generates three kinds of documents, each with the signing date written in one of the
+formats the extractor understands (or no date at all, ~10%), on the first or the last page:
+
+- text_pdf:    PDFs with a text layer (Vietnamese text through a ToUnicode map)
+- scanned_pdf: pages rendered to images with noise and a slight skew, saved as image-only PDFs
+- docx:        DOCX files, the date line in a paragraph or in a table cell
+
+and a ground_truth.csv (filename,kind,format,date with dates as dd/mm/yyyy). The same
+seed always gives the same corpus.
+
+    python benchmarks/corpus.py ./cache/bench_corpus --count 20 --seed 7
+"""
+import os
+import csv
+import random
+import argparse
+import datetime
+import unicodedata
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from docx import Document
+
+KINDS = ("text_pdf", "scanned_pdf", "docx")
+
+# How the signing date is written, filled with (day, month, year)
+DATE_FORMATS = {
+    "homnay_text": "Hôm nay, ngày {d} tháng {m} năm {y}, tại Hà Nội, chúng tôi gồm:",
+    "homnay_text_padded": "Hôm nay, ngày {dd} tháng {mm} năm {y}, tại văn phòng Bên A, chúng tôi gồm:",
+    "homnay_slash": "Hôm nay, ngày {dd}/{mm}/{y} tại trụ sở công ty, hai bên thống nhất:",
+    "ngayky_slash": "Ngày ký: {dd}/{mm}/{y}",
+    "ngayky_text": "Ngày ký: ngày {d} tháng {m} năm {y}",
+}
+NO_DATE = "none"
+
+HEADER = [
+    "CỘNG HÒA XÃ HỘI CHỦ NGHĨA VIỆT NAM",
+    "Độc lập - Tự do - Hạnh phúc",
+    "HỢP ĐỒNG CUNG CẤP DỊCH VỤ",
+    "Số: {number}/{year}/HĐDV",
+]
+CLAUSE_WORDS = (
+    "bên", "cung", "cấp", "dịch", "vụ", "thanh", "toán", "trách", "nhiệm", "hợp", "đồng", "điều",
+    "khoản", "giá", "trị", "thời", "hạn", "bảo", "hành", "nghiệm", "thu", "chi", "phí", "thuế",
+    "hóa", "đơn", "tài", "khoản", "quyền", "lợi", "nghĩa", "vụ", "vi", "phạm", "bồi", "thường",
+    "tranh", "chấp", "giải", "quyết", "hiệu", "lực", "phụ", "lục", "văn", "bản", "sửa", "đổi",
+)
+# Fonts with Vietnamese glyphs, for the scanned pages
+FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+)
+
+
+def fold(text):
+    """
+    Drop the diacritics, for fonts without Vietnamese glyphs.
+    """
+    text = text.replace("đ", "d").replace("Đ", "D")
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if unicodedata.category(c) != "Mn")
+
+
+def make_document(rng):
+    """
+    Text of one contract.
+
+    :return: Tuple (list of pages, each a list of lines, date format, date as dd/mm/yyyy or None).
+    """
+    year = rng.randint(2015, 2025)
+    date = datetime.date(year, 1, 1) + datetime.timedelta(days=rng.randint(0, 364))
+    date_format = NO_DATE if rng.random() < 0.1 else rng.choice(list(DATE_FORMATS))
+
+    def clause(number):
+        words = rng.choices(CLAUSE_WORDS, k=rng.randint(8, 14))
+        return f"{number}. " + " ".join(words).capitalize() + "."
+
+    num_pages = rng.randint(1, 4)
+    pages = []
+    for page_num in range(num_pages):
+        lines = []
+        if page_num == 0:
+            lines += [line.format(number=rng.randint(1, 999), year=year) for line in HEADER]
+        lines += [clause(f"Điều {page_num * 12 + i + 1}") for i in range(12)]
+        pages.append(lines)
+
+    expected = None
+    if date_format != NO_DATE:
+        line = DATE_FORMATS[date_format].format(
+            d=date.day, m=date.month, y=date.year, dd=f"{date.day:02d}", mm=f"{date.month:02d}"
+        )
+        if date_format.startswith("ngayky"):
+            # near the signatures, at the end of the last page
+            pages[-1].insert(len(pages[-1]) - 2, line)
+        else:
+            pages[0].insert(len(HEADER), line)
+        expected = date.strftime("%d/%m/%Y")
+    return pages, date_format, expected
+
+
+def _pdf(objects):
+    """
+    Serialize PDF objects (bytes, object 1 is the catalog) with their cross-reference table.
+    """
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def write_text_pdf(path, pages):
+    """
+    PDF with a text layer. The standard Helvetica font is used with a one byte encoding
+    built for the document and a ToUnicode map, so text extraction returns the
+    Vietnamese text (rendering shows other glyphs for the accented letters).
+    """
+    codes = {}
+    for lines in pages:
+        for ch in "".join(lines):
+            if ch not in codes:
+                if 32 <= ord(ch) < 127:
+                    codes[ch] = ord(ch)
+                else:
+                    codes[ch] = 128 + sum(1 for code in codes.values() if code >= 128)
+    if max(codes.values()) > 255:
+        raise ValueError("Too many distinct characters for a one byte encoding")
+
+    to_unicode = "\n".join(
+        ["/CIDInit /ProcSet findresource begin", "12 dict begin", "begincmap",
+         "/CMapName /Synthetic def", "/CMapType 2 def",
+         "1 begincodespacerange", "<00> <FF>", "endcodespacerange",
+         f"{len(codes)} beginbfchar"]
+        + [f"<{code:02X}> <{ord(ch):04X}>" for ch, code in codes.items()]
+        + ["endbfchar", "endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end"]
+    ).encode()
+
+    num_pages = len(pages)
+    font_id = 3 + 2 * num_pages
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(num_pages))}] "
+        f"/Count {num_pages} >>".encode(),
+    ]
+    for i, lines in enumerate(pages):
+        shown = " ".join(
+            "<" + "".join(f"{codes[ch]:02X}" for ch in line) + "> Tj T*" for line in lines
+        )
+        content = f"BT /F1 11 Tf 15 TL 50 790 Td {shown} ET".encode()
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+    objects.append(f"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /ToUnicode {font_id + 1} 0 R >>".encode())
+    objects.append(b"<< /Length %d >>\nstream\n" % len(to_unicode) + to_unicode + b"\nendstream")
+    with open(path, "wb") as f:
+        f.write(_pdf(objects))
+
+
+def load_font(font_path, size):
+    """
+    :return: Tuple (font, True if it has Vietnamese glyphs).
+    """
+    for candidate in ([font_path] if font_path else []) + list(FONT_CANDIDATES):
+        if candidate and os.path.exists(candidate):
+            return ImageFont.truetype(candidate, size), True
+    try:
+        return ImageFont.load_default(size=size), False
+    except TypeError:
+        # Pillow < 10.1, fixed size bitmap font
+        return ImageFont.load_default(), False
+
+
+def write_scanned_pdf(path, pages, rng, font, vietnamese_font, dpi=150):
+    """
+    Image-only PDF: every page drawn on an A4 canvas, then skewed and noised like a scan.
+    """
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    np_rng = np.random.default_rng(rng.randint(0, 2 ** 32 - 1))
+    images = []
+    for lines in pages:
+        image = Image.new("L", (width, height), 255)
+        draw = ImageDraw.Draw(image)
+        y = int(0.08 * height)
+        line_height = int(font.size * 1.6) if hasattr(font, "size") else 20
+        for line in lines:
+            draw.text((int(0.08 * width), y), line if vietnamese_font else fold(line), fill=0, font=font)
+            y += line_height
+        image = image.rotate(rng.uniform(-1.5, 1.5), resample=Image.BICUBIC, expand=False, fillcolor=255)
+        pixels = np.asarray(image, dtype=np.float32)
+        pixels += np_rng.normal(0, 12, pixels.shape)
+        # scattered dust
+        dust = np_rng.random(pixels.shape) < 0.0008
+        pixels[dust] = 0
+        images.append(Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)))
+    images[0].save(path, "PDF", resolution=dpi, save_all=True, append_images=images[1:])
+
+
+def write_docx(path, pages, rng):
+    """
+    DOCX with one paragraph per line. The date line goes in a table cell half of the time.
+    """
+    document = Document()
+    in_table = rng.random() < 0.5
+    for lines in pages:
+        for line in lines:
+            if in_table and (line.startswith("Hôm nay") or line.startswith("Ngày ký")):
+                document.add_table(rows=1, cols=1).cell(0, 0).text = line
+            else:
+                document.add_paragraph(line)
+    document.save(path)
+
+
+def generate_corpus(folder, count=20, seed=7, kinds=KINDS, font_path=None):
+    """
+    Write `count` documents of every kind to `folder`, and their ground truth.
+
+    :return: List of dicts (filename, kind, format, date), also written to ground_truth.csv.
+    """
+    os.makedirs(folder, exist_ok=True)
+    font, vietnamese_font = load_font(font_path, 26)
+    rows = []
+    for kind in kinds:
+        # one generator per kind, so a kind's documents do not depend on the other kinds
+        rng = random.Random(f"{seed}-{kind}")
+        for index in range(count):
+            pages, date_format, expected = make_document(rng)
+            if kind == "docx":
+                filename = f"{kind}_{index:04d}.docx"
+                write_docx(os.path.join(folder, filename), pages, rng)
+            elif kind == "text_pdf":
+                filename = f"{kind}_{index:04d}.pdf"
+                write_text_pdf(os.path.join(folder, filename), pages)
+            else:
+                filename = f"{kind}_{index:04d}.pdf"
+                write_scanned_pdf(os.path.join(folder, filename), pages, rng, font, vietnamese_font)
+            rows.append({"filename": filename, "kind": kind, "format": date_format, "date": expected or ""})
+
+    with open(os.path.join(folder, "ground_truth.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["filename", "kind", "format", "date"])
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+
+def load_corpus(folder):
+    with open(os.path.join(folder, "ground_truth.csv"), newline="", encoding="utf-8") as f:
+        return [dict(row) for row in csv.DictReader(f)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Output folder")
+    parser.add_argument("--count", type=int, default=20, help="Documents per kind")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--kinds", default=",".join(KINDS), help="Comma separated kinds")
+    parser.add_argument("--font", help="TTF font with Vietnamese glyphs for the scanned pages")
+    args = parser.parse_args()
+
+    rows = generate_corpus(args.folder, args.count, args.seed, args.kinds.split(","), args.font)
+    print(f"Wrote {len(rows)} documents to {args.folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+Extract the contract dates of a whole archive of documents, in parallel and resumable.
+
+Inputs are folders (searched recursively), zip archives and manifests (text files
+with one path per line). Every worker process builds its own PipelineExtractor.
+Results are appended to a JSONL or CSV file as they come, and the id of every
+document done without error to a checkpoint file, so running the same command
+again after a crash skips what is already done and retries the errors (the last
+row of a document id in the output is its result).
+
+A worker killed in the middle of a document (e.g. by the OOM killer on a large scan)
+takes down the process pool: the pool is started again and the documents it was
+working on are retried, up to --max-attempts times.
+
+    python bulk_extract.py /data/contracts /data/2019.zip --manifest todo.txt \\
+        --output results.jsonl --workers 8
+"""
+import os
+import csv
+import sys
+import json
+import time
+import shutil
+import zipfile
+import argparse
+import signal
+import tempfile
+import multiprocessing
+import multiprocessing.util
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from config.config import load_config
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".doc")
+OUTPUT_FIELDS = ["id", "file", "date", "status", "error", "seconds"]
+# separates an archive path from the document inside it in document ids
+ARCHIVE_SEPARATOR = "::"
+
+# Worker process state, created by _init_worker
+_pipeline = None
+_archives = {}
+
+
+def _init_worker(counter, max_pdf_pages, threads_per_worker, log_level, doc_base_port, temp_dir):
+    """
+    Runs once in every worker process: pin the thread count and build a pipeline.
+    """
+    global _pipeline
+    os.environ["OMP_NUM_THREADS"] = str(threads_per_worker)
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+
+    sys.path.insert(0, os.path.join(ROOT, "source", "models"))
+    import logging
+    import ocr
+    import image_pdf
+    from pipeline import PipelineExtractor
+    from doc_converter import DocConverterPool
+
+    for name in ("DateExtractor", "ScanPdfExtractor"):
+        logging.getLogger(name).setLevel(log_level)
+    # every document is seen once here: no raster cache (a ~26 MB write per scanned page)
+    # and no debug crops. This process's own copy of the config, read when the pipeline is built
+    image_pdf.raster_cache_config['enabled'] = False
+    image_pdf.crop_config['enabled'] = False
+
+    # own office process, port and profile per worker
+    doc_converter = DocConverterPool(
+        workers=1,
+        base_port=doc_base_port + 2 * index,
+        profile_dir=os.path.join(temp_dir, "office_profiles", f"bulk_{index}"),
+    )
+    _pipeline = PipelineExtractor(max_pdf_pages=max_pdf_pages, ocr_pool_workers=0, doc_converter=doc_converter)
+    # the office processes run in their own session and outlive this worker unless stopped:
+    # stop them when the worker exits after the pool shuts down, and on SIGTERM,
+    # which then exits through SystemExit so the finalizer still runs
+    multiprocessing.util.Finalize(None, doc_converter.shutdown, exitpriority=10)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    if _pipeline.ocr_enabled:
+        try:
+            ocr.load_models(cpu_threads=threads_per_worker, recognizer_threads=threads_per_worker)
+        except Exception as e:
+            # an initializer that raises breaks the whole pool: carry on, the models are
+            # loaded again on the first scanned document and fail that document
+            logging.getLogger("DateExtractor").error(f"Could not preload the OCR models: {e}")
+
+
+def _extract(task):
+    """
+    Extract one document in a worker process.
+
+    :param task: Tuple (document id, path, member of the archive at `path` or None, temp folder).
+    :return: Result row as a dict.
+    """
+    doc_id, path, member, temp_dir = task
+    start = time.time()
+    row = {"id": doc_id, "file": member or path, "date": None, "status": "not_found", "error": None}
+    temp_path = None
+    try:
+        if member is None:
+            if path.lower().endswith(".doc"):
+                # convert a copy: never write next to the archive's files (read-only mounts,
+                # a real X.docx beside X.doc)
+                fd, temp_path = tempfile.mkstemp(suffix=".doc", dir=temp_dir)
+                os.close(fd)
+                shutil.copyfile(path, temp_path)
+                date = _pipeline.extract_doc(temp_path)
+            else:
+                date = _pipeline.extract_date(path)
+        else:
+            archive = _archives.get(path)
+            if archive is None:
+                archive = _archives[path] = zipfile.ZipFile(path)
+            data = archive.read(member)
+            if member.lower().endswith(".doc"):
+                # the converters need a real file
+                fd, temp_path = tempfile.mkstemp(suffix=".doc", dir=temp_dir)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                date = _pipeline.extract_doc(temp_path)
+            else:
+                date = _pipeline.extract_date(os.path.basename(member), data)
+        if date:
+            row["date"] = date
+            row["status"] = "ok"
+    except Exception as e:
+        row["status"] = "error"
+        row["error"] = str(e)
+    finally:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+    row["seconds"] = round(time.time() - start, 3)
+    return row
+
+
+def is_supported(name):
+    return name.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def list_archive(path):
+    """
+    :return: List of (document id, archive path, member) for the documents of a zip archive.
+    """
+    with zipfile.ZipFile(path) as archive:
+        return [
+            (f"{path}{ARCHIVE_SEPARATOR}{member.filename}", path, member.filename)
+            for member in archive.infolist()
+            if not member.is_dir() and not member.filename.startswith("__MACOSX/") and is_supported(member.filename)
+        ]
+
+
+def list_inputs(paths, manifests):
+    """
+    Every document to process, in a stable order.
+
+    :return: List of (document id, path, member or None).
+    """
+    for manifest in manifests:
+        with open(manifest, "r", encoding="utf-8") as f:
+            paths = list(paths) + [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    documents = []
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    if name.lower().endswith(".zip"):
+                        documents.extend(list_archive(file_path))
+                    elif is_supported(name):
+                        documents.append((file_path, file_path, None))
+        elif path.lower().endswith(".zip"):
+            documents.extend(list_archive(path))
+        elif is_supported(path):
+            documents.append((path, path, None))
+        else:
+            print(f"Skipping unsupported input: {path}", file=sys.stderr)
+    return documents
+
+
+def read_checkpoint(checkpoint_path):
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+class ResultWriter:
+    """
+    Append result rows to a JSONL or CSV file, flushed after every row.
+    """
+
+    def __init__(self, path, output_format):
+        self.output_format = output_format
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", encoding="utf-8", newline="")
+        if output_format == "csv":
+            self.writer = csv.DictWriter(self.file, fieldnames=OUTPUT_FIELDS)
+            if new_file:
+                self.writer.writeheader()
+
+    def write(self, row):
+        if self.output_format == "csv":
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def start_pool(ctx, args, temp_dir):
+    counter = ctx.Value("i", 0)
+    return ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(counter, args.max_pdf_pages, args.threads_per_worker, args.log_level.upper(),
+                  args.doc_base_port, temp_dir),
+    )
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m{seconds % 60:02d}s"
+
+
+def main():
+    sys_config = load_config().get('sys', {})
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="*", help="Folders, zip archives or documents")
+    parser.add_argument("--manifest", action="append", default=[], help="File listing one input path per line")
+    parser.add_argument("--output", required=True, help="Result file, .jsonl or .csv")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Output format, from the extension by default")
+    parser.add_argument("--checkpoint", help="Checkpoint file, <output>.checkpoint by default")
+    parser.add_argument("--workers", type=int, default=max((os.cpu_count() or 2) // 2, 1))
+    parser.add_argument("--threads-per-worker", type=int, default=2)
+    parser.add_argument("--max-pdf-pages", type=int, default=sys_config.get('max_pdf_pages', 10))
+    parser.add_argument("--doc-base-port", type=int, default=2103,
+                        help="Office converter port of worker 0, worker i uses base + 2*i")
+    parser.add_argument("--max-attempts", type=int, default=2,
+                        help="Tries of a document whose worker process died, before it is reported as an error")
+    parser.add_argument("--progress-interval", type=float, default=10, help="Seconds between progress lines")
+    parser.add_argument("--log-level", default="WARNING", help="Pipeline log level in the workers")
+    args = parser.parse_args()
+
+    if not args.inputs and not args.manifest:
+        parser.error("give at least one input or --manifest")
+    output_format = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+
+    documents = list_inputs(args.inputs, args.manifest)
+    done = read_checkpoint(checkpoint_path)
+    todo = [document for document in documents if document[0] not in done]
+    print(f"{len(documents)} documents, {len(documents) - len(todo)} already done, {len(todo)} to process "
+          f"with {args.workers} workers", file=sys.stderr)
+    if not todo:
+        return
+
+    temp_root = sys_config.get('temp_extract_path') or None
+    if temp_root:
+        os.makedirs(temp_root, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix="bulk_extract_", dir=temp_root)
+    ctx = multiprocessing.get_context("spawn")  # torch and paddle do not survive a fork
+    pool = start_pool(ctx, args, temp_dir)
+    writer = ResultWriter(args.output, output_format)
+    checkpoint = open(checkpoint_path, "a", encoding="utf-8")
+
+    start = last_report = time.time()
+    processed = 0
+    counts = {}
+    queue = [(doc_id, path, member, temp_dir) for doc_id, path, member in reversed(todo)]
+    attempts = {}
+    running = {}
+    try:
+        while queue or running:
+            # a few documents ahead of the workers, not the whole archive in the pool's queue
+            while queue and len(running) < 2 * args.workers:
+                task = queue.pop()
+                running[pool.submit(_extract, task)] = task
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            broken = any(isinstance(future.exception(), BrokenProcessPool) for future in finished)
+            if broken:
+                # every document still running in the dead pool fails with it
+                finished, _ = wait(running)
+
+            rows = []
+            for future in finished:
+                task = running.pop(future)
+                try:
+                    rows.append(future.result())
+                except BrokenProcessPool:
+                    attempts[task[0]] = attempts.get(task[0], 0) + 1
+                    if attempts[task[0]] < args.max_attempts:
+                        queue.append(task)
+                    else:
+                        rows.append({"id": task[0], "file": task[2] or task[1], "date": None, "status": "error",
+                                     "error": "worker process died", "seconds": None})
+            if broken:
+                print("A worker process died, restarting the pool", file=sys.stderr)
+                pool.shutdown(wait=True)
+                pool = start_pool(ctx, args, temp_dir)
+
+            for row in rows:
+                # result first, checkpoint second: a crash in between re-does one document, never loses one.
+                # errors are not checkpointed, the next run retries them
+                writer.write(row)
+                if row["status"] != "error":
+                    checkpoint.write(row["id"] + "\n")
+                    checkpoint.flush()
+                processed += 1
+                counts[row["status"]] = counts.get(row["status"], 0) + 1
+
+            now = time.time()
+            if rows and (now - last_report >= args.progress_interval or processed == len(todo)):
+                last_report = now
+                rate = processed / (now - start)
+                eta = (len(todo) - processed) / rate if rate else 0
+                print(f"{processed}/{len(todo)} ({processed / len(todo):.1%}) - {rate:.2f} docs/s - "
+                      f"ETA {format_duration(eta)} - {counts}", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("Interrupted, run the same command again to resume", file=sys.stderr)
+        raise SystemExit(130)
+    finally:
+        # the workers got the same SIGINT on Ctrl+C, their finalizers stop the office processes
+        pool.shutdown(wait=True, cancel_futures=True)
+        writer.close()
+        checkpoint.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print(f"Done in {format_duration(time.time() - start)}: {counts}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,20 @@
+import copy
 import yaml
 from pathlib import Path
+from functools import lru_cache
 
-def load_config(path: str = "config/config.yaml") -> dict:
+
+@lru_cache(maxsize=None)
+def _read_config(path):
     p = Path(path)
     if not p.exists():
         raise FileNotFoundError(f"Config file not found: {path}")
     with open(p, 'r', encoding='utf-8') as f:
-        return yaml.safe_load(f)
\ No newline at end of file
+        return yaml.safe_load(f)
+
+
+def load_config(path: str = "config/config.yaml") -> dict:
+    """
+    The parsed config file. It is read once per process, every call gets its own copy.
+    """
+    return copy.deepcopy(_read_config(path))
@@ -9,8 +9,19 @@ APP_CONFIG = load_config()
 PROJECT_ROOT = Path(__file__).parent.parent
 LOG_DIR = PROJECT_ROOT / "logs"
 
+# Loggers already set up in this process
+_configured = set()
+
 def setup_logging(logger_name = "DateExtractor"):
-    """Configures logging based on settings in config.yaml."""
+    """
+    Configures logging based on settings in config.yaml.
+    Every module calls it, a logger is only set up by the first call.
+    """
+    logger = logging.getLogger(logger_name)
+    if logger_name in _configured:
+        return logger
+    _configured.add(logger_name)
+
     log_config = APP_CONFIG.get('logging', {})
     log_level_str = log_config.get('level', 'INFO').upper()
 
@@ -25,7 +36,6 @@ def setup_logging(logger_name = "DateExtractor"):
     log_format = "%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s"
     formatter = logging.Formatter(log_format)
 
-    logger = logging.getLogger(logger_name)
     logger.setLevel(log_level)
     logger.propagate = False
 
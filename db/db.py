@@ -1,4 +1,11 @@
+import os
+import json
+import time
+import queue
+import threading
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.extras import execute_values
 from config.config import load_config
 import logging
 
@@ -6,69 +13,135 @@ logger = logging.getLogger("DateExtractor")
 
 config = load_config()
 
+# Columns written by save_logs, in insert order
+LOG_COLUMNS = ("file_path", "request_time", "run_time", "status_code", "output", "extracted_date",
+               "paddle_time", "hand_cls_time", "hand_rec_time", "extraction_path", "stage_times")
+
+# Columns added after the first version of the table, created on existing tables at startup
+ADDED_COLUMNS = (
+    ("paddle_time", "REAL"),
+    ("hand_cls_time", "REAL"),
+    ("hand_rec_time", "REAL"),
+    ("extraction_path", "VARCHAR(20)"),
+    ("stage_times", "TEXT"),
+)
+
+_STOP = object()
+
 
 class Database_logs:
-    def __init__(self):
-        self.host = config['database_logs']["host"]
-        self.dbname = config['database_logs']["database"]
-        self.user = config['database_logs']["user"]
-        self.password = config['database_logs']["password"]
-        self.port = config['database_logs']["port"]
-        self.schema = config['database_logs']["schema"]
-        self.table = config['database_logs']["log_table"]
-        self.conn, self.cursor = self.connect()
-    
+    """
+    Request logs written to PostgreSQL in the background.
+
+    save_logs only puts the row on an in-process queue, it never waits for the
+    database. A writer thread takes rows off the queue and inserts them in batches
+    (multi-row INSERT) over a small connection pool. While the database is
+    unreachable, rows are appended to a local JSONL spill file, which is replayed
+    once the database answers again.
+    """
+
+    def __init__(self, batch_size=None, flush_interval=None, queue_size=None, spill_path=None):
+        """
+        :param batch_size: Maximum rows per INSERT. Defaults to `database_logs.batch_size` in config.yaml.
+        :param flush_interval: Seconds a partial batch waits for more rows. Defaults to `database_logs.flush_interval`.
+        :param queue_size: Rows kept in memory before save_logs spills to disk. Defaults to `database_logs.queue_size`.
+        :param spill_path: JSONL file for rows that could not be written. Defaults to `database_logs.spill_path`.
+        """
+        db_config = config['database_logs']
+        self.host = db_config["host"]
+        self.dbname = db_config["database"]
+        self.user = db_config["user"]
+        self.password = db_config["password"]
+        self.port = db_config["port"]
+        self.schema = db_config["schema"]
+        self.table = db_config["log_table"]
+        self.connect_timeout = int(db_config.get("time_out", 3))
+        self.pool_size = db_config.get("pool_size", 2)
+        self.retry_interval = db_config.get("retry_interval", 30)
+        self.batch_size = batch_size if batch_size is not None else db_config.get("batch_size", 100)
+        self.flush_interval = flush_interval if flush_interval is not None else db_config.get("flush_interval", 1.0)
+        queue_size = queue_size if queue_size is not None else db_config.get("queue_size", 10000)
+        self.spill_path = spill_path if spill_path is not None else db_config.get("spill_path", "./db/pending_logs.jsonl")
+
+        self.pool = None
+        self.table_checked = False
+        self.db_down_since = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._spill_lock = threading.Lock()
+
+        self.written = 0
+        self.spilled = 0
+        self.replayed = 0
+
+        self._writer = threading.Thread(target=self._run_writer, name="db-log-writer", daemon=True)
+        self._writer.start()
+
     def connect(self):
+        """
+        Create the connection pool if needed.
+
+        :return: True if the database is reachable.
+        """
+        if self.pool is not None:
+            return True
         try:
-            conn = psycopg2.connect(
+            self.pool = ThreadedConnectionPool(
+                minconn=1,
+                maxconn=self.pool_size,
                 host=self.host,
                 database=self.dbname,
                 user=self.user,
                 password=self.password,
-                port=self.port
+                port=self.port,
+                connect_timeout=self.connect_timeout,
             )
-            cursor = conn.cursor()
             logger.info(f"✅ DB {self.dbname} connected.")
-            return conn, cursor
+            return True
         except Exception as e:
-            logger.info(f"❌ DB {self.dbname} connect failed", e)
-            return None, None
-
-    def close(self):
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
+            logger.info(f"❌ DB {self.dbname} connect failed: {e}")
+            return False
+
+    def close(self, timeout=10):
+        """
+        Flush the queued rows (spilling what cannot be written) and close the pool.
+        """
+        self._queue.put(_STOP)
+        self._writer.join(timeout)
+        if self.pool is not None:
+            self.pool.closeall()
+            self.pool = None
         logger.info(f"🔒 DB {self.dbname} close!")
-    
-    def create_table_logs(self):
 
+    def create_table_logs(self):
+        if not self.connect():
+            return
+        conn = self.pool.getconn()
         try:
-            self.conn, self.cur = self.connect()
+            cur = conn.cursor()
             # Kiểm tra schema tồn tại
-            self.cur.execute("""
+            cur.execute("""
                 SELECT EXISTS(
-                    SELECT 1 FROM information_schema.schemata 
+                    SELECT 1 FROM information_schema.schemata
                     WHERE schema_name = %s
                 );
             """, (self.schema,))
-            schema_exists = self.cur.fetchone()[0]
+            schema_exists = cur.fetchone()[0]
             if not schema_exists:
                 # Tạo schema nếu chưa tồn tại
-                self.cur.execute(f"CREATE SCHEMA {self.schema};")
-                self.connector.commit()
+                cur.execute(f"CREATE SCHEMA {self.schema};")
+                conn.commit()
                 logger.info(f"Schema {self.schema} created successfully")
             # Kiểm tra bảng tồn tại
-            self.cur.execute("""
+            cur.execute("""
                 SELECT EXISTS(
-                    SELECT 1 FROM information_schema.tables 
-                    WHERE table_schema = %s 
+                    SELECT 1 FROM information_schema.tables
+                    WHERE table_schema = %s
                     AND table_name = %s
                 );
             """, (self.schema, self.table))
-            
-            table_exists = self.cur.fetchone()[0]
-            
+
+            table_exists = cur.fetchone()[0]
+
             if not table_exists:
                 create_table_query = f"""
                 CREATE TABLE IF NOT EXISTS {self.schema}.{self.table} (
@@ -79,49 +152,224 @@ class Database_logs:
                     status_code INTEGER,
                     output TEXT,
                     extracted_date VARCHAR(100),
+                    paddle_time REAL,
+                    hand_cls_time REAL,
+                    hand_rec_time REAL,
+                    extraction_path VARCHAR(20),
+                    stage_times TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 );
                 """
-                self.cur.execute(create_table_query)
-                self.conn.commit()
+                cur.execute(create_table_query)
+                conn.commit()
                 logger.info(f"Table {self.schema}.{self.table} created successfully")
             else:
+                # tables created before the timing columns existed
+                for column, column_type in ADDED_COLUMNS:
+                    cur.execute(f"ALTER TABLE {self.schema}.{self.table} "
+                                f"ADD COLUMN IF NOT EXISTS {column} {column_type};")
+                conn.commit()
                 logger.info(f"Table {self.schema}.{self.table} already exists")
+            cur.close()
+            self.table_checked = True
         except Exception as e:
             logger.error(f"Error in create_table: {e}")
+            try:
+                conn.rollback()
+            except Exception:
+                pass
         finally:
-            self.close()
+            self.pool.putconn(conn, close=bool(conn.closed))
 
 
     def save_logs(self,file_path, request_time, run_time, status_code, output,
                     extracted_date=None, paddle_time=None, hand_cls_time=None,
-                    hand_rec_time=None):
+                    hand_rec_time=None, extraction_path=None, stage_times=None):
+        """
+        Queue a log row for the background writer. Never blocks on the database.
 
-        # Insert data
-        insert_query = f"""
-        INSERT INTO {self.schema}.{self.table}
-        (file_path, request_time, run_time, status_code, output, 
-         extracted_date)
-        VALUES (%s, %s, %s, %s, %s, %s)
+        :param paddle_time: Seconds in PaddleOCR (detection, angle classification and recognition).
+        :param hand_cls_time: Seconds in PaddleOCR angle classification, part of paddle_time.
+        :param hand_rec_time: Seconds in VietOCR recognition of the (handwritten) date line.
+        :param extraction_path: Path taken: "text", "ocr", "fallback", "docx", "doc", None on a cache hit.
+        :param stage_times: Dict stage -> seconds of every pipeline stage, stored as JSON.
         """
-        try:
-            self.conn, self.cur = self.connect()
-            self.cur.execute(insert_query, (
+        row = (
             file_path,
             request_time,
             run_time,
             status_code,
             output,
             extracted_date if extracted_date else None,
-            paddle_time if paddle_time else 'N/A',
-            hand_cls_time if hand_cls_time else 'N/A',
-            hand_rec_time if hand_rec_time else 'N/A'
-            ))
-            self.conn.commit()
-            logger.info("Successfully saved log to PostgreSQL")
+            paddle_time,
+            hand_cls_time,
+            hand_rec_time,
+            extraction_path,
+            json.dumps(stage_times) if stage_times else None,
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            # the writer is far behind, keep the row on disk rather than in memory
+            self._spill([row])
+
+    def _insert(self, conn, rows):
+        insert_query = f"""
+        INSERT INTO {self.schema}.{self.table}
+        ({", ".join(LOG_COLUMNS)})
+        VALUES %s
+        """
+        with conn.cursor() as cur:
+            execute_values(cur, insert_query, rows, page_size=self.batch_size)
+
+    def _write_batch(self, rows):
+        """
+        Insert rows in one transaction, replaying the spill file first if there is one.
+
+        Rows the database refuses (bad data rather than a lost connection) are moved to
+        `<spill_path>.rejected` so they are not retried forever.
+
+        :return: False if the database is unreachable, True otherwise.
+        """
+        if not self.connect():
+            return False
+        if not self.table_checked:
+            self.create_table_logs()
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            try:
+                self._replay_spill(conn)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                raise
+            except (psycopg2.Error, ValueError) as e:
+                conn.rollback()
+                self._reject(f"{self.spill_path}.replay", e)
 
+            if rows:
+                try:
+                    self._insert(conn, rows)
+                    conn.commit()
+                    self.written += len(rows)
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    raise
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    self._spill(rows, suffix=".rejected")
+                    logger.error(f"PostgreSQL rejected {len(rows)} log rows: {e}")
+
+            if self.db_down_since is not None:
+                logger.info(f"DB {self.dbname} is back after {time.time() - self.db_down_since:.0f}s")
+                self.db_down_since = None
+            return True
         except Exception as e:
             logger.error(f"Error saving to PostgreSQL: {str(e)}")
-            self.conn.rollback()
+            if conn is not None:
+                # the connection is broken, do not hand it out again
+                self.pool.putconn(conn, close=True)
+                conn = None
+            self.pool.closeall()
+            self.pool = None
+            return False
         finally:
-            self.close()
+            if conn is not None:
+                self.pool.putconn(conn)
+
+    def _reject(self, path, error):
+        with self._spill_lock:
+            rejected_path = f"{self.spill_path}.rejected"
+            with open(path, "r", encoding="utf-8") as src, open(rejected_path, "a", encoding="utf-8") as dst:
+                for line in src:
+                    dst.write(line)
+            os.remove(path)
+        logger.error(f"PostgreSQL rejected the spilled log rows, moved to {rejected_path}: {error}")
+
+    def _replay_spill(self, conn):
+        """
+        Write the rows spilled while the database was down, all of them in one transaction
+        so a failure half way does not duplicate rows on the next try.
+        """
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return
+            replay_path = f"{self.spill_path}.replay"
+            if not os.path.exists(replay_path):
+                os.replace(self.spill_path, replay_path)
+
+        count = 0
+        def spilled_rows():
+            nonlocal count
+            with open(replay_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        count += 1
+                        row = tuple(json.loads(line))
+                        # rows spilled before the timing columns were added are shorter
+                        yield row + (None,) * (len(LOG_COLUMNS) - len(row))
+
+        self._insert(conn, spilled_rows())
+        conn.commit()
+        os.remove(replay_path)
+        self.replayed += count
+        logger.info(f"Replayed {count} spilled log rows to PostgreSQL")
+
+    def _spill(self, rows, suffix=""):
+        if not rows:
+            return
+        with self._spill_lock:
+            try:
+                os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+                with open(self.spill_path + suffix, "a", encoding="utf-8") as f:
+                    for row in rows:
+                        f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+                if not suffix:
+                    self.spilled += len(rows)
+            except OSError as e:
+                logger.error(f"Could not spill {len(rows)} log rows to {self.spill_path}: {e}")
+
+    def _run_writer(self):
+        stopping = False
+        last_attempt = 0
+        while not stopping:
+            rows = []
+            try:
+                item = self._queue.get(timeout=self.retry_interval if self.db_down_since else None)
+            except queue.Empty:
+                item = None  # idle while the database is down: time to retry the spill file
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                rows.append(item)
+                # give a partial batch a moment to fill up
+                deadline = time.monotonic() + self.flush_interval
+                while len(rows) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    rows.append(item)
+
+            if self.db_down_since is not None and time.monotonic() - last_attempt < self.retry_interval:
+                # do not wait out a connect timeout for every batch while the database is down
+                self._spill(rows)
+                continue
+            last_attempt = time.monotonic()
+            if not self._write_batch(rows):
+                if self.db_down_since is None:
+                    self.db_down_since = time.time()
+                self._spill(rows)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "db_down": self.db_down_since is not None,
+        }
@@ -1,7 +1,14 @@
 import os
+import io
+import json
 import time
+import asyncio
+import zipfile
+from typing import List
 from datetime import datetime
 from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from starlette.formparsers import MultiPartParser
 import uvicorn
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -10,10 +17,17 @@ from source.models.pipeline import PipelineExtractor
 from config.logging_config import setup_logging
 from config.config import load_config
 from db.db import Database_logs
+from service.executor import ExtractionExecutor, QueueFullError
+from service.result_cache import ResultCache
+from service.jobs import JobStore, LaneScheduler
+from service.ingest import read_upload, read_zip_member, list_zip_documents
+from service.metrics import MetricsRegistry, ExtractionMetrics
+from source.storage import sweep_directory
+from source.timing import StageTimings, collect
 
 DB_LOG = Database_logs()
 # Initialize the logger
-logger = setup_logging()  
+logger = setup_logging()
 # Initialize the config
 config = load_config()
 
@@ -21,56 +35,284 @@ temp_folder_path = config['sys']['temp_extract_path']
 os.makedirs(temp_folder_path, exist_ok=True)
 save_img_path = config['sys']['save_img_path']
 max_pdf_pages = config['sys']['max_pdf_pages']
+max_upload_memory_bytes = config['sys'].get('max_upload_memory_mb', 32) * 1024 * 1024
+upload_chunk_bytes = config['sys'].get('upload_chunk_kb', 1024) * 1024
+temp_retention_seconds = config['sys'].get('temp_retention_hours', 24) * 3600
+warm_up_enabled = config['sys'].get('warm_up', True)
+executor_config = config.get('executor', {})
+cache_config = config.get('result_cache', {})
+batch_config = config.get('batch', {})
+batch_concurrency = batch_config.get('concurrency', 2)
+batch_max_files = batch_config.get('max_files', 500)
+batch_max_member_bytes = batch_config.get('max_member_mb', 200) * 1024 * 1024
+jobs_config = config.get('jobs', {})
 
 app = FastAPI()
 
+# Let the multipart parser keep uploads up to the in-memory limit in RAM as well
+MultiPartParser.spool_max_size = max_upload_memory_bytes
+
 pipeline = PipelineExtractor(
     max_pdf_pages = max_pdf_pages
 )
 
+# Extraction is fully synchronous (PyPDF2, pdf2image, OCR), run it on a bounded pool
+executor = ExtractionExecutor(
+    max_workers=executor_config.get('max_workers', 4),
+    max_queue_size=executor_config.get('max_queue_size', 16),
+    logger=logger,
+)
+retry_after = executor_config.get('retry_after', 5)
 
-@app.post("/contract")
-async def extract_date(file: UploadFile = File(...)):
-    current_date_folder = datetime.now().strftime('%Y-%m-%d')
+# Same bytes + same pipeline version -> same result, re-uploads skip extraction
+cache_enabled = cache_config.get('enabled', True)
+result_cache = ResultCache(
+    memory_entries=cache_config.get('memory_entries', 1024) if cache_enabled else 0,
+    disk_path=cache_config.get('disk_path', './cache/results') if cache_enabled else None,
+    disk_max_bytes=cache_config.get('disk_max_mb', 512) * 1024 * 1024,
+    negative_ttl_seconds=cache_config.get('negative_ttl_seconds', 600),
+    logger=logger,
+)
 
-    date_folder_path = os.path.join(temp_folder_path, current_date_folder)
-    os.makedirs(date_folder_path, exist_ok=True) 
-    temp_file_path = os.path.join(date_folder_path, file.filename)
+# Job API: text PDFs / DOCX, DOC and scanned PDFs run on separate lanes
+lane_config = jobs_config.get('lanes', {})
+lanes = LaneScheduler(
+    lanes={
+        name: ExtractionExecutor(
+            max_workers=lane_config.get(name, {}).get('max_workers', default_workers),
+            max_queue_size=lane_config.get(name, {}).get('max_queue_size', 256),
+            name=f"lane-{name}",
+            logger=logger,
+        )
+        for name, default_workers in (("fast", 4), ("doc", 2), ("ocr", 2))
+    },
+    logger=logger,
+)
+jobs = JobStore(
+    ttl_seconds=jobs_config.get('ttl_seconds', 3600),
+    max_jobs=jobs_config.get('max_jobs', 10000),
+)
 
-    results = {"status_code": 200, "data": None, "message": "", "time_taken": ""}
-    request_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+# /metrics: stage timings and paths per document, queue depth and cache hits read at scrape time
+metrics = MetricsRegistry()
+extraction_metrics = ExtractionMetrics(metrics)
+metrics.collected(
+    "date_extraction_queue_depth",
+    "Jobs waiting for (queued / pending) or holding (running) a worker, and log rows waiting for the database.",
+    "gauge",
+    lambda: [(("executor", "queued"), executor.stats()["queued"]),
+             (("executor", "running"), executor.stats()["running"]),
+             (("db_logs", "queued"), DB_LOG.stats()["queued"])]
+            + [((f"lane_{name}", "pending"), lane["pending"])
+               for name, lane in lanes.stats().items() if isinstance(lane, dict)],
+    ["queue", "state"],
+)
+metrics.collected(
+    "date_extraction_cache_lookups_total",
+    "Result cache and raster cache lookups, by cache and outcome.",
+    "counter",
+    lambda: [(("result", "memory_hit"), result_cache.stats()["memory_hits"]),
+             (("result", "disk_hit"), result_cache.stats()["disk_hits"]),
+             (("result", "miss"), result_cache.stats()["misses"])]
+            + ([(("raster", "hit"), pipeline.ocr_extractor.raster_cache.stats()["hits"]),
+                (("raster", "miss"), pipeline.ocr_extractor.raster_cache.stats()["misses"])]
+               if pipeline.ocr_extractor.raster_cache is not None else []),
+    ["cache", "outcome"],
+)
+metrics.collected(
+    "date_extraction_crops_total",
+    "Date line crops handed to the crop writer: written, dropped (queue full) or skipped (policy / sampling).",
+    "counter",
+    lambda: [((outcome,), count) for outcome, count in pipeline.ocr_extractor.crop_stats().items()
+             if outcome != "queued"],
+    ["outcome"],
+)
 
-    try:
-        logger.info(f"Received file for date extraction: {file.filename}, saving to {temp_file_path}")
 
-        with open(temp_file_path, "wb") as temp_file:
-            temp_file.write(await file.read())
+def timing_log_fields(timings):
+    """
+    Stage timings of a document as save_logs arguments.
+    """
+    return {
+        "paddle_time": timings.get("detection", "angle_cls", "paddle_rec"),
+        "hand_cls_time": timings.get("angle_cls"),
+        "hand_rec_time": timings.get("vietocr"),
+        "extraction_path": timings.path,
+        "stage_times": timings.to_dict() or None,
+    }
 
-        start = time.time()
 
-        # Check file type and handle .doc conversion
-        file_type = pipeline.check_file_type(temp_file_path)
-        original_doc_path = temp_file_path
+def run_pipeline(upload, ocr_fallback=True, timings=None, text_layer=True):
+    """
+    Blocking part of /contract: .doc conversion and date extraction. Runs on the executor.
+
+    :param ocr_fallback: False to skip OCR when a PDF has no date in its text layer.
+    :param text_layer: False when the text layer of a PDF was already read without a date.
+    :param timings: StageTimings receiving the time of every pipeline stage and the path taken.
+    """
+    with collect(timings):
+        file_type = pipeline.check_file_type(upload.filename)
 
         if file_type == "doc":
             try:
-                temp_file_path = pipeline.convert_doc_to_docx(original_doc_path)
-
-                # Delete the original .doc file after conversion
-                if original_doc_path and os.path.exists(original_doc_path):
-                    os.remove(original_doc_path)
-                    
-                logger.info(f"Successfully converted .doc to .docx: {temp_file_path}")
+                # the converters need a real file
+                return pipeline.extract_doc(upload.to_file())
             except Exception as e:
                 logger.error(f"Failed to convert .doc to .docx: {e}")
                 raise ValueError(f"Failed to convert .doc to .docx: {e}")
-        
-        date = pipeline.extract_date(temp_file_path)
-        
+
+        return pipeline.extract_date(upload.file_path, upload.data, ocr_fallback, text_layer, upload.sha256)
+
+
+def choose_lane(upload):
+    """
+    Lane of a job, by file type: "doc" for DOC (the office conversion can take up to
+    doc.timeout), "fast" for PDF and DOCX. A PDF is classified on the fast lane, by
+    reading its text layer, and moves on to the "ocr" lane if it has no date there.
+    """
+    file_type = pipeline.check_file_type(upload.filename)
+    if file_type is None:
+        raise ValueError("Unsupported file type. Only PDF, DOCX and DOC are allowed.")
+    return "doc" if file_type == "doc" else "fast"
+
+
+async def extract_cached(upload, run=None, timings=None):
+    """
+    Date of an upload, from the result cache or computed on the executor.
+
+    :param run: Executor method running the pipeline, executor.run by default.
+    :param timings: StageTimings of the upload, left empty on a cache hit.
+    """
+    run = run or executor.run
+    cache_key = result_cache.make_key(upload.sha256, pipeline.version)
+    return await result_cache.get_or_compute(cache_key, lambda: run(run_pipeline, upload, timings=timings))
+
+
+async def sweep_temp_folder():
+    """
+    Delete spilled uploads left behind (e.g. by a crash) once they are past retention.
+    """
+    while True:
+        try:
+            removed, _ = await asyncio.to_thread(
+                sweep_directory, temp_folder_path, max_age_seconds=temp_retention_seconds
+            )
+            if removed:
+                logger.info(f"Removed {removed} expired files from {temp_folder_path}")
+            jobs.sweep()
+        except Exception as e:
+            logger.error(f"Temp folder sweep failed: {e}")
+        await asyncio.sleep(min(temp_retention_seconds, jobs.ttl_seconds, 3600))
+
+
+# "disabled" / "running" / "done" / "failed", see /readyz
+warm_up_state = {"state": "disabled", "error": None}
+
+
+async def warm_up_pipeline():
+    """
+    Load the models in the background, requests are served (and models loaded on demand) meanwhile.
+    """
+    warm_up_state["state"] = "running"
+    try:
+        await asyncio.to_thread(pipeline.warm_up)
+        warm_up_state["state"] = "done"
+    except Exception as e:
+        warm_up_state["state"] = "failed"
+        warm_up_state["error"] = str(e)
+        logger.error(f"Warm-up failed: {e}")
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    app.state.temp_sweeper = asyncio.create_task(sweep_temp_folder())
+    if warm_up_enabled:
+        app.state.warm_up = asyncio.create_task(warm_up_pipeline())
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    pipeline.doc_converter.shutdown()
+    lanes.shutdown(wait=False)
+    # flush the queued log rows and date line crops
+    await asyncio.to_thread(DB_LOG.close)
+    await asyncio.to_thread(pipeline.ocr_extractor.close_crop_writer)
+
+
+@app.get("/healthz")
+async def healthz():
+    """
+    Liveness: the process answers. Never waits on models or the database.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness: 200 once the warm-up is done (or disabled), 503 with the model load state before.
+    """
+    models = pipeline.model_status()
+    # without warm-up the models load on first use, that does not make the process unready
+    ready = warm_up_state["state"] in ("disabled", "done") and (models["ready"] or not warm_up_enabled)
+    content = {
+        "ready": ready,
+        "warm_up": warm_up_state,
+        "role": models["role"],
+        "models_ready": models["ready"],
+        "ocr": models["ocr"],
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=content)
+
+
+@app.get("/status")
+async def status():
+    return {
+        "executor": executor.stats(),
+        "result_cache": result_cache.stats(),
+        "lanes": lanes.stats(),
+        "jobs": jobs.stats(),
+        "ocr_strategies": pipeline.ocr_extractor.strategy_stats(),
+        "doc_converter": pipeline.doc_converter.stats(),
+        "db_logs": DB_LOG.stats(),
+        "raster_cache": (pipeline.ocr_extractor.raster_cache.stats()
+                         if pipeline.ocr_extractor.raster_cache is not None else None),
+    }
+
+
+@app.get("/metrics")
+async def export_metrics():
+    """
+    Metrics in the Prometheus text format.
+    """
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.post("/contract")
+async def extract_date(file: UploadFile = File(...)):
+    temp_file_path = file.filename
+    upload = None
+
+    results = {"status_code": 200, "data": None, "message": "", "time_taken": ""}
+    request_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    timings = StageTimings()
+
+    try:
+        upload = await read_upload(file, temp_folder_path,
+                                   max_memory_bytes=max_upload_memory_bytes,
+                                   chunk_size=upload_chunk_bytes)
+        temp_file_path = upload.file_path
+        logger.info(f"Received file for date extraction: {file.filename} ({upload.size} bytes, "
+                    f"{'in memory' if upload.path is None else 'spilled to ' + upload.path})")
+
+        start = time.time()
+
+        date = await extract_cached(upload, timings=timings)
+
         # if file_type not in ["pdf", "docx"]:
         #     raise ValueError("Unsupported file type. Only PDF and DOCX are allowed.")
 
-       
+
         end = time.time()
         results["time_taken"] = f"{end - start:.2f}s"
 
@@ -83,6 +325,7 @@ async def extract_date(file: UploadFile = File(...)):
 
         # Thêm lời gọi save to postgres
         logger.info("DATE: {}".format(results["data"]))
+        extraction_metrics.observe(timings, end - start, results["status_code"])
         DB_LOG.save_logs(
             file_path=temp_file_path,
             request_time=request_time,
@@ -90,20 +333,38 @@ async def extract_date(file: UploadFile = File(...)):
             status_code=results["status_code"],
             output=results["message"],
             extracted_date=results["data"],
+            **timing_log_fields(timings),
         )
         return results
 
+    except QueueFullError as qe:
+        results["status_code"] = 503
+        results["message"] = "Hệ thống đang quá tải, vui lòng thử lại sau!"
+        logger.warning(f"Rejected {file.filename}: {qe}")
+        DB_LOG.save_logs(
+            file_path=temp_file_path,
+            request_time=request_time,
+            run_time="N/A",
+            status_code=503,
+            output=results["message"],
+            extracted_date=None
+        )
+        raise HTTPException(status_code=503, detail=results["message"],
+                            headers={"Retry-After": str(retry_after)})
+
     except ValueError as ve:
         results["status_code"] = 400
         results["message"] = str(ve)
         logger.error(f"Validation error: {str(ve)}")
+        extraction_metrics.observe(timings, None, 400)
         DB_LOG.save_logs(
             file_path=temp_file_path,
             request_time=request_time,
             run_time="N/A",
             status_code=400,
             output=results["message"],
-            extracted_date=None
+            extracted_date=None,
+            **timing_log_fields(timings),
         )
         raise HTTPException(status_code=400, detail=results["message"])
 
@@ -111,17 +372,299 @@ async def extract_date(file: UploadFile = File(...)):
         results["status_code"] = 500
         results["message"] = f"Có lỗi xảy ra: {str(e)}"
         logger.error(f"Error during date extraction: {str(e)}")
+        extraction_metrics.observe(timings, None, 500)
         DB_LOG.save_logs(
             file_path=temp_file_path,
             request_time=request_time,
-            run_time="N/A", 
+            run_time="N/A",
             status_code=500,
             output=results["message"],
-            extracted_date=None
+            extracted_date=None,
+            **timing_log_fields(timings),
         )
         raise HTTPException(status_code=500, detail=results["message"])
 
+    finally:
+        if upload is not None:
+            upload.close()
+
+
+async def _loaded(upload):
+    return upload
+
+
+async def open_batch(files):
+    """
+    List the documents of a batch upload, expanding zip archives into their files.
+
+    Plain files are read now: the form's files are closed once the endpoint returns,
+    before the response is streamed. Zip members are only decompressed when a worker is
+    about to process them, so only the documents in progress are held in memory.
+
+    :return: Tuple (list of (filename, async loader returning an UploadBuffer),
+        list of (UploadBuffer, ZipFile or None) to close once the batch is done).
+    """
+    documents, archives = [], []
+    try:
+        for file in files:
+            upload = await read_upload(file, temp_folder_path,
+                                       max_memory_bytes=max_upload_memory_bytes, chunk_size=upload_chunk_bytes)
+            if not (file.filename or "").lower().endswith(".zip"):
+                # closed by extract_batch_document, and again at the end of the batch in case
+                # its task was cancelled before (close is idempotent)
+                archives.append((upload, None))
+                documents.append((file.filename, lambda upload=upload: _loaded(upload)))
+                continue
+
+            try:
+                source = upload.path if upload.path is not None else io.BytesIO(upload.data)
+                archive = await asyncio.to_thread(zipfile.ZipFile, source)
+            except zipfile.BadZipFile:
+                upload.close()
+                raise ValueError(f"{file.filename} is not a valid zip archive")
+            archives.append((upload, archive))
+            for member in list_zip_documents(archive):
+                documents.append((member.filename, lambda archive=archive, member=member: asyncio.to_thread(
+                    read_zip_member, archive, member, temp_folder_path, max_upload_memory_bytes,
+                    upload_chunk_bytes, batch_max_member_bytes
+                )))
+
+        if len(documents) > batch_max_files:
+            raise ValueError(f"Batch holds {len(documents)} files, at most {batch_max_files} are allowed")
+    except BaseException:
+        close_archives(archives)
+        raise
+    return documents, archives
+
+
+def close_archives(archives):
+    for upload, archive in archives:
+        if archive is not None:
+            archive.close()
+        upload.close()
+
+
+async def extract_batch_document(filename, load, semaphore):
+    """
+    Extract the date of one document of a batch, as one NDJSON result line.
+    """
+    results = {"filename": filename, "status_code": 200, "data": None, "message": "", "time_taken": ""}
+    request_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    upload = None
+    timings = StageTimings()
+    run_seconds = None
+
+    async with semaphore:
+        try:
+            if pipeline.check_file_type(filename) is None:
+                raise ValueError("Unsupported file type. Only PDF, DOCX and DOC are allowed.")
+            upload = await load()
+
+            start = time.time()
+            # wait for a free worker rather than taking the queue slots of /contract
+            date = await extract_cached(upload, executor.run_when_idle, timings)
+            run_seconds = time.time() - start
+            results["time_taken"] = f"{run_seconds:.2f}s"
+
+            if date:
+                results["data"] = date
+                results["message"] = "Trích xuất ngày ký hợp đồng thành công!"
+            else:
+                results["status_code"] = 201
+                results["message"] = "Không tìm thấy ngày ký hợp đồng trong văn bản!"
+
+        except ValueError as ve:
+            results["status_code"] = 400
+            results["message"] = str(ve)
+            logger.error(f"Validation error on {filename}: {str(ve)}")
+
+        except Exception as e:
+            results["status_code"] = 500
+            results["message"] = f"Có lỗi xảy ra: {str(e)}"
+            logger.error(f"Error during date extraction of {filename}: {str(e)}")
+
+        finally:
+            if upload is not None:
+                upload.close()
+
+    extraction_metrics.observe(timings, run_seconds, results["status_code"])
+    DB_LOG.save_logs(
+        file_path=filename,
+        request_time=request_time,
+        run_time=results["time_taken"] or "N/A",
+        status_code=results["status_code"],
+        output=results["message"],
+        extracted_date=results["data"],
+        **timing_log_fields(timings),
+    )
+    return results
+
+
+@app.post("/contracts/batch")
+async def extract_dates_batch(files: List[UploadFile] = File(...)):
+    """
+    Extract the dates of many documents, sent as several files and / or zip archives.
+
+    Answers with one NDJSON line per document, in completion order (not input order),
+    as soon as each document is done. At most `batch.concurrency` documents of a batch
+    are processed at once, and only on workers no /contract request is waiting for.
+    """
+    try:
+        documents, archives = await open_batch(files)
+    except ValueError as ve:
+        logger.error(f"Validation error: {str(ve)}")
+        raise HTTPException(status_code=400, detail=str(ve))
+    logger.info(f"Received batch of {len(documents)} documents")
+
+    async def stream_results():
+        semaphore = asyncio.Semaphore(batch_concurrency)
+        tasks = [
+            asyncio.create_task(extract_batch_document(filename, load, semaphore))
+            for filename, load in documents
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                results = await task
+                yield json.dumps(results, ensure_ascii=False) + "\n"
+        finally:
+            # the client went away, or we are done: stop what is left and free the archives
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            close_archives(archives)
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+async def run_job(job, upload):
+    """
+    Background part of POST /jobs: extract the date on the job's lane and store the result.
+    """
+    results = {"status_code": 200, "data": None, "message": "", "time_taken": ""}
+    request_time = datetime.fromtimestamp(job.created_at).strftime('%Y-%m-%d %H:%M:%S')
+    lane = job.lane
+    timings = StageTimings()
+    run_seconds = None
+
+    def run_on_worker(ocr_fallback=True, text_layer=True):
+        job.start()
+        return run_pipeline(upload, ocr_fallback, timings, text_layer)
+
+    async def compute():
+        nonlocal lane
+        if lane == "fast" and pipeline.check_file_type(upload.filename) == "pdf":
+            # text layer only here, OCR would hold up the cheap documents
+            date = await lanes.run(lane, run_on_worker, False)
+            if date is None:
+                lanes.move(lane, "ocr")
+                job.lane = lane = "ocr"
+                if timings.path == "text":
+                    timings.path = "fallback"
+                # the PDF was opened and classified on the fast lane, only OCR is left
+                date = await lanes.run_when_idle(lane, run_on_worker, True, False)
+            return date
+        return await lanes.run(lane, run_on_worker)
+
+    try:
+        start = time.time()
+        date = await result_cache.get_or_compute(
+            result_cache.make_key(upload.sha256, pipeline.version), compute
+        )
+        run_seconds = time.time() - start
+        results["time_taken"] = f"{run_seconds:.2f}s"
+        if date:
+            results["data"] = date
+            results["message"] = "Trích xuất ngày ký hợp đồng thành công!"
+        else:
+            results["status_code"] = 201
+            results["message"] = "Không tìm thấy ngày ký hợp đồng trong văn bản!"
+
+    except ValueError as ve:
+        results["status_code"] = 400
+        results["message"] = str(ve)
+        logger.error(f"Validation error on job {job.id}: {str(ve)}")
+
+    except Exception as e:
+        results["status_code"] = 500
+        results["message"] = f"Có lỗi xảy ra: {str(e)}"
+        logger.error(f"Error during date extraction of job {job.id}: {str(e)}")
+
+    finally:
+        lanes.release(lane)
+        upload.close()
+
+    job.finish(results)
+    extraction_metrics.observe(timings, run_seconds, results["status_code"])
+    DB_LOG.save_logs(
+        file_path=job.filename,
+        request_time=request_time,
+        run_time=results["time_taken"] or "N/A",
+        status_code=results["status_code"],
+        output=results["message"],
+        extracted_date=results["data"],
+        **timing_log_fields(timings),
+    )
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...)):
+    """
+    Queue a document for date extraction and return its job id right away.
+    Poll GET /jobs/{id}, then fetch GET /jobs/{id}/result.
+    """
+    upload = None
+    try:
+        upload = await read_upload(file, temp_folder_path,
+                                   max_memory_bytes=max_upload_memory_bytes,
+                                   chunk_size=upload_chunk_bytes)
+        lane = choose_lane(upload)
+        lanes.reserve(lane)
+        try:
+            job = jobs.create(file.filename, lane)
+        except QueueFullError:
+            lanes.release(lane)
+            raise
+    except QueueFullError as qe:
+        if upload is not None:
+            upload.close()
+        logger.warning(f"Rejected job for {file.filename}: {qe}")
+        raise HTTPException(status_code=503, detail="Hệ thống đang quá tải, vui lòng thử lại sau!",
+                            headers={"Retry-After": str(retry_after)})
+    except ValueError as ve:
+        if upload is not None:
+            upload.close()
+        logger.error(f"Validation error: {str(ve)}")
+        raise HTTPException(status_code=400, detail=str(ve))
+    except BaseException:
+        if upload is not None:
+            upload.close()
+        raise
+
+    logger.info(f"Job {job.id} queued on lane {lane}: {file.filename} ({upload.size} bytes)")
+    job.task = asyncio.create_task(run_job(job, upload))
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    The /contract response of a finished job, or 202 with the job status while it is not finished.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.finished:
+        return JSONResponse(status_code=202, content=job.to_dict())
+    return job.result
+
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=7007)
-
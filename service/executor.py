@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """
+    Raised when an ExtractionExecutor cannot admit more work.
+    """
+
+
+class ExtractionExecutor:
+    """
+    Run blocking extraction work off the event loop on a bounded worker pool.
+
+    At most `max_workers` jobs run at the same time and at most `max_queue_size`
+    more wait for a free worker. Anything beyond that is rejected immediately
+    with QueueFullError so the caller can shed load instead of hanging.
+    """
+
+    def __init__(self, max_workers=4, max_queue_size=16, name="extract", logger=None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.logger = logger
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._wait_times = deque(maxlen=200)
+        # futures of run_when_idle callers waiting for a worker (event loop thread only)
+        self._waiters = deque()
+
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue_size
+
+    def _admit(self, limit=None, count_rejection=True):
+        with self._lock:
+            if self.queued + self.running >= (limit if limit is not None else self.capacity):
+                if count_rejection:
+                    self.rejected += 1
+                raise QueueFullError(
+                    f"Executor '{self.name}' is full ({self.running} running, {self.queued} queued)"
+                )
+            self.queued += 1
+
+    def _wake_waiter(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` on the worker pool and await its result.
+
+        :raises QueueFullError: if all workers are busy and the queue is full.
+        """
+        self._admit()
+        return await self._submit(fn, *args, **kwargs)
+
+    async def run_when_idle(self, fn, *args, **kwargs):
+        """
+        Like run, but wait for a free worker instead of being rejected.
+
+        Only takes a worker nobody is queued for, so background work (e.g. batches)
+        waiting here never uses the queue slots left for interactive requests.
+        """
+        while True:
+            try:
+                self._admit(limit=self.max_workers, count_rejection=False)
+                break
+            except QueueFullError:
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                try:
+                    await waiter
+                except asyncio.CancelledError:
+                    if waiter.done() and not waiter.cancelled():
+                        # we were woken up for a free worker, hand it to the next waiter
+                        self._wake_waiter()
+                    raise
+        return await self._submit(fn, *args, **kwargs)
+
+    async def _submit(self, fn, *args, **kwargs):
+        enqueued_at = time.monotonic()
+
+        def job():
+            wait_time = time.monotonic() - enqueued_at
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self._wait_times.append(wait_time)
+            if self.logger:
+                self.logger.info(f"[{self.name}] job started after waiting {wait_time:.2f}s in queue")
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._pool, job)
+        except RuntimeError:
+            # the pool refused the job (shutting down), release the slot we took
+            with self._lock:
+                self.queued -= 1
+            self._wake_waiter()
+            raise
+        try:
+            return await future
+        finally:
+            # the job released its slot, let a run_when_idle caller have it
+            self._wake_waiter()
+
+    def stats(self):
+        """
+        Snapshot of queue depth and recent queue wait times (seconds).
+        """
+        with self._lock:
+            wait_times = list(self._wait_times)
+            stats = {
+                "workers": self.max_workers,
+                "max_queue_size": self.max_queue_size,
+                "running": self.running,
+                "queued": self.queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "waiting": sum(1 for waiter in self._waiters if not waiter.done()),
+            }
+        stats["avg_wait_time"] = round(sum(wait_times) / len(wait_times), 3) if wait_times else 0.0
+        stats["max_wait_time"] = round(max(wait_times), 3) if wait_times else 0.0
+        return stats
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
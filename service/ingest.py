@@ -0,0 +1,160 @@
+import io
+import os
+import uuid
+import asyncio
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+
+class UploadBuffer:
+    """
+    An uploaded document, held in memory or spilled to a uniquely named temp file.
+
+    Pass `file_path` and `data` to PipelineExtractor.extract_date: for in-memory
+    uploads `file_path` is only the original file name and `data` holds the bytes,
+    for spilled uploads `file_path` is the temp file and `data` is None.
+    """
+
+    def __init__(self, filename, spill_dir):
+        self.filename = filename
+        self.spill_dir = spill_dir
+        self.size = 0
+        self.path = None
+        self._buffer = io.BytesIO()
+        self._file = None
+        self._sha256 = hashlib.sha256()
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+    @property
+    def file_path(self):
+        return self.path if self.path is not None else self.filename
+
+    @property
+    def data(self):
+        return self._buffer.getvalue() if self.path is None else None
+
+    def _new_spill_path(self):
+        folder = os.path.join(self.spill_dir, datetime.now().strftime('%Y-%m-%d'))
+        os.makedirs(folder, exist_ok=True)
+        suffix = Path(self.filename or "").suffix.lower()
+        return os.path.join(folder, f"{uuid.uuid4().hex}{suffix}")
+
+    def write(self, chunk, max_memory_bytes):
+        self._sha256.update(chunk)
+        self.size += len(chunk)
+        if self._file is None and self.size > max_memory_bytes:
+            # too large to keep in memory, move what we have to disk and continue there
+            self.path = self._new_spill_path()
+            self._file = open(self.path, "wb")
+            self._file.write(self._buffer.getvalue())
+            self._buffer = io.BytesIO()
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer.write(chunk)
+
+    def finish(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def to_file(self):
+        """
+        Return a path to the document on disk, spilling it first if it is in memory.
+        Used by stages that only work on real files (e.g. .doc conversion).
+        """
+        if self.path is None:
+            self.path = self._new_spill_path()
+            with open(self.path, "wb") as f:
+                f.write(self._buffer.getvalue())
+            self._buffer = io.BytesIO()
+        return self.path
+
+    def close(self):
+        """
+        Release the buffer and delete the spill file, if any.
+        """
+        self.finish()
+        self._buffer = io.BytesIO()
+        if self.path is not None and os.path.exists(self.path):
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass  # the retention sweeper removes it later
+
+
+async def read_upload(upload, spill_dir, max_memory_bytes=32 * 1024 * 1024, chunk_size=1024 * 1024):
+    """
+    Stream an UploadFile in chunks into an UploadBuffer, hashing it on the way.
+
+    :param upload: FastAPI UploadFile.
+    :param spill_dir: Folder for uploads larger than `max_memory_bytes`.
+    :param max_memory_bytes: Largest upload kept in memory.
+    :param chunk_size: Bytes read per chunk.
+    :return: UploadBuffer, call close() when done with it.
+    """
+    buffer = UploadBuffer(upload.filename, spill_dir)
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            if buffer.path is None and buffer.size + len(chunk) <= max_memory_bytes:
+                buffer.write(chunk, max_memory_bytes)
+            else:
+                await asyncio.to_thread(buffer.write, chunk, max_memory_bytes)
+    except BaseException:
+        buffer.close()
+        raise
+    buffer.finish()
+    return buffer
+
+
+def read_zip_member(archive, member, spill_dir, max_memory_bytes=32 * 1024 * 1024, chunk_size=1024 * 1024,
+                    max_bytes=None):
+    """
+    Decompress one document of a zip archive into an UploadBuffer. Blocking, run it off the event loop.
+
+    :param archive: Open zipfile.ZipFile.
+    :param member: ZipInfo of the document.
+    :param max_bytes: Largest decompressed size accepted, None for no limit. Checked against
+        the size in the archive header and again while decompressing, as the header can lie.
+    :return: UploadBuffer named after the member, call close() when done with it.
+    :raises ValueError: The member is larger than `max_bytes`.
+    """
+    if max_bytes is not None and member.file_size > max_bytes:
+        raise ValueError(f"{member.filename} is {member.file_size} bytes uncompressed, "
+                         f"at most {max_bytes} are allowed")
+    buffer = UploadBuffer(os.path.basename(member.filename), spill_dir)
+    try:
+        with archive.open(member) as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                if max_bytes is not None and buffer.size + len(chunk) > max_bytes:
+                    raise ValueError(f"{member.filename} decompresses to more than {max_bytes} bytes")
+                buffer.write(chunk, max_memory_bytes)
+    except BaseException:
+        buffer.close()
+        raise
+    buffer.finish()
+    return buffer
+
+
+def list_zip_documents(archive, max_files=None):
+    """
+    Documents of a zip archive in archive order, skipping folders and macOS metadata.
+
+    :raises ValueError: The archive holds more than `max_files` documents.
+    """
+    members = [
+        member for member in archive.infolist()
+        if not member.is_dir()
+        and not member.filename.startswith("__MACOSX/")
+        and not os.path.basename(member.filename).startswith(".")
+    ]
+    if max_files is not None and len(members) > max_files:
+        raise ValueError(f"Archive holds {len(members)} files, at most {max_files} are allowed per batch")
+    return members
@@ -0,0 +1,178 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+from service.executor import QueueFullError
+
+
+class Job:
+    """
+    One document submitted to the job API, from upload to result.
+
+    status goes "queued" -> "running" -> "done" / "failed". `result` holds the same
+    fields as a /contract response once the job is finished.
+    """
+
+    def __init__(self, filename, lane):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.lane = lane
+        self.status = "queued"
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def start(self):
+        if self.started_at is None:
+            self.started_at = time.time()
+        self.status = "running"
+
+    def finish(self, result):
+        self.result = result
+        self.status = "done" if result["status_code"] < 400 else "failed"
+        self.finished_at = time.time()
+        if self.started_at is None:
+            # answered from the result cache, never ran
+            self.started_at = self.finished_at
+
+    def to_dict(self):
+        job = {
+            "id": self.id,
+            "filename": self.filename,
+            "lane": self.lane,
+            "status": self.status,
+            "created_at": self.created_at,
+            "queue_time": None,
+            "run_time": None,
+        }
+        if self.started_at is not None:
+            job["queue_time"] = round(self.started_at - self.created_at, 3)
+            if self.finished_at is not None:
+                job["run_time"] = round(self.finished_at - self.started_at, 3)
+        return job
+
+
+class JobStore:
+    """
+    In-memory jobs by id. Finished jobs are kept `ttl_seconds` for their result to be fetched.
+    """
+
+    def __init__(self, ttl_seconds=3600, max_jobs=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, filename, lane):
+        """
+        :raises QueueFullError: The store already holds `max_jobs` jobs.
+        """
+        self.sweep()
+        with self._lock:
+            if len(self._jobs) >= self.max_jobs:
+                raise QueueFullError(f"Job store is full ({len(self._jobs)} jobs)")
+            job = Job(filename, lane)
+            self._jobs[job.id] = job
+            return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and self._expired(job, time.time()):
+            return None
+        return job
+
+    def _expired(self, job, now):
+        return job.finished and now - job.finished_at > self.ttl_seconds
+
+    def sweep(self):
+        """
+        Drop the finished jobs past their time to live.
+
+        :return: Number of jobs dropped.
+        """
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if self._expired(job, now)]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+
+class LaneScheduler:
+    """
+    Separate executors ("lanes") for cheap and expensive documents.
+
+    Each lane has its own workers and queue, so documents in the fast lane (text
+    PDFs, DOCX) never wait behind scanned PDFs in the OCR lane. A lane accepts at
+    most the capacity of its executor in pending jobs, beyond that submission is
+    refused with QueueFullError.
+    """
+
+    def __init__(self, lanes, logger=None):
+        """
+        :param lanes: Dict lane name -> ExtractionExecutor.
+        """
+        self.lanes = lanes
+        self.logger = logger
+        self.pending = {name: 0 for name in lanes}
+        self.rerouted = 0
+
+    def reserve(self, lane):
+        """
+        Count a new job in a lane before it is submitted.
+
+        :raises QueueFullError: The lane already has as many pending jobs as its executor can hold.
+        """
+        executor = self.lanes[lane]
+        if self.pending[lane] >= executor.capacity:
+            executor.rejected += 1
+            raise QueueFullError(f"Lane '{lane}' is full ({self.pending[lane]} pending jobs)")
+        self.pending[lane] += 1
+
+    def release(self, lane):
+        self.pending[lane] -= 1
+
+    async def run(self, lane, fn, *args, **kwargs):
+        """
+        Run a reserved job on its lane.
+        """
+        return await self.lanes[lane].run(fn, *args, **kwargs)
+
+    def move(self, from_lane, to_lane):
+        """
+        Move a job that already started to another lane (e.g. a text PDF without a date
+        in its text goes on to OCR). It is never refused there, run it with run_when_idle.
+        """
+        self.release(from_lane)
+        self.pending[to_lane] += 1
+        self.rerouted += 1
+
+    async def run_when_idle(self, lane, fn, *args, **kwargs):
+        """
+        Run a moved job on its new lane, waiting for a free worker rather than being refused.
+        """
+        return await self.lanes[lane].run_when_idle(fn, *args, **kwargs)
+
+    def stats(self):
+        stats = {name: dict(executor.stats(), pending=self.pending[name]) for name, executor in self.lanes.items()}
+        stats["rerouted"] = self.rerouted
+        return stats
+
+    def shutdown(self, wait=True):
+        for executor in self.lanes.values():
+            executor.shutdown(wait=wait)
@@ -0,0 +1,163 @@
+import threading
+
+# Seconds, from a regex on a short text page to OCR of a long scanned document
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.type = "counter"
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.type = "histogram"
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            for bound, count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(bound))])} {count}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {counts[-1]}"
+
+
+class Collected:
+    """
+    Values read when /metrics is scraped, from the stats() of a component.
+    """
+
+    def __init__(self, name, help, type, collect, labelnames=()):
+        """
+        :param type: "gauge" or "counter".
+        :param collect: Callable returning a list of (tuple of label values, value).
+        """
+        self.name = name
+        self.help = help
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self):
+        for key, value in self.collect():
+            if value is not None:
+                yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class MetricsRegistry:
+    """
+    Metrics exported in the Prometheus text format (version 0.0.4), without a client library.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def collected(self, name, help, type, collect, labelnames=()):
+        return self.register(Collected(name, help, type, collect, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class ExtractionMetrics:
+    """
+    Per-document metrics of the date extraction: time per stage and overall, by path taken.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.stage_seconds = registry.histogram(
+            "date_extraction_stage_seconds",
+            "Seconds spent per document in each pipeline stage.",
+            ["stage"],
+        )
+        self.document_seconds = registry.histogram(
+            "date_extraction_document_seconds",
+            "Seconds to extract the date of a document, by path taken.",
+            ["path"],
+        )
+        self.documents = registry.counter(
+            "date_extraction_documents_total",
+            "Documents processed, by path taken (text, ocr, fallback, docx, doc, cache, none) and status code.",
+            ["path", "status_code"],
+        )
+
+    def observe(self, timings, seconds, status_code):
+        """
+        Record one processed document.
+
+        :param timings: StageTimings of the document. Without a path a successful result
+            came from the result cache (or another request computing the same file), and
+            a failed one failed before the pipeline chose a path ("none").
+        :param seconds: Wall time of the extraction, None if it did not finish.
+        """
+        path = timings.path or ("cache" if status_code < 400 else "none")
+        for stage, stage_seconds in timings.to_dict().items():
+            self.stage_seconds.observe(stage_seconds, stage=stage)
+        if seconds is not None:
+            self.document_seconds.observe(seconds, path=path)
+        self.documents.inc(path=path, status_code=status_code)
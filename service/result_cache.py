@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+
+from source.storage import sweep_directory, touch
+
+
+class ResultCache:
+    """
+    Content-addressed cache of extraction results.
+
+    Results are keyed by the hash of the uploaded bytes plus the pipeline version,
+    kept in an in-memory LRU tier and a size-limited on-disk tier. Concurrent
+    requests for the same key share one computation. A None result ("no date") is
+    cached too, but only for `negative_ttl_seconds`.
+    """
+
+    def __init__(self, memory_entries=1024, disk_path=None, disk_max_bytes=512 * 1024 * 1024,
+                 negative_ttl_seconds=600, logger=None):
+        self.memory_entries = memory_entries
+        self.disk_path = disk_path
+        self.disk_max_bytes = disk_max_bytes
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.logger = logger
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._disk_bytes = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        if disk_path:
+            os.makedirs(disk_path, exist_ok=True)
+
+    @staticmethod
+    def make_key(content_hash, version):
+        """
+        :param content_hash: Hex digest of the uploaded bytes.
+        :param version: Pipeline / model version the result was computed with.
+        """
+        return hashlib.sha256(f"{version}:{content_hash}".encode("utf-8")).hexdigest()
+
+    def _disk_file(self, key):
+        return os.path.join(self.disk_path, key[:2], f"{key}.json")
+
+    def _expires_at(self, value):
+        """
+        :return: Expiry time of a cached value, None when it does not expire.
+        """
+        return None if value is not None else time.time() + self.negative_ttl_seconds
+
+    def _get_memory(self, key):
+        with self._lock:
+            if key in self._memory:
+                value, expires_at = self._memory[key]
+                if expires_at is not None and expires_at <= time.time():
+                    del self._memory[key]
+                    return False, None
+                self._memory.move_to_end(key)
+                return True, value
+        return False, None
+
+    def _put_memory(self, key, value, expires_at=None):
+        if self.memory_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = (value, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _get_disk(self, key):
+        if not self.disk_path:
+            return False, None
+        file_path = self._disk_file(key)
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            value = entry["date"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False, None
+        if value is None:
+            # an entry without expiry comes from an earlier version that kept "no date" for good
+            expires_at = entry.get("expires_at")
+            if expires_at is None or expires_at <= time.time():
+                return False, None
+        touch(file_path)
+        return True, value
+
+    def _put_disk(self, key, value, expires_at=None):
+        if not self.disk_path:
+            return
+        file_path = self._disk_file(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        entry = {"date": value}
+        if expires_at is not None:
+            entry["expires_at"] = expires_at
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, file_path)
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(
+                    os.path.getsize(os.path.join(root, name))
+                    for root, _, names in os.walk(self.disk_path) for name in names
+                )
+            else:
+                self._disk_bytes += os.path.getsize(file_path)
+            over_budget = self._disk_bytes > self.disk_max_bytes
+        if over_budget:
+            # evict down to 90% so we do not sweep again on the next write
+            removed, remaining = sweep_directory(
+                self.disk_path, max_total_bytes=int(self.disk_max_bytes * 0.9), pattern="*.json"
+            )
+            with self._lock:
+                self._disk_bytes = remaining
+            if self.logger:
+                self.logger.info(f"Result cache evicted {removed} entries, {remaining} bytes on disk")
+
+    async def get_or_compute(self, key, compute):
+        """
+        Return the cached result for `key`, or await `compute()` once and cache its result.
+
+        A None result ("no date") is cached for `negative_ttl_seconds` only, and not at all
+        when it is 0: the pipeline also returns None when it failed (a crashed OCR worker,
+        a missing converter...), which must not stick to the document for good, while a
+        document without a date re-uploaded in a loop should not be OCRed every time.
+        When the request computing a key is cancelled, one of the requests waiting for it
+        takes the computation over.
+
+        :param key: Cache key from make_key.
+        :param compute: Zero-argument coroutine function producing the result.
+        """
+        while True:
+            hit, value = self._get_memory(key)
+            if hit:
+                self.memory_hits += 1
+                return value
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if inflight.cancelled() and not asyncio.current_task().cancelling():
+                    continue  # the computing request went away, not us: take over
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        # mark the exception as retrieved when nobody else was waiting for it
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            hit, value = await asyncio.to_thread(self._get_disk, key)
+            if hit:
+                self.disk_hits += 1
+                if value is not None:
+                    self._put_memory(key, value)
+                # a "no date" entry keeps its expiry on disk, it is read from there until then
+            else:
+                self.misses += 1
+                value = await compute()
+                if value is not None or self.negative_ttl_seconds > 0:
+                    expires_at = self._expires_at(value)
+                    try:
+                        await asyncio.to_thread(self._put_disk, key, value, expires_at)
+                    except OSError as e:
+                        if self.logger:
+                            self.logger.error(f"Failed to write result cache entry: {e}")
+                    self._put_memory(key, value, expires_at)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self):
+        return {
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
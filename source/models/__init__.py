@@ -1,8 +1,24 @@
-# Import key classes and methods for easier access
-from image_pdf import OcrExtractor
-from pdf import PdfExtractor
-from doc import DocExtractor
+import os
+import sys
+import importlib
 
-from pipeline import PipelineExtractor
-from .config import WEIGHTS_PATH 
+# The modules of this package import each other by bare name (from pdf import PdfExtractor)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# Key classes for easier access, imported on first access only: importing the package
+# (e.g. for source.models.pipeline) must not import every extractor
+_EXPORTS = {
+    "OcrExtractor": "image_pdf",
+    "PdfExtractor": "pdf",
+    "DocxExtractor": "doc",
+    "PipelineExtractor": "pipeline",
+    "WEIGHTS_PATH": "model_config",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_EXPORTS[name]), name)
@@ -0,0 +1,144 @@
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from source.storage import sweep_directory
+
+# Which date line crops are kept, by outcome of the line ("date" or "blank")
+POLICIES = ("all", "blank", "low_confidence")
+
+_STOP = object()
+
+
+class CropWriter:
+    """
+    Date line crops saved for debugging, written by a background thread.
+
+    submit only copies the crop onto a bounded queue and never touches the disk; when
+    the queue is full the crop is dropped. The writer thread encodes the JPEG under
+    <folder>/<YYYY-MM-DD>/ and sweeps the folder down to its age and size budget.
+    """
+
+    def __init__(self, folder, policy="all", min_confidence=0.8, sample_rate=1.0, queue_size=256,
+                 max_age_seconds=None, max_total_bytes=None, sweep_interval=600, logger=None):
+        """
+        :param policy: "all" (every recognized date line), "blank" (only lines without a
+            readable date) or "low_confidence" (blank lines, and lines PaddleOCR read with a
+            score below `min_confidence`).
+        :param sample_rate: Share of the crops selected by the policy that are written.
+        :param queue_size: Crops waiting for the writer thread, more are dropped.
+        :param max_age_seconds: Crops older than this are deleted, None to keep them.
+        :param max_total_bytes: The oldest crops are deleted above this size, None for no limit.
+        :param sweep_interval: Seconds between two sweeps of the folder.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown crop policy: {policy}. Available: {', '.join(POLICIES)}")
+        self.folder = folder
+        self.policy = policy
+        self.min_confidence = min_confidence
+        self.sample_rate = sample_rate
+        self.max_age_seconds = max_age_seconds
+        self.max_total_bytes = max_total_bytes
+        self.sweep_interval = sweep_interval
+        self.logger = logger
+        self.written = 0
+        self.dropped = 0
+        self.skipped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._random = random.Random()
+        self._folders = set()
+        self._writer = threading.Thread(target=self._run_writer, name="crop-writer", daemon=True)
+        self._writer.start()
+
+    def selects(self, outcome, confidence=None):
+        """
+        :param outcome: "date" if a date was read from the line, "blank" otherwise.
+        :param confidence: PaddleOCR recognition score of the line, None if unknown.
+        """
+        if self.policy == "all" or outcome == "blank":
+            return True
+        if self.policy == "low_confidence":
+            return confidence is not None and confidence < self.min_confidence
+        return False
+
+    def submit(self, image, filename, outcome, confidence=None):
+        """
+        Queue a crop for writing. Never blocks.
+
+        :return: True if queued, False if skipped by the policy / sampling or dropped.
+        """
+        if not self.selects(outcome, confidence) or self._random.random() >= self.sample_rate:
+            self.skipped += 1
+            return False
+        try:
+            # own copy: the crop is a view of the whole page
+            self._queue.put_nowait((image.copy(), filename))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _write(self, image, filename):
+        dated_folder = os.path.join(self.folder, datetime.now().strftime('%Y-%m-%d'))
+        if dated_folder not in self._folders:
+            os.makedirs(dated_folder, exist_ok=True)
+            self._folders.add(dated_folder)
+        file_path = os.path.join(dated_folder, filename)
+        if not cv2.imwrite(file_path, image):
+            raise OSError(f"could not write {file_path}")
+        self.written += 1
+
+    def _sweep(self):
+        if self.max_age_seconds is None and self.max_total_bytes is None:
+            return
+        removed, _ = sweep_directory(self.folder, self.max_age_seconds, self.max_total_bytes)
+        if removed:
+            # sweep_directory removes the emptied day folders
+            self._folders.clear()
+            if self.logger:
+                self.logger.info(f"Removed {removed} date line crops from {self.folder}")
+
+    def _run_writer(self):
+        last_sweep = 0.0
+        while True:
+            if time.monotonic() - last_sweep >= self.sweep_interval:
+                try:
+                    self._sweep()
+                except Exception as e:
+                    if self.logger:
+                        self.logger.error(f"Crop folder sweep failed: {e}")
+                last_sweep = time.monotonic()
+            try:
+                item = self._queue.get(timeout=self.sweep_interval)
+            except queue.Empty:
+                continue
+            if item is _STOP:
+                return
+            image, filename = item
+            try:
+                self._write(image, filename)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Could not save crop {filename}: {e}")
+
+    def close(self, timeout=5):
+        """
+        Write the queued crops and stop the writer thread.
+        """
+        self._queue.put(_STOP)
+        self._writer.join(timeout)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "skipped": self.skipped,
+        }
@@ -1,44 +1,15 @@
 import re
+import os
+import sys
 import unicodedata
 import datetime
+from bisect import bisect_right
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-class DateRegexExtractor:
-    def normalize_text(sefl, text):
-        """
-        Normalize text by removing diacritics and punctuation, and converting to lowercase.
-        
-        :param text: Text to normalize.
-        :return: Normalized text.
-        """
-        nkfd = unicodedata.normalize('NFKD', text)
-        text = ''.join(ch for ch in nkfd if unicodedata.category(ch) != 'Mn')
-        
-        text = re.sub(r'[^a-zA-Z0-9/:]', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'(?<=\d)\s+(?=\d)', '', text)
-        return text.lower()
-    
-    def is_valid_date(self, day: int, month: int, year: int) -> bool:
-        """
-        Check if day/month/year (int) form a valid date.
-        """
-        try:
-            datetime.date(int(year), int(month), int(day))
-            return True
-        except ValueError:
-            return False
+from source.timing import stage
 
-    def find_date_pattern(self, texts):
-        """
-        Find date patterns in the recognized text.
-        Input:
-            texts (list): List of recognized text strings.
-        Output:
-            date_like_index (int): Index of the text that matches a date pattern, or None if not found.
-        """
-        # 1. Pattern for "Hôm nay ... ngày ... tháng ... năm ..."
-        pattern_homnay = re.compile(
-            r'''(?ix)                                # i: ignore-case, x: allow comments
+# 1. Pattern for "Hôm nay ... ngày ... tháng ... năm ..." (i: ignore-case, x: allow comments)
+PATTERN_HOMNAY = r'''
             hom?\s*nay                               # "hom nay" (có thể là "homnay" hoặc "hom nay")
             \s*                                      # optional khoảng trắng sau "hom nay"
             (?:
@@ -68,13 +39,10 @@ class DateRegexExtractor:
                     /\s*/\s*/?
                 )
             )
-            ''',
-            flags=re.VERBOSE
-        )
+            '''
 
-        # 2. Pattern for "Ngày ký: .. / .. / ...."
-        pattern_ngayky = re.compile(
-            r'''(?ix)                             # i: ignore-case, x: allow comments
+# 2. Pattern for "Ngày ký: .. / .. / ...." (i: ignore-case, x: allow comments)
+PATTERN_NGAYKY = r'''
             ngay\s*ky                            # từ "ngay ky" với khoảng trắng tùy ý giữa
             \s*:\s*                              # dấu ":" với khoảng trắng tùy ý xung quanh
             (?:                                  # bắt đầu nhóm không lưu (non-capturing group)
@@ -90,14 +58,193 @@ class DateRegexExtractor:
                 |                                # hoặc
                 /?\s*/?\s*/?                     # ba dấu "/" hoặc khoảng trắng (tùy chọn)
             )
-            ''',
-            flags=re.VERBOSE
-        )
+            '''
+
+def _build_fold_table():
+    """
+    Translation table doing, one character at a time, what normalize_text used to do
+    with NFKD + dropping combining marks + replacing punctuation + lowercasing:
+    "Ấ" -> "a", "," -> " ", combining marks -> removed. Line breaks are kept so a whole
+    page can be normalized at once. Characters missing from the table have no ASCII form
+    and are replaced with spaces afterwards, as NFKD left them.
+
+    "đ" / "Đ" have no decomposition and stay spaces rather than "d": no date pattern
+    contains a "d", so folding them could not make any line match, it would only stop
+    matching lines where OCR put a stray "Đ" in a whitespace gap (e.g. "ngày Đ ky:").
+    """
+    table = {}
+    for code in range(0x80):
+        ch = chr(code)
+        if ch != '\n':
+            table[code] = ch.lower() if ch.isalnum() or ch in '/:' else ' '
+    for code in range(0x80, 0x10000):
+        if 0xD800 <= code <= 0xDFFF:
+            continue
+        ch = chr(code)
+        if not unicodedata.decomposition(ch) and unicodedata.category(ch) != 'Mn':
+            continue
+        base = ''.join(c for c in unicodedata.normalize('NFKD', ch) if unicodedata.category(c) != 'Mn')
+        table[code] = re.sub(r'[^a-zA-Z0-9/:]', ' ', base).lower() if base else None
+    return table
+
+
+FOLD_TABLE = _build_fold_table()
+_NOT_ALLOWED = re.compile(r'[^a-z0-9/:\n]+')
+_SPACE_BETWEEN_DIGITS = re.compile(r'(?<=\d) (?=\d)')
+
+
+def _line_safe(pattern):
+    # \s and \D must not cross line breaks when a whole normalized page is searched at once
+    return pattern.replace(r'\s', r'[^\S\n]').replace(r'\D', r'[^\d\n]')
+
+
+# Both patterns merged into one matcher, compiled once for the whole process.
+# On a single line it matches exactly like the two original patterns.
+DATE_LINE_PATTERN = re.compile(
+    rf'''(?:{_line_safe(PATTERN_HOMNAY)})|(?:{_line_safe(PATTERN_NGAYKY)})''',
+    flags=re.IGNORECASE | re.VERBOSE
+)
+
+
+def _char_class(chars):
+    return '[' + ''.join(re.escape(ch) for ch in sorted(chars)) + ']'
+
+
+def _letter_class(letter):
+    """
+    Character class of every character that normalizes to `letter` (e.g. "a" -> a, A, à, ạ, â, ầ, ...).
+    """
+    return _char_class(chr(code) for code, folded in FOLD_TABLE.items() if folded == letter)
+
+
+# Combining marks, dropped by the normalization
+_MARKS = _char_class(chr(code) for code, folded in FOLD_TABLE.items() if folded is None) + '*'
+
+# A line can only match DATE_LINE_PATTERN if its normalized text contains "nay" or "ky".
+# This finds those letters (with any diacritics) in the raw text, without normalizing it.
+DATE_KEYWORD_PREFILTER = re.compile(
+    _letter_class('n') + _MARKS + _letter_class('a') + _MARKS + _letter_class('y')
+    + '|' + _letter_class('k') + _MARKS + _letter_class('y')
+)
+
+# “Slash-like” pattern (dd / mm / yyyy), allows strange characters in between:
+SLASH_DATE_PATTERN = re.compile(
+    r'(\d{1,2})'               # Group 1: day (1 or 2 digits)
+    r'\s*'
+    r'(?:[\/\s]{1,3})'     # 1–3 separator characters: '/', '.', '-', or space
+    r'\s*'
+    r'(\d{1,2})'               # Group 2: month (1 or 2 digits)
+    r'\s*'
+    r'(?:[\/\s]{1,3})'     # Next 1–3 separator characters
+    r'\s*'
+    r'(\d{4})'                 # Group 3: year (4 digits)
+)
+
+# “Vietnamese” pattern: dd tháng mm năm yyyy (all lowercased so only 'tháng'/'năm')
+VIETNAMESE_DATE_PATTERN = re.compile(
+    r'(\d{1,2})'               # Group 1: day
+    r'\s*(?:thang)\s*'   # the word 'tháng'
+    r'(\d{1,2})'               # Group 2: month
+    r'\s*(?:nam)\s*'   # the word 'năm'
+    r'(\d{4})'                 # Group 3: year
+)
+
+def _fold(text):
+    text = text.translate(FOLD_TABLE)
+    text = _NOT_ALLOWED.sub(' ', text)
+    return _SPACE_BETWEEN_DIGITS.sub('', text)
+
+
+class DateRegexExtractor:
+    def normalize_text(sefl, text):
+        """
+        Normalize text by removing diacritics and punctuation, and converting to lowercase.
+        
+        :param text: Text to normalize.
+        :return: Normalized text.
+        """
+        return _fold(text.replace('\n', ' '))
+
+    def normalize_page(self, text):
+        """
+        Normalize a whole page (or document) in one pass, like normalize_text but keeping line breaks.
+
+        :param text: Text of the page, lines separated by '\\n'.
+        :return: Tuple (normalized text, start offset of every line in the normalized text).
+        """
+        text = _fold(text)
+        line_starts = [0]
+        position = text.find('\n')
+        while position != -1:
+            line_starts.append(position + 1)
+            position = text.find('\n', position + 1)
+        return text, line_starts
+    
+    def is_valid_date(self, day: int, month: int, year: int) -> bool:
+        """
+        Check if day/month/year (int) form a valid date.
+        """
+        try:
+            datetime.date(int(year), int(month), int(day))
+            return True
+        except ValueError:
+            return False
+
+    def find_date_pattern(self, texts):
+        """
+        Find date patterns in the recognized text.
+        Input:
+            texts (list): List of recognized text strings.
+        Output:
+            date_like_index (int): Index of the text that matches a date pattern, or None if not found.
+        """
+        return next(self.iter_date_patterns(texts), None)
+
+    def iter_date_patterns(self, texts):
+        """
+        Find all date patterns in the recognized text.
+        Input:
+            texts (list): List of recognized text strings.
+        Output:
+            Generator of the indexes of the texts that match a date pattern, in order.
+        """
+        # one line at a time: find_date_pattern stops at the first hit, on OCR lines
+        # that is usually early and the lines after it are never normalized
         for idx, text in enumerate(texts):
-            text = self.normalize_text(text)        
-            if pattern_homnay.search(text) or pattern_ngayky.search(text):
-                return idx
-        return None
+            # cheap check on the raw text first, most lines cannot contain "nay" / "ky"
+            if not DATE_KEYWORD_PREFILTER.search(text):
+                continue
+            if DATE_LINE_PATTERN.search(self.normalize_text(text)):
+                yield idx
+
+    def iter_page_date_lines(self, page_text):
+        """
+        Find the lines of a page (or document) that match a date pattern, normalizing it once.
+        For the text of PDF pages and DOCX documents, OCR lines go through iter_date_patterns.
+
+        :param page_text: Text of the page, lines separated by '\\n'.
+        :return: Generator of the indexes of the matching lines in page_text.split('\\n'), in order.
+        """
+        # cheap check on the raw text first: only lines containing "nay" / "ky" can match
+        candidates = []
+        line, position = 0, 0
+        for keyword in DATE_KEYWORD_PREFILTER.finditer(page_text):
+            line += page_text.count('\n', position, keyword.start())
+            position = keyword.start()
+            if not candidates or candidates[-1] != line:
+                candidates.append(line)
+        if not candidates:
+            return
+
+        # the candidate lines are normalized together, in one pass
+        lines = page_text.split('\n')
+        normalized, line_starts = self.normalize_page('\n'.join(lines[i] for i in candidates))
+        last_line = None
+        for match in DATE_LINE_PATTERN.finditer(normalized):
+            line = candidates[bisect_right(line_starts, match.start()) - 1]
+            if line != last_line:
+                last_line = line
+                yield line
     
     
     def extract_and_format_date(self, text):
@@ -111,37 +258,16 @@ class DateRegexExtractor:
             text (str): The date normalized to 'dd/mm/yyyy' format.
             If no date is found, returns None.
         """
-        text = self.normalize_text(text)
-    
-        # “Slash-like” pattern (dd / mm / yyyy), allows strange characters in between:
-        slash_pattern = re.compile(
-            r'(\d{1,2})'               # Group 1: day (1 or 2 digits)
-            r'\s*'
-            r'(?:[\/\s]{1,3})'     # 1–3 separator characters: '/', '.', '-', or space
-            r'\s*'
-            r'(\d{1,2})'               # Group 2: month (1 or 2 digits)
-            r'\s*'
-            r'(?:[\/\s]{1,3})'     # Next 1–3 separator characters
-            r'\s*'
-            r'(\d{4})'                 # Group 3: year (4 digits)
-        )
-
-        # “Vietnamese” pattern: dd tháng mm năm yyyy (all lowercased so only 'tháng'/'năm')
-        vietnamese_pattern = re.compile(
-            r'(\d{1,2})'               # Group 1: day
-            r'\s*(?:thang)\s*'   # the word 'tháng'
-            r'(\d{1,2})'               # Group 2: month
-            r'\s*(?:nam)\s*'   # the word 'năm'
-            r'(\d{4})'                 # Group 3: year
-        )
-
-        all_patterns = [slash_pattern, vietnamese_pattern]
-        for pattern in all_patterns:
-            for day_str, month_str, year_str in pattern.findall(text):
-                day_fmt   = day_str.zfill(2)
-                month_fmt = month_str.zfill(2)
-                year_fmt  = year_str
-                if self.is_valid_date(day_str, month_str, year_str):
-                    return(f"{day_fmt}/{month_fmt}/{year_fmt}")
-        return None
+        with stage("regex"):
+            text = self.normalize_text(text)
+
+            all_patterns = [SLASH_DATE_PATTERN, VIETNAMESE_DATE_PATTERN]
+            for pattern in all_patterns:
+                for day_str, month_str, year_str in pattern.findall(text):
+                    day_fmt   = day_str.zfill(2)
+                    month_fmt = month_str.zfill(2)
+                    year_fmt  = year_str
+                    if self.is_valid_date(day_str, month_str, year_str):
+                        return(f"{day_fmt}/{month_fmt}/{year_fmt}")
+            return None
     
\ No newline at end of file
@@ -1,9 +1,53 @@
 import re
+import zipfile
+from contextlib import closing
+from xml.etree.ElementTree import iterparse, ParseError
 from docx import Document
 import logging
 from date_regex import DateRegexExtractor
+from file_source import open_source
 import time
+import os
+import sys
 from path import Path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from source.timing import stage
+
+
+# WordprocessingML namespaces: transitional (what Word writes) and strict
+WORD_NAMESPACES = (
+    "http://schemas.openxmlformats.org/wordprocessingml/2006/main",
+    "http://purl.oclc.org/ooxml/wordprocessingml/main",
+)
+
+
+def _word_tags(name):
+    return {f"{{{namespace}}}{name}" for namespace in WORD_NAMESPACES}
+
+
+PARAGRAPH_TAGS = _word_tags("p")
+TEXT_TAGS = _word_tags("t")
+TAB_TAGS = _word_tags("tab")
+BREAK_TAGS = _word_tags("br") | _word_tags("cr")
+# Parts whose direct children are finished blocks (paragraphs, tables) that can be dropped
+CONTAINER_TAGS = _word_tags("body") | _word_tags("hdr") | _word_tags("ftr")
+
+_PART_NUMBER = re.compile(r"(\d+)")
+
+
+def _docx_parts(names):
+    """
+    XML parts holding the document text, in reading order: the body (with its tables and
+    text boxes), then the headers, then the footers.
+    """
+    def part_order(name):
+        number = _PART_NUMBER.search(name)
+        return int(number.group(1)) if number else 0
+
+    headers = sorted((n for n in names if re.fullmatch(r"word/header\d*\.xml", n)), key=part_order)
+    footers = sorted((n for n in names if re.fullmatch(r"word/footer\d*\.xml", n)), key=part_order)
+    return ["word/document.xml"] + headers + footers
 
 
 class DocxExtractor(DateRegexExtractor):
@@ -11,15 +55,86 @@ class DocxExtractor(DateRegexExtractor):
     A class to handle DOCX reading and extraction of date
     """
 
-    def extract_text_from_docx(self, docx_path):
+    def __init__(self, chunk_paragraphs=64):
+        """
+        :param chunk_paragraphs: Number of paragraphs searched for a date at once by the streaming reader.
+        """
+        self.chunk_paragraphs = chunk_paragraphs
+
+    def iter_paragraphs(self, docx_path, data=None):
+        """
+        Stream the paragraphs of a DOCX straight from its XML parts, without building a document model.
+
+        Paragraphs come in reading order: body, tables and text boxes as they appear, then
+        headers and footers. Tabs and line breaks are kept as '\t' and '\n'. Every block is
+        dropped from the XML tree once read, so memory stays flat whatever the document size.
+
+        :param data: DOCX content in memory, read instead of `docx_path` when given.
+        :return: Generator of paragraph texts.
+        """
+        with open_source(docx_path, data) as docx_file, zipfile.ZipFile(docx_file) as archive:
+            names = set(archive.namelist())
+            for part in _docx_parts(names):
+                if part not in names:
+                    continue
+                with archive.open(part) as xml_file:
+                    # a paragraph can hold a text box holding paragraphs, hence the stack
+                    paragraphs = []
+                    elements = []
+                    for event, elem in iterparse(xml_file, events=("start", "end")):
+                        if event == "start":
+                            elements.append(elem)
+                            if elem.tag in PARAGRAPH_TAGS:
+                                paragraphs.append([])
+                            continue
+
+                        elements.pop()
+                        if elem.tag in TEXT_TAGS:
+                            if paragraphs and elem.text:
+                                paragraphs[-1].append(elem.text)
+                        elif elem.tag in TAB_TAGS:
+                            if paragraphs:
+                                paragraphs[-1].append("\t")
+                        elif elem.tag in BREAK_TAGS:
+                            if paragraphs:
+                                paragraphs[-1].append("\n")
+                        elif elem.tag in PARAGRAPH_TAGS:
+                            yield "".join(paragraphs.pop())
+
+                        if elements and elements[-1].tag in CONTAINER_TAGS:
+                            # a top-level block is done, free it
+                            elements[-1].clear()
+
+    def extract_date_pattern_stream(self, paragraphs):
+        """
+        Search paragraphs for a date line chunk by chunk, stopping at the first match.
+
+        :param paragraphs: Iterable of paragraph texts, not consumed past the matching chunk.
+        :return: The sentence that matches the date pattern, or None if no date is found.
+        """
+        chunk = []
+        for paragraph in paragraphs:
+            chunk.append(paragraph)
+            if len(chunk) >= self.chunk_paragraphs:
+                date_pattern = self.extract_date_pattern("\n".join(chunk))
+                if date_pattern:
+                    return date_pattern
+                chunk = []
+        if chunk:
+            return self.extract_date_pattern("\n".join(chunk))
+        return None
+
+    def extract_text_from_docx(self, docx_path, data=None):
         """
         Reads the content of a DOCX file (since DOCX is not paginated like PDFs, it returns the full text).
 
         :param page_num: Unused, included for interface consistency.
+        :param data: DOCX content in memory, read instead of `docx_path` when given.
         :return: The content of the document as a string.
         """
         try:
-            doc = Document(docx_path)
+            with open_source(docx_path, data) as docx_file:
+                doc = Document(docx_file)
             content = "\n".join([para.text for para in doc.paragraphs])
             return content
         except Exception as e:
@@ -34,24 +149,34 @@ class DocxExtractor(DateRegexExtractor):
         :return: The sentence that matches the date pattern, or None if no date is found.
         """
         
-        sentences = content.split('\n')
-        pattern_id = self.find_date_pattern(sentences)
+        # the whole document is normalized and searched at once
+        with stage("regex"):
+            pattern_id = next(self.iter_page_date_lines(content), None)
         if pattern_id is not None:
-            return sentences[pattern_id].strip()
+            return content.split('\n')[pattern_id].strip()
         return None
 
-    def extract(self, docx_path):
+    def extract(self, docx_path, data=None):
         """
         Main process to extract the date.
 
+        Reads the XML parts directly (see iter_paragraphs), and falls back to python-docx
+        when the file cannot be streamed (not a zip, broken XML, ...).
+
         :param pattern: The date pattern to extract.
+        :param data: DOCX content in memory, read instead of `docx_path` when given.
         :return: The date normalized to 'dd/mm/yyyy' format, or None if no date is found.
         """
-        content = self.extract_text_from_docx(docx_path)
-        if not content:
-            return None
-        
-        date_pattern = self.extract_date_pattern(content)
+        try:
+            with closing(self.iter_paragraphs(docx_path, data)) as paragraphs:
+                date_pattern = self.extract_date_pattern_stream(paragraphs)
+        except (zipfile.BadZipFile, ParseError, KeyError, OSError) as e:
+            logging.info(f"Streaming DOCX read failed ({e}), using python-docx")
+            content = self.extract_text_from_docx(docx_path, data)
+            if not content:
+                return None
+            date_pattern = self.extract_date_pattern(content)
+
         if not date_pattern:
             return None
         
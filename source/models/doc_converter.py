@@ -0,0 +1,240 @@
+import os
+import time
+import queue
+import shutil
+import signal
+import socket
+import threading
+import subprocess
+from pathlib import Path
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config.config import load_config
+
+doc_config = load_config().get('doc', {})
+
+# Command line of the supported direct .doc text extractors, the file path is appended
+TEXT_EXTRACTORS = {
+    "antiword": ["antiword", "-m", "UTF-8.txt", "-w", "0"],
+    "catdoc": ["catdoc", "-d", "utf-8", "-w"],
+}
+
+
+class DocConversionError(Exception):
+    pass
+
+
+class _ConverterWorker:
+    """
+    One long-lived headless office process (unoserver) with its own port and profile.
+    """
+
+    def __init__(self, index, port, uno_port, profile_dir, command, start_timeout, logger=None):
+        self.index = index
+        self.port = port
+        self.uno_port = uno_port
+        self.profile_dir = profile_dir
+        self.command = command
+        self.start_timeout = start_timeout
+        self.logger = logger
+        self.process = None
+        self.restarts = 0
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.process = subprocess.Popen(
+            [self.command,
+             "--interface", "127.0.0.1", "--port", str(self.port),
+             "--uno-interface", "127.0.0.1", "--uno-port", str(self.uno_port),
+             # a profile per worker, office processes cannot share one
+             "--user-installation", Path(self.profile_dir).resolve().as_uri()],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + self.start_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise DocConversionError(f"Converter {self.index} exited on start with code {self.process.returncode}")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=1):
+                    break
+            except OSError:
+                time.sleep(0.2)
+        else:
+            self.stop()
+            raise DocConversionError(f"Converter {self.index} did not start within {self.start_timeout}s")
+        if self.logger:
+            self.logger.info(f"Started .doc converter {self.index} on port {self.port} (pid {self.process.pid})")
+
+    def stop(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            try:
+                # unoserver starts soffice as a child, stop the whole group
+                os.killpg(self.process.pid, signal.SIGTERM)
+                self.process.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                try:
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                except OSError:
+                    pass
+                self.process.wait()
+
+    def restart(self):
+        self.stop()
+        self.restarts += 1
+        self.start()
+
+
+class DocConverterPool:
+    """
+    A pool of long-lived headless office processes converting .doc files to .docx.
+
+    Starting LibreOffice takes seconds, so every worker is started once (on first use)
+    and reused. A conversion checks out an idle worker, so up to `workers` conversions
+    run at once and the others wait. A worker that died or timed out is restarted
+    before its next conversion.
+    """
+
+    def __init__(self, workers=None, base_port=None, timeout=None, start_timeout=None,
+                 profile_dir=None, server_command=None, client_command=None,
+                 text_extractor=None, logger=None):
+        """
+        :param workers: Number of office processes. Defaults to `doc.converter_workers` in config.yaml.
+        :param base_port: Worker i listens on base_port + 2 * i (and + 1 for UNO). Defaults to `doc.base_port`.
+        :param timeout: Seconds allowed per conversion, waiting for a free worker included.
+            Defaults to `doc.timeout`.
+        :param start_timeout: Seconds allowed for a worker to start. Defaults to `doc.start_timeout`.
+        :param profile_dir: Folder of the per-worker office profiles. Defaults to `doc.profile_dir`.
+        :param server_command: unoserver executable. Defaults to `doc.server_command`.
+        :param client_command: unoconvert executable. Defaults to `doc.client_command`.
+        :param text_extractor: "antiword", "catdoc" or None, tool reading the text of a .doc
+            without converting it. Defaults to `doc.text_extractor`.
+        """
+        self.workers = workers if workers is not None else doc_config.get('converter_workers', 2)
+        self.base_port = base_port if base_port is not None else doc_config.get('base_port', 2003)
+        self.timeout = timeout if timeout is not None else doc_config.get('timeout', 60)
+        self.start_timeout = start_timeout if start_timeout is not None else doc_config.get('start_timeout', 30)
+        self.profile_dir = profile_dir if profile_dir is not None else doc_config.get('profile_dir', './cache/office_profiles')
+        self.server_command = server_command or doc_config.get('server_command', 'unoserver')
+        self.client_command = client_command or doc_config.get('client_command', 'unoconvert')
+        self.text_extractor = text_extractor if text_extractor is not None else doc_config.get('text_extractor')
+        self.logger = logger
+
+        self._idle = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._all:
+                return
+            for i in range(self.workers):
+                port = self.base_port + 2 * i
+                worker = _ConverterWorker(
+                    index=i,
+                    port=port,
+                    uno_port=port + 1,
+                    profile_dir=os.path.join(self.profile_dir, f"worker_{i}"),
+                    command=self.server_command,
+                    start_timeout=self.start_timeout,
+                    logger=self.logger,
+                )
+                self._all.append(worker)
+                self._idle.put(worker)
+
+    def start(self):
+        """
+        Start every office process now rather than on the first conversion.
+        """
+        self._ensure_workers()
+        for worker in self._all:
+            if not worker.alive():
+                worker.start()
+
+    def extract_text(self, doc_path):
+        """
+        Read the text of a .doc directly with the configured text extractor, without conversion.
+
+        :return: The text, or None if no extractor is configured / installed or it failed.
+        """
+        args = TEXT_EXTRACTORS.get(self.text_extractor or "")
+        if args is None or shutil.which(args[0]) is None:
+            return None
+        try:
+            result = subprocess.run(args + [doc_path], capture_output=True, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            if self.logger:
+                self.logger.warning(f"{args[0]} timed out on {doc_path}")
+            return None
+        if result.returncode != 0:
+            if self.logger:
+                self.logger.info(f"{args[0]} failed on {doc_path}: {result.stderr.decode('utf-8', 'replace').strip()}")
+            return None
+        return result.stdout.decode("utf-8", "replace")
+
+    def convert(self, doc_path, docx_path):
+        """
+        Convert a .doc file to .docx on an idle worker.
+
+        :raises DocConversionError: No worker freed up in time, the conversion failed or timed out.
+        """
+        self._ensure_workers()
+        deadline = time.monotonic() + self.timeout
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise DocConversionError(f"No .doc converter available within {self.timeout}s")
+
+        try:
+            if worker.process is None:
+                worker.start()
+            elif not worker.alive():
+                if self.logger:
+                    self.logger.warning(f"Converter {worker.index} is not running "
+                                        f"(code {worker.process.returncode}), restarting")
+                worker.restart()
+
+            remaining = max(deadline - time.monotonic(), 1)
+            try:
+                result = subprocess.run(
+                    [self.client_command,
+                     "--host", "127.0.0.1", "--port", str(worker.port),
+                     "--convert-to", "docx", doc_path, docx_path],
+                    capture_output=True,
+                    timeout=remaining,
+                )
+            except subprocess.TimeoutExpired:
+                # the office process may be stuck on this file, do not reuse it as is
+                if self.logger:
+                    self.logger.error(f"Converter {worker.index} timed out on {doc_path}, stopping it")
+                worker.stop()
+                raise DocConversionError(f"Conversion timed out after {self.timeout}s")
+
+            # the caller may have created docx_path empty (mkstemp), an empty file is no output
+            if result.returncode != 0 or not os.path.exists(docx_path) or os.path.getsize(docx_path) == 0:
+                message = result.stderr.decode("utf-8", "replace").strip()
+                raise DocConversionError(f"Conversion failed: {message or 'no output file'}")
+            return docx_path
+        finally:
+            # a dead or stopped worker is restarted on its next checkout
+            self._idle.put(worker)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "idle": self._idle.qsize(),
+            "alive": sum(1 for worker in self._all if worker.alive()),
+            "restarts": sum(worker.restarts for worker in self._all),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self._all:
+                worker.stop()
@@ -0,0 +1,63 @@
+import io
+import os
+import hashlib
+import tempfile
+from contextlib import contextmanager
+
+
+def open_source(file_path, data=None):
+    """
+    Open a document for binary reading, from memory when its bytes are given.
+
+    :param file_path: Path to the file, or only its name when `data` is given.
+    :param data: The file content as bytes, or None to read `file_path` from disk.
+    :return: A binary file object, to be closed by the caller.
+    """
+    if data is not None:
+        return io.BytesIO(data)
+    return open(file_path, 'rb')
+
+
+def content_hash(file_path, data=None, chunk_size=1024 * 1024):
+    """
+    SHA-256 of a document, the same digest the API computes on upload.
+
+    :param file_path: Path to the file, or only its name when `data` is given.
+    :param data: The file content as bytes, or None to read `file_path` from disk.
+    :return: Hex digest.
+    """
+    sha256 = hashlib.sha256()
+    if data is not None:
+        sha256.update(data)
+    else:
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+@contextmanager
+def on_disk(file_path, data=None, folder=None, suffix=""):
+    """
+    Path of a document on disk, for tools that only read files (poppler). When its bytes
+    are in memory they are written once to a temp file, removed on exit.
+
+    :param file_path: Path to the file, or only its name when `data` is given.
+    :param data: The file content as bytes, or None if `file_path` is already on disk.
+    :param folder: Folder of the temp file, the system temp folder if None.
+    """
+    if data is None:
+        yield file_path
+        return
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=folder)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
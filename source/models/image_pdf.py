@@ -1,38 +1,248 @@
 import os
 import time
 import logging
-from ocr import Ocr
+import threading
+import numpy as np
+from ocr import Ocr, model_status
 from path import Path
-from pdf2image import convert_from_path
+from contextlib import closing
+from raster import page_count, iter_pages, render_page
+from raster_cache import RasterCache
+from crop_writer import CropWriter
+from file_source import content_hash as get_content_hash, on_disk
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from config.logging_config import setup_logging
+from config.config import load_config
+from source import timing
 
 # Initialize the logger
 logger = setup_logging("ScanPdfExtractor")
+config = load_config()
+ocr_config = config.get('ocr', {})
+temp_folder = config.get('sys', {}).get('temp_extract_path') or None
+raster_cache_config = config.get('raster_cache', {})
+crop_config = config.get('crop_images', {})
+
+# Ocr of this process, built on first use (see get_ocr)
+_ocr = None
+_ocr_lock = threading.Lock()
+
+
+def build_crop_writer():
+    """
+    CropWriter from the `crop_images` section of config.yaml, None if disabled.
+    """
+    if not crop_config.get('enabled', False):
+        return None
+    retention_hours = crop_config.get('retention_hours')
+    max_mb = crop_config.get('max_mb')
+    return CropWriter(
+        folder=crop_config.get('folder', './temp_save'),
+        policy=crop_config.get('save', 'all'),
+        min_confidence=crop_config.get('min_confidence', 0.8),
+        sample_rate=crop_config.get('sample_rate', 1.0),
+        queue_size=crop_config.get('queue_size', 256),
+        max_age_seconds=retention_hours * 3600 if retention_hours else None,
+        max_total_bytes=max_mb * 1024 * 1024 if max_mb else None,
+        logger=logger,
+    )
+
+
+def get_ocr():
+    """
+    The Ocr of this process. Building it is cheap, its models are only loaded on first
+    use or by OcrExtractor.warm_up.
+    """
+    global _ocr
+    with _ocr_lock:
+        if _ocr is None:
+            _ocr = Ocr(
+                logger = logger,
+                crop_writer=build_crop_writer(),
+                cpu_threads=ocr_config.get('cpu_threads', 8),
+                batch_recognition=ocr_config.get('batch_recognition', True),
+                max_candidates=ocr_config.get('max_candidates', 8),
+                orientation=ocr_config.get('orientation', 'none'),
+                orientation_boxes=ocr_config.get('orientation_boxes', 12),
+            )
+        return _ocr
+
 
-ocr = Ocr(
-    logger = logger,
-    save_crop_img=True,
-    save_folder="temp_save/",
-)
-        
 class OcrExtractor():
-    def __init__(self, max_pages=10):
+    def __init__(self, max_pages=10, pool_workers=None, threads_per_worker=None,
+                 detection_dpi=None, recognition_dpi=None, prefetch_pages=None,
+                 page_order=None, roi_bands=None, raster_cache=None):
+        """
+        :param max_pages: Maximum number of pages to OCR per document.
+        :param pool_workers: Number of OCR worker processes, 0 to OCR in this process.
+            Defaults to `ocr.pool_workers` in config.yaml.
+        :param threads_per_worker: CPU threads per worker process.
+            Defaults to `ocr.threads_per_worker` in config.yaml.
+        :param detection_dpi: Resolution pages are rendered at for text detection.
+            Defaults to `ocr.detection_dpi` in config.yaml.
+        :param recognition_dpi: Resolution the date line is cropped at for VietOCR.
+            Defaults to `ocr.recognition_dpi` in config.yaml.
+        :param prefetch_pages: Pages rendered ahead of OCR in the background.
+            Defaults to `ocr.prefetch_pages` in config.yaml.
+        :param page_order: "sequential" (1, 2, 3, ...) or "first_last" (1, last, 2, 3, ...).
+            Defaults to `ocr.page_order` in config.yaml.
+        :param roi_bands: Horizontal bands OCR-ed before the full page, as
+            {"first": [top, bottom], "last": [top, bottom]} in fractions of the page height.
+            Defaults to `ocr.roi_bands` in config.yaml.
+        :param raster_cache: RasterCache of rendered pages, shared by re-runs of the same document.
+            Built from the `raster_cache` section of config.yaml when not given.
+        """
         self.max_pages = max_pages
         self.logger = logger
+        self.detection_dpi = detection_dpi if detection_dpi is not None else ocr_config.get('detection_dpi', 300)
+        self.recognition_dpi = recognition_dpi if recognition_dpi is not None else ocr_config.get('recognition_dpi', 300)
+        self.prefetch_pages = prefetch_pages if prefetch_pages is not None else ocr_config.get('prefetch_pages', 1)
+        self.page_order = page_order if page_order is not None else ocr_config.get('page_order', 'sequential')
+        self.roi_bands = roi_bands if roi_bands is not None else (ocr_config.get('roi_bands') or {})
+        if raster_cache is None and raster_cache_config.get('enabled', False):
+            raster_cache = RasterCache(
+                path=raster_cache_config.get('path', './cache/rasters'),
+                max_bytes=raster_cache_config.get('max_mb', 4096) * 1024 * 1024,
+                queue_size=raster_cache_config.get('queue_size', 4),
+                logger=logger,
+            )
+        self.raster_cache = raster_cache
+
+        # tries / hits per strategy ("roi_first", "page_last", ...), see strategy_stats
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+
+        if pool_workers is None:
+            pool_workers = ocr_config.get('pool_workers', 0)
+        if threads_per_worker is None:
+            threads_per_worker = ocr_config.get('threads_per_worker', 2)
+        self.pool = None
+        if pool_workers > 0:
+            from ocr_pool import OcrWorkerPool
+            self.pool = OcrWorkerPool(
+                workers=pool_workers,
+                threads_per_worker=threads_per_worker,
+                max_pages=max_pages,
+                logger=logger,
+            )
         
-    def process_single_page_pdf(self, file_path, page_num, page_image=None):
+    def warm_up(self):
+        """
+        Load the OCR models now rather than on the first scanned document:
+        in the worker processes with a pool, in this process otherwise.
+        """
+        if self.pool is not None:
+            self.pool.start()
+        else:
+            get_ocr().load_models()
+
+    @property
+    def settings(self):
+        """
+        The OCR settings that can change which date is read, part of PipelineExtractor.version.
+        """
+        recognizer = ocr_config.get('recognizer', 'torch')
+        if recognizer == 'onnx' and ocr_config.get('onnx_quantized', True):
+            recognizer = 'onnx-int8'
+        bands = ",".join(f"{position}={top}-{bottom}" for position, (top, bottom) in sorted(self.roi_bands.items()))
+        ocr = get_ocr()
+        return (f"{ocr.orientation}:{recognizer}:{self.detection_dpi}-{self.recognition_dpi}:"
+                f"{self.page_order}:{bands}:{ocr.max_candidates}")
+
+    def model_status(self):
+        """
+        :return: Dict with "ready" (models loaded, or workers started with a pool) and details.
+        """
+        if self.pool is not None:
+            return {"ready": self.pool.started, "mode": "pool", "workers": self.pool.workers}
+        status = model_status()
+        status["ready"] = all(state == "ready" for state in status["models"].values())
+        status["mode"] = "in_process"
+        return status
+
+    def crop_stats(self):
+        """
+        Counters of the crop writer of this process. Empty with a pool (the workers save
+        the crops) or before the first OCR.
+        """
+        if self.pool is not None or _ocr is None or _ocr.crop_writer is None:
+            return {}
+        return _ocr.crop_writer.stats()
+
+    def close_crop_writer(self):
+        """
+        Write the queued crops of this process, at shutdown.
+        """
+        if _ocr is not None and _ocr.crop_writer is not None:
+            _ocr.crop_writer.close()
+
+    def page_schedule(self, num_pages, max_pages):
+        """
+        Order in which the pages of a document are visited, at most `max_pages` of them.
+
+        :return: List of page numbers, starting at 1.
+        """
+        pages = list(range(1, num_pages + 1))
+        if self.page_order == "first_last" and num_pages > 1:
+            pages = [1, num_pages] + pages[1:-1]
+        return pages[:max_pages]
+
+    def process_single_page_pdf(self, file_path, page_num, page_image=None, band=None,
+                                content_hash=None, orientation=None):
         """
         Process a single page asynchronously based on its type.
+
+        :param file_path: Path to the PDF file on disk, rendered again at recognition_dpi if needed.
+        :param band: Optional [top, bottom] fractions of the page height, to OCR only that band.
+        :param content_hash: Hash of the document, the key of its pages in the raster cache.
+        :param orientation: Orientation of the document shared by its pages ({"angle": None,
+            0 or 180}) with orientation "per_document", None otherwise. While the angle is None
+            the boxes of this page's detection vote on it and it is set; the page is then
+            rotated before OCR and its boxes are not classified one by one.
         """
         page_start = time.time()
         try:
+            hires_page = None
+            if self.recognition_dpi != self.detection_dpi:
+                # detection ran at detection_dpi, render the page again only if a date line was found
+                def hires_page():
+                    return render_page(file_path, page_num + 1, self.recognition_dpi,
+                                       self.raster_cache, content_hash)
+
+            def prepare(angle):
+                image, hires = page_image, hires_page
+                if angle:
+                    image, hires = self.rotate_page(image, hires, angle)
+                if band is not None:
+                    image, hires = self.crop_band(image, hires, band)
+                return np.array(image), hires
+
+            ocr = get_ocr()
+            angle = orientation["angle"] if orientation is not None else None
+            image, hires = prepare(angle)
+            detection_results = None
+            if orientation is not None and angle is None:
+                # first detection of the document: its widest boxes vote on the orientation,
+                # it is reused as is unless the page is upside down
+                detection_results = ocr.detect_text(image, cls=False)
+                angle = ocr.vote_orientation(image, detection_results)
+                if angle is not None:
+                    orientation["angle"] = angle
+                if angle:
+                    self.logger.info(f"Pages rotated by {angle} degrees from page {page_num + 1}")
+                    image, hires = prepare(angle)
+                    detection_results = None
+
             date = ocr.process_page(
                 pdf_path=file_path,
                 page_num=page_num + 1,
-                page_image=page_image,
+                page_image=image,
+                hires_page=hires,
+                scale=self.recognition_dpi / self.detection_dpi,
+                cls=orientation is None,
+                detection_results=detection_results,
             )
 
             # measure total runtime for this page
@@ -54,42 +264,155 @@ class OcrExtractor():
             self.logger.error(f"Page {page_num + 1} - Error processing: {e}")
             return None
 
-        
+    def crop_band(self, page_image, hires_page, band):
+        """
+        Keep only a horizontal band of a page (and of its high resolution version).
+        """
+        image = np.array(page_image)
+        height = image.shape[0]
+        top, bottom = band
+        band_image = image[int(height * top):int(height * bottom)]
 
-    def extract(self, file_path):
+        band_hires_page = None
+        if hires_page is not None:
+            def band_hires_page():
+                hires_image = np.array(hires_page())
+                hires_height = hires_image.shape[0]
+                return hires_image[int(hires_height * top):int(hires_height * bottom)]
+        return band_image, band_hires_page
+
+    def rotate_page(self, page_image, hires_page, angle):
         """
-        Process pages sequentially based on document type.
+        Rotate a page (and its high resolution version) by a multiple of 90 degrees, counterclockwise.
+        """
+        turns = angle // 90
+        rotated_image = np.ascontiguousarray(np.rot90(np.array(page_image), turns))
 
-        :param file_path: Path to the document file.
-        :return: Extracted date or None.
+        rotated_hires_page = None
+        if hires_page is not None:
+            def rotated_hires_page():
+                return np.ascontiguousarray(np.rot90(np.array(hires_page()), turns))
+        return rotated_image, rotated_hires_page
+
+    def ocr_page(self, file_path, page_num, num_pages, page_image, content_hash=None, orientation=None):
         """
-        def pdf_pages_to_image(pdf_path, n_pages=500):
-            """
-            return a list of page images from a PDF.
-            """
-            list_images = convert_from_path(pdf_path,
-                                            first_page=1, 
-                                            last_page=n_pages, 
-                                            dpi=300)
-            return list_images, len(list_images)
+        OCR one page: its region of interest first if one is configured for it,
+        then the full page unless the band gave a real date. A "Blank date" from the band
+        (only the keyword line, or a false blank) does not end the page: the full page
+        decides, as without a band.
+
+        :param orientation: Orientation of the document, see process_single_page_pdf.
+
+        :return: Tuple (date or "Blank date" or None, list of (strategy, hit) attempts).
+        """
+        if page_num == 1:
+            position = "first"
+        elif page_num == num_pages:
+            position = "last"
+        else:
+            position = "other"
+
+        attempts = []
+        band = self.roi_bands.get(position)
+        if band:
+            date = self.process_single_page_pdf(file_path, page_num - 1, page_image, band=band,
+                                                content_hash=content_hash, orientation=orientation)
+            hit = date is not None and date != "Blank date"
+            attempts.append((f"roi_{position}", hit))
+            if hit:
+                return date, attempts
+
+        date = self.process_single_page_pdf(file_path, page_num - 1, page_image,
+                                            content_hash=content_hash, orientation=orientation)
+        attempts.append((f"page_{position}", date is not None))
+        return date, attempts
+
+    def extract_with_strategy(self, file_path, data=None, num_pages=None, content_hash=None):
+        """
+        OCR the pages of a document in schedule order until a date line is found.
+
+        :param num_pages: Number of pages of the document if already known, read with pdfinfo otherwise.
+        :param content_hash: SHA-256 of the document if already known (e.g. the upload digest),
+            computed here only when the raster cache needs it.
+        :return: Tuple (date or None, list of (strategy, hit) attempts).
+        """
+        attempts = []
         try:
-            list_images, num_pages = pdf_pages_to_image(file_path, self.max_pages)
-            max_pages = min(self.max_pages, num_pages)
-            if num_pages == 0:
-                self.logger.warning("No pages found in the document.")
-                return None
+            if self.raster_cache is None:
+                content_hash = None
+            elif content_hash is None:
+                content_hash = get_content_hash(file_path, data)
+            # poppler reads files: a document in memory is written to disk once, for all its pages
+            with on_disk(file_path, data, temp_folder, suffix=".pdf") as pdf_path:
+                return self._ocr_pages(pdf_path, num_pages, content_hash, attempts)
+        except Exception as e:
+            self.logger.error(f"Error reading file: {e}")
+            return None, attempts
+
+    def _ocr_pages(self, file_path, num_pages, content_hash, attempts):
+        if num_pages is None:
+            num_pages = page_count(file_path, self.raster_cache, content_hash)
+        max_pages = min(self.max_pages, num_pages)
+        if num_pages == 0:
+            self.logger.warning("No pages found in the document.")
+            return None, attempts
 
-            for page_num in range(max_pages):
-                date = self.process_single_page_pdf(file_path, page_num, list_images[page_num])
+        # render pages lazily, a page is only rasterized if no date was found before it
+        pages = iter_pages(file_path, self.page_schedule(num_pages, max_pages),
+                           dpi=self.detection_dpi, prefetch=self.prefetch_pages,
+                           cache=self.raster_cache, content_hash=content_hash)
+        # orientation "per_document": voted on the first detection with text, then
+        # every page is rotated up front and detected without per-box classification
+        orientation = {"angle": None} if get_ocr().orientation == "per_document" else None
+        with closing(pages):
+            for page_num, page_image in pages:
+                date, page_attempts = self.ocr_page(file_path, page_num, num_pages, page_image,
+                                                    content_hash, orientation)
+                attempts.extend(page_attempts)
                 if date:
                     if date == "Blank date": 
-                        return None
+                        return None, attempts
                     else:                     
-                        return date
-            return None
-        except Exception as e:
-            self.logger.error(f"Error reading file: {e}")
-            return None
+                        return date, attempts
+        return None, attempts
+
+    def extract(self, file_path, data=None, num_pages=None, content_hash=None):
+        """
+        Process pages sequentially based on document type.
+
+        :param file_path: Path to the document file.
+        :param data: PDF content in memory, rendered instead of `file_path` when given.
+        :param num_pages: Number of pages of the document if already known (e.g. from PdfDocument).
+        :param content_hash: SHA-256 of the document if already known, see extract_with_strategy.
+        :return: Extracted date or None.
+        """
+        if self.pool is not None:
+            date, attempts, stages = self.pool.extract(file_path, data, num_pages, content_hash)
+            timings = timing.current()
+            if timings is not None:
+                timings.merge(stages)
+        else:
+            date, attempts = self.extract_with_strategy(file_path, data, num_pages, content_hash)
+        self.record_attempts(attempts)
+        return date
+
+    def record_attempts(self, attempts):
+        with self._stats_lock:
+            for strategy, hit in attempts:
+                stats = self.stats.setdefault(strategy, {"tries": 0, "hits": 0})
+                stats["tries"] += 1
+                stats["hits"] += int(hit)
+
+    def strategy_stats(self):
+        """
+        Tries, hits and hit rate of every page / region-of-interest strategy, to tune
+        `ocr.page_order` and `ocr.roi_bands`.
+        """
+        with self._stats_lock:
+            return {
+                strategy: dict(stats, hit_rate=round(stats["hits"] / stats["tries"], 3))
+                for strategy, stats in self.stats.items()
+            }
 
 if __name__ == "__main__":
     file_path = r"D:/contract_date_extractor/temp/2025-05-27/1748343684392.pdf"
@@ -1,73 +1,287 @@
-import matplotlib.pyplot as plt
 from PIL import Image
-import torch
-from pdf2image import convert_from_path
-from vietocr.tool.predictor import Predictor
-from vietocr.tool.config import Cfg
-from paddleocr import PaddleOCR
 from date_regex import DateRegexExtractor
+from model_config import WEIGHTS_PATH
 import numpy as np
 from path import Path 
 import cv2
 import os 
-from datetime import datetime
+import time
+import threading
+from itertools import islice
 import logging
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from source.timing import stage, record
+from config.config import load_config
+from config.logging_config import setup_logging
 logging.getLogger("ppocr").propagate = False
 logging.getLogger("ppocr").disabled = True
 
-config = Cfg.load_config_from_name('vgg_seq2seq') 
-config['weights'] = r"source\weights\hand_ocr.pth"
-config['device'] = 'cuda:0' if torch.cuda.is_available() else 'cpu'
-vietocr = Predictor(config)
+logger = setup_logging("Ocr")
+ocr_config = load_config().get('ocr', {})
+
+# Models are built once per process, on first use or by a warm-up (see load_models).
+# torch, vietocr and paddleocr are only imported then, processes that never OCR never load them.
+vietocr = None
+paddleocr = None
+# "not_loaded" -> "loading" -> "ready" / "failed", per model, see model_status
+_model_state = {"vietocr": "not_loaded", "paddleocr": "not_loaded"}
+_load_seconds = {}
+_load_error = None
+# Backend VietOCR runs on: "torch", "onnx" or "onnx-int8", see _build_vietocr
+_recognizer = None
+
+# The shared models are not safe to call from several executor threads at once
+model_lock = threading.Lock()
+_load_lock = threading.Lock()
+
+
+def build_torch_vietocr(device=None, threads=None):
+    """
+    The PyTorch VietOCR Predictor (vgg_seq2seq) with the handwriting weights.
+
+    :param device: Torch device, defaults to cuda:0 if available else cpu.
+    :param threads: Torch CPU threads, None to keep the torch default.
+    """
+    import torch
+    from vietocr.tool.predictor import Predictor
+    from vietocr.tool.config import Cfg
+
+    if threads:
+        torch.set_num_threads(threads)
+    config = Cfg.load_config_from_name('vgg_seq2seq')
+    config['weights'] = WEIGHTS_PATH["hand_ocr"]
+    config['device'] = device or ('cuda:0' if torch.cuda.is_available() else 'cpu')
+    return Predictor(config)
+
+
+def _build_vietocr(threads=None):
+    """
+    VietOCR on the backend of `ocr.recognizer` in config.yaml. The ONNX Runtime backend
+    falls back to PyTorch when onnxruntime or the exported models are missing.
+    """
+    global _recognizer
+    if ocr_config.get('recognizer', 'torch') == 'onnx':
+        from vietocr_onnx import OnnxRecognizer
+
+        onnx_path = ocr_config.get('onnx_path', './source/weights/vietocr_onnx')
+        try:
+            recognizer = OnnxRecognizer(onnx_path, quantized=ocr_config.get('onnx_quantized', True),
+                                        threads=threads)
+        except (ImportError, FileNotFoundError) as e:
+            logger.warning(f"VietOCR ONNX backend unavailable ({e}), using PyTorch")
+        else:
+            _recognizer = "onnx-int8" if recognizer.quantized else "onnx"
+            logger.info(f"VietOCR on ONNX Runtime: {recognizer.parts}")
+            return recognizer
+    predictor = build_torch_vietocr(threads=threads)
+    _recognizer = "torch"
+    return predictor
+
+
+def _build_paddleocr(cpu_threads):
+    from paddleocr import PaddleOCR
+
+    # the angle classifier is only loaded when some orientation handling is configured
+    use_angle_cls = ocr_config.get('orientation', 'none') != 'none'
+    return PaddleOCR(lang='en', cpu_threads=cpu_threads, use_angle_cls=use_angle_cls)
+
+
+def _load(name, build):
+    global _load_error
+    _model_state[name] = "loading"
+    start = time.time()
+    try:
+        model = build()
+    except Exception as e:
+        _model_state[name] = "failed"
+        _load_error = f"{name}: {e}"
+        raise
+    _model_state[name] = "ready"
+    _load_seconds[name] = round(time.time() - start, 2)
+    return model
 
-paddleocr = PaddleOCR(lang='en', cpu_threads=8)
+
+def load_models(cpu_threads=8, recognizer_threads=None):
+    """
+    Build the VietOCR and PaddleOCR models for this process if not built yet.
+
+    :param cpu_threads: Number of CPU threads PaddleOCR may use.
+    :param recognizer_threads: Number of CPU threads VietOCR (torch or ONNX Runtime) may
+        use, None to keep the library default.
+    :return: Tuple (vietocr, paddleocr).
+    """
+    global vietocr, paddleocr
+    with _load_lock:
+        if vietocr is None:
+            vietocr = _load("vietocr", lambda: _build_vietocr(recognizer_threads))
+        if paddleocr is None:
+            paddleocr = _load("paddleocr", lambda: _build_paddleocr(cpu_threads))
+    return vietocr, paddleocr
+
+
+def model_status():
+    """
+    Load state of the OCR models in this process, for /readyz.
+    """
+    return {
+        "models": dict(_model_state),
+        "load_seconds": dict(_load_seconds),
+        "recognizer": _recognizer,
+        "error": _load_error,
+    }
 
 
 class Ocr(DateRegexExtractor):
     def __init__(self, 
                  logger,
-                 save_crop_img=False, 
-                 save_folder="temp_save/",):
-        
+                 crop_writer=None,
+                 cpu_threads=8,
+                 batch_recognition=True,
+                 max_candidates=8,
+                 orientation="none",
+                 orientation_boxes=12):
+        """
+        :param crop_writer: CropWriter the date line crops are saved through, None to not save them.
+        :param batch_recognition: Recognize every candidate date line of a page in one
+            VietOCR batch and keep the first valid date, instead of only the first candidate.
+        :param max_candidates: Maximum number of candidate lines recognized per page.
+        :param orientation: "none" (no angle classification), "per_line" (PaddleOCR classifies
+            every detected box) or "per_document" (vote_orientation on the first detection of
+            a document, pages are then rotated up front and detected without classification).
+        :param orientation_boxes: Number of text boxes voting on the orientation.
+        """
         self.logger = logger
-        self.save_crop_img = save_crop_img
-        self.save_folder = save_folder
+        self.crop_writer = crop_writer
+        self.cpu_threads = cpu_threads
+        self.batch_recognition = batch_recognition
+        self.max_candidates = max_candidates
+        self.orientation = orientation
+        self.orientation_boxes = orientation_boxes
+
+    def load_models(self):
+        """
+        Load both models now, e.g. to warm up a process before it serves requests.
+        """
+        load_models(self.cpu_threads)
 
-        # Initialize VietOCR with a specific configuration  
-        self.vietocr = vietocr       
-        self.paddle_ocr = paddleocr
+    @property
+    def vietocr(self):
+        return load_models(self.cpu_threads)[0]
+
+    @property
+    def paddle_ocr(self):
+        return load_models(self.cpu_threads)[1]
     
-    def detect_text(self, image):
+    def detect_text(self, image, cls=True):
         """
         Detect text using PaddleOCR.
+
+        Calls the PaddleOCR text system directly, the same steps as .ocr() on an image
+        array, because .ocr() drops the time it spent on detection, angle classification
+        and recognition.
+
+        :param cls: Classify the angle of every detected box. Has no effect when the angle
+            classifier is not loaded (orientation "none").
+        :return: Same as PaddleOCR.ocr(image, cls=cls).
         """
-        return self.paddle_ocr.ocr(image, cls=True)
-    
-        
-    def save_image(self, img, folder, filename):
-        os.makedirs(folder, exist_ok=True)
-        
-        dated_folder = os.path.join(folder, datetime.now().strftime('%Y-%m-%d'))
-        os.makedirs(dated_folder, exist_ok=True)
-        
-        file_path = os.path.join(dated_folder, filename)
-        
-        cv2.imwrite(file_path, img)
-        self.logger.info(f"Saved image: {file_path}")
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        with model_lock:
+            dt_boxes, rec_res, time_dict = self.paddle_ocr(image, cls=cls)
+        record("detection", time_dict.get("det", 0.0))
+        record("angle_cls", time_dict.get("cls", 0.0))
+        record("paddle_rec", time_dict.get("rec", 0.0))
+        if not dt_boxes and not rec_res:
+            return [None]
+        return [[[box.tolist(), res] for box, res in zip(dt_boxes, rec_res)]]
+
+    def vote_orientation(self, image, detection_results):
+        """
+        Orientation of a page, by a vote of the angle classifier over the widest boxes of
+        a detection already run on it (detect_text with cls=False).
+
+        :param image: The image the detection ran on.
+        :param detection_results: Result of detect_text.
+        :return: 0 or 180 (degrees the page must be rotated by), None if the classifier is
+            not loaded or no text was found.
+        """
+        classifier = getattr(self.paddle_ocr, "text_classifier", None)
+        if classifier is None or not detection_results or not detection_results[0]:
+            return None
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        boxes = [line[0] for line in detection_results[0]]
+        # long lines vote more reliably than single words or stamps
+        boxes.sort(key=lambda box: max(point[0] for point in box) - min(point[0] for point in box), reverse=True)
+        crops = [self.crop_box(image, box) for box in boxes[:self.orientation_boxes]]
+        crops = [crop for crop in crops if crop.size > 0]
+        if not crops:
+            return None
+        with model_lock:
+            _, cls_res, cls_seconds = classifier(crops)
+        record("angle_cls", cls_seconds)
+
+        votes = {"0": 0.0, "180": 0.0}
+        for label, score in cls_res:
+            votes[label] = votes.get(label, 0.0) + score
+        return 180 if votes["180"] > votes["0"] else 0
+
+    def save_crop(self, image, file_name, page_num, outcome, confidence=None):
+        """
+        Hand a date line crop to the crop writer, which decides whether to keep it.
+
+        :param outcome: "date" if a date was read from the line, "blank" otherwise.
+        :param confidence: PaddleOCR recognition score of the line.
+        """
+        if self.crop_writer is not None:
+            self.crop_writer.submit(image, f"date_image_{file_name}_page_{page_num}.jpg", outcome, confidence)
 
-    
     def img2text(self, image):
-        result = self.vietocr.predict(image)
+        with model_lock, stage("vietocr"):
+            result = self.vietocr.predict(image)
         return result      
 
+    def img2text_batch(self, images):
+        """
+        Recognize several line images in one VietOCR call.
+        """
+        with model_lock, stage("vietocr"):
+            return self.vietocr.predict_batch(images)
+
+
+    def crop_box(self, image, box, scale=1.0):
+        """
+        Crop the axis-aligned bounding rectangle of a detected text box.
+
+        :param image: Page image as a numpy array.
+        :param box: Detected box points, in the coordinates of the detection image.
+        :param scale: Ratio between the resolution of `image` and the detection image.
+        """
+        x_min = max(int(min(point[0] for point in box) * scale), 0)
+        y_min = max(int(min(point[1] for point in box) * scale), 0)
+        x_max = int(max(point[0] for point in box) * scale)
+        y_max = int(max(point[1] for point in box) * scale)
+        return image[y_min:y_max, x_min:x_max]
 
-    def process_page(self, pdf_path, page_num=1, page_image=None):
+    def process_page(self, pdf_path, page_num=1, page_image=None, hires_page=None, scale=1.0, cls=True,
+                     detection_results=None):
         """
         Process a PDF page to extract the contract date using OCR and handwriting recognition.
+
+        :param hires_page: Optional callable returning the page at a higher resolution.
+            Detection then runs on `page_image` and only the date line is cropped from
+            the high resolution page for VietOCR.
+        :param scale: Resolution of the `hires_page` image divided by that of `page_image`.
+        :param cls: Classify the angle of every detected box, False when the page
+            orientation is already known.
+        :param detection_results: detect_text result of `page_image` if already run.
         """
         file_name = Path(pdf_path).name
         pdf_image = np.array(page_image)
-        detection_results = self.detect_text(pdf_image)
+        if detection_results is None:
+            detection_results = self.detect_text(pdf_image, cls=cls)
         
         if not detection_results or not detection_results[0]:
             self.logger.warning("No text detected on the PDF page.")
@@ -75,25 +289,37 @@ class Ocr(DateRegexExtractor):
         
         boxes = [line[0] for line in detection_results[0]]
         texts = [line[1][0] for line in detection_results[0]]
-        date_like_index = self.find_date_pattern(texts)
-        text_box = boxes[date_like_index] if date_like_index is not None else None
-        
-        if text_box is None:
+        scores = [line[1][1] for line in detection_results[0]]
+        with stage("regex"):
+            if self.batch_recognition:
+                candidates = list(islice(self.iter_date_patterns(texts), self.max_candidates))
+            else:
+                date_like_index = self.find_date_pattern(texts)
+                candidates = [date_like_index] if date_like_index is not None else []
+
+        if not candidates:
             return None
+
+        if hires_page is not None:
+            crop_image, crop_scale = np.array(hires_page()), scale
+        else:
+            crop_image, crop_scale = pdf_image, 1.0
+        crops = [(self.crop_box(crop_image, boxes[index], crop_scale), scores[index]) for index in candidates]
+        crops = [(line, score) for line, score in crops if line.size > 0]
+        if not crops:
+            return "Blank date"
+
+        line_images = [Image.fromarray(line) for line, _ in crops]
+        if len(line_images) == 1:
+            date_texts_list = [self.img2text(line_images[0])]
         else:
-            x_min = int(min(point[0] for point in text_box))
-            y_min = int(min(point[1] for point in text_box))
-            x_max = int(max(point[0] for point in text_box))
-            y_max = int(max(point[1] for point in text_box))
-            line_image_np = pdf_image[y_min:y_max, x_min:x_max]
-            if self.save_crop_img:
-                self.save_image(line_image_np, self.save_folder, f"date_image_{file_name}_page_{page_num}.jpg")
-
-            line_image = Image.fromarray(line_image_np)
-            date_texts = self.img2text(line_image)
+            date_texts_list = self.img2text_batch(line_images)
+
+        for (line_image_np, score), date_texts in zip(crops, date_texts_list):
             date = self.extract_and_format_date(date_texts)
             if date:
+                self.save_crop(line_image_np, file_name, page_num, "date", score)
                 return date
-            else:
-                return "Blank date"
-            
\ No newline at end of file
+
+        self.save_crop(crops[0][0], file_name, page_num, "blank", crops[0][1])
+        return "Blank date"
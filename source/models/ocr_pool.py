@@ -0,0 +1,108 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# OcrExtractor living in a worker process, created by _init_worker
+_worker_extractor = None
+
+
+def _init_worker(max_pages, threads_per_worker):
+    """
+    Runs once in every worker process: pin the thread count and preload both models.
+    """
+    global _worker_extractor
+    os.environ["OMP_NUM_THREADS"] = str(threads_per_worker)
+
+    import ocr
+    from image_pdf import OcrExtractor
+
+    ocr.load_models(cpu_threads=threads_per_worker, recognizer_threads=threads_per_worker)
+    _worker_extractor = OcrExtractor(max_pages=max_pages, pool_workers=0)
+
+
+def _ping(_):
+    return os.getpid()
+
+
+def _extract_in_worker(file_path, data=None, num_pages=None, content_hash=None):
+    from source.timing import collect
+
+    with collect() as timings:
+        date, attempts = _worker_extractor.extract_with_strategy(file_path, data, num_pages, content_hash)
+    return date, attempts, timings.to_dict()
+
+
+class OcrWorkerPool:
+    """
+    A pool of worker processes, each holding its own VietOCR and PaddleOCR models.
+
+    Whole documents are dispatched to the workers so a document keeps its early
+    exit on the first page with a date, while different documents are OCR-ed in
+    parallel, one per worker.
+    """
+
+    def __init__(self, workers=4, threads_per_worker=2, max_pages=10, logger=None):
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.max_pages = max_pages
+        self.logger = logger
+        self._pool = None
+        self._lock = threading.Lock()
+        # True once every worker loaded its models (start() returned)
+        self.started = False
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: torch and paddle do not survive a fork of a threaded server
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.max_pages, self.threads_per_worker),
+                )
+                if self.logger:
+                    self.logger.info(f"Started OCR worker pool: {self.workers} workers x {self.threads_per_worker} threads")
+            return self._pool
+
+    def start(self):
+        """
+        Start the worker processes and load their models now rather than on the first document.
+        """
+        pool = self._get_pool()
+        list(pool.map(_ping, range(self.workers)))
+        self.started = True
+
+    def extract(self, file_path, data=None, num_pages=None, content_hash=None):
+        """
+        OCR a document in one of the worker processes.
+
+        :param file_path: Path to the PDF file.
+        :param data: PDF content in memory, sent to the worker instead of `file_path` when given.
+        :param num_pages: Number of pages of the document if already known.
+        :param content_hash: SHA-256 of the document if already known, the key of its pages in the raster cache.
+        :return: Tuple (date or None, list of (strategy, hit) attempts, dict stage -> seconds
+            measured in the worker).
+        """
+        pool = self._get_pool()
+        try:
+            return pool.submit(_extract_in_worker, file_path, data, num_pages, content_hash).result()
+        except BrokenProcessPool as e:
+            # a worker died (e.g. out of memory), start a fresh pool for the next documents
+            if self.logger:
+                self.logger.error(f"OCR worker pool broken, restarting: {e}")
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+                    self.started = False
+            pool.shutdown(wait=False)
+            return None, [], {}
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
+                self.started = False
@@ -1,9 +1,62 @@
 import re
-from PyPDF2 import PdfReader
+import os
+import sys
 from date_regex import DateRegexExtractor
+from pdf_backends import get_backend
 import logging
 import time
 from path import Path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config.config import load_config
+from source.timing import stage
+
+pdf_config = load_config().get('pdf', {})
+
+
+class PdfDocument:
+    """
+    A PDF parsed once and shared by the type check, the text extraction and the OCR fallback.
+    Page texts are extracted on demand and cached, so a page is never extracted twice.
+    """
+
+    def __init__(self, pdf_path, data=None, backend=None):
+        """
+        :param pdf_path: Path to the PDF file.
+        :param data: PDF content in memory, read instead of `pdf_path` when given.
+        :param backend: PdfTextBackend reading the text, PyPDF2 by default.
+        """
+        self.pdf_path = pdf_path
+        self.backend = backend if backend is not None else get_backend()
+        self._handle = self.backend.open(pdf_path, data)
+        try:
+            self.num_pages = self.backend.page_count(self._handle)
+        except Exception:
+            self.backend.close(self._handle)
+            raise
+        self._texts = {}
+
+    def page_text(self, index):
+        """
+        Text of a page, extracted on first use.
+
+        :param index: Page index, starting at 0 (negative indexes count from the end).
+        :return: The page text, "" if the page has none.
+        """
+        if index < 0:
+            index += self.num_pages
+        if index not in self._texts:
+            self._texts[index] = self.backend.page_text(self._handle, index)
+        return self._texts[index]
+
+    def close(self):
+        self.backend.close(self._handle)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
 
 class PdfExtractor(DateRegexExtractor):
@@ -11,51 +64,77 @@ class PdfExtractor(DateRegexExtractor):
     A class to handle PDF reading and extraction of dates using regex patterns.
     """
 
-    def extract_text_from_pdf(self, pdf_path, max_pages=9999999):
+    def __init__(self, text_backend=None, logger=None):
+        """
+        :param text_backend: Engine reading the text layer: "pypdf2", "pymupdf" or "pypdfium2".
+            Defaults to `pdf.text_backend` in config.yaml. Falls back to PyPDF2 if not installed.
+        """
+        if text_backend is None:
+            text_backend = pdf_config.get('text_backend', 'pypdf2')
+        self.backend = get_backend(text_backend, logger)
+
+    def open_document(self, pdf_path, data=None):
+        """
+        Parse a PDF with the configured backend.
+
+        :return: PdfDocument, to be closed by the caller.
+        """
+        return PdfDocument(pdf_path, data, self.backend)
+
+    def iter_page_texts(self, document, max_pages=9999999):
+        """
+        Lazily extract the text of the pages of a document, in order, up to a maximum number of pages.
+
+        :param document: PdfDocument.
+        :return: Generator of strings, one per page with text.
+        """
+        for i in range(min(max_pages, document.num_pages)):
+            text = document.page_text(i)
+            if text:
+                yield text
+
+    def extract_text_from_pdf(self, pdf_path, max_pages=9999999, data=None):
         """
         Read text from a PDF file, up to a maximum number of pages. 
 
         :param pdf_path: Path to the PDF file.
+        :param data: PDF content in memory, read instead of `pdf_path` when given.
         :return: List of strings, one per page, containing the text from each page.
         """
-        texts = []
-        with open(pdf_path, 'rb') as pdf_file:
-            reader = PdfReader(pdf_file)
-            number_of_pages = len(reader.pages)
-            
-            for i in range(min(max_pages, number_of_pages)):
-                page = reader.pages[i]
-                text = page.extract_text()
-                if text:
-                    texts.append(text)
-        return texts
+        with self.open_document(pdf_path, data) as document:
+            return list(self.iter_page_texts(document, max_pages))
 
 
     def extract_date_pattern(self, texts):
         """
         Iterate over the text pages, and return the first sentence that matches a date pattern.
         
-        :param texts: List of strings, one per page, containing the text from each page.
+        :param texts: Iterable of strings, one per page, containing the text from each page.
+            Pages after the first match are not consumed.
         :return: The sentence that matches the date pattern, or None if no date is found.
         """
         for text in texts:
-            sentences = text.split('\n')
-            pattern_id = self.find_date_pattern(sentences)
+            # the whole page is normalized and searched at once
+            with stage("regex"):
+                pattern_id = next(self.iter_page_date_lines(text), None)
             if pattern_id is not None:
-                return sentences[pattern_id].strip()
+                return text.split('\n')[pattern_id].strip()
         return None
 
-    def extract(self, pdf_path, max_pages=9999999):
+    def extract(self, pdf_path, max_pages=9999999, data=None, document=None):
         """
         Main process to extract the date.
 
-        :param pattern: The date pattern to extract.
+        :param max_pages: Maximum number of pages searched, pages are extracted only until a date line is found.
+        :param data: PDF content in memory, read instead of `pdf_path` when given.
+        :param document: Already opened PdfDocument of `pdf_path`, to avoid parsing the file again.
         :return: The date normalized to 'dd/mm/yyyy' format, or None if no date is found.
         """
-        texts = self.extract_text_from_pdf(pdf_path)
-        if not texts:
-            return None
-        date_pattern = self.extract_date_pattern(texts)
+        if document is None:
+            with self.open_document(pdf_path, data) as document:
+                return self.extract(pdf_path, max_pages, data, document)
+
+        date_pattern = self.extract_date_pattern(self.iter_page_texts(document, max_pages))
         if not date_pattern:
             return None
         date = self.extract_and_format_date(date_pattern)
@@ -0,0 +1,170 @@
+import threading
+from abc import ABC, abstractmethod
+from PyPDF2 import PdfReader
+from file_source import open_source
+
+
+class PdfTextBackend(ABC):
+    """
+    Engine reading the text layer of a PDF, behind PdfDocument.
+
+    Subclasses implement open / page_count / page_text / close on their own
+    document handle. Engines other than PyPDF2 are optional dependencies and
+    are only imported when they are used.
+    """
+    name = None
+
+    @abstractmethod
+    def open(self, pdf_path, data=None):
+        """
+        :param pdf_path: Path to the PDF file.
+        :param data: PDF content in memory, read instead of `pdf_path` when given.
+        :return: Backend specific document handle.
+        """
+
+    @abstractmethod
+    def page_count(self, handle):
+        """
+        :return: Number of pages of the document.
+        """
+
+    @abstractmethod
+    def page_text(self, handle, index):
+        """
+        :param index: Page index, starting at 0.
+        :return: The page text with lines separated by '\\n', "" if the page has none.
+        """
+
+    @abstractmethod
+    def close(self, handle):
+        """
+        Release the document handle.
+        """
+
+
+class PyPDF2Backend(PdfTextBackend):
+    """
+    Pure Python, always available. The slowest engine on large or font-heavy documents.
+    """
+    name = "pypdf2"
+
+    def open(self, pdf_path, data=None):
+        file = open_source(pdf_path, data)
+        try:
+            return file, PdfReader(file)
+        except Exception:
+            file.close()
+            raise
+
+    def page_count(self, handle):
+        return len(handle[1].pages)
+
+    def page_text(self, handle, index):
+        return handle[1].pages[index].extract_text() or ""
+
+    def close(self, handle):
+        handle[0].close()
+
+
+class PyMuPDFBackend(PdfTextBackend):
+    """
+    MuPDF (`pip install pymupdf`).
+    """
+    name = "pymupdf"
+    # MuPDF is not thread safe, the executor threads take turns
+    _lock = threading.Lock()
+
+    def __init__(self):
+        try:
+            import pymupdf
+        except ImportError:
+            import fitz as pymupdf  # versions before 1.24
+        self.pymupdf = pymupdf
+
+    def open(self, pdf_path, data=None):
+        with self._lock:
+            if data is not None:
+                return self.pymupdf.open(stream=data, filetype="pdf")
+            return self.pymupdf.open(pdf_path, filetype="pdf")
+
+    def page_count(self, handle):
+        return handle.page_count
+
+    def page_text(self, handle, index):
+        with self._lock:
+            return handle[index].get_text()
+
+    def close(self, handle):
+        with self._lock:
+            handle.close()
+
+
+class PdfiumBackend(PdfTextBackend):
+    """
+    PDFium, the engine of Chrome (`pip install pypdfium2`).
+    """
+    name = "pypdfium2"
+    # PDFium is not thread safe, the executor threads take turns
+    _lock = threading.Lock()
+
+    def __init__(self):
+        import pypdfium2
+        self.pdfium = pypdfium2
+
+    def open(self, pdf_path, data=None):
+        with self._lock:
+            return self.pdfium.PdfDocument(data if data is not None else pdf_path)
+
+    def page_count(self, handle):
+        return len(handle)
+
+    def page_text(self, handle, index):
+        with self._lock:
+            page = handle[index]
+            textpage = page.get_textpage()
+            try:
+                text = textpage.get_text_range()
+            finally:
+                textpage.close()
+                page.close()
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+    def close(self, handle):
+        with self._lock:
+            handle.close()
+
+
+BACKENDS = {backend.name: backend for backend in (PyPDF2Backend, PyMuPDFBackend, PdfiumBackend)}
+DEFAULT_BACKEND = PyPDF2Backend.name
+
+
+def get_backend(name=None, logger=None):
+    """
+    Create a text backend by name, falling back to PyPDF2 if its engine is not installed.
+
+    :param name: "pypdf2", "pymupdf" or "pypdfium2", None for the default.
+    :return: PdfTextBackend.
+    """
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown PDF text backend: {name}. Available: {', '.join(BACKENDS)}")
+    try:
+        return BACKENDS[name]()
+    except ImportError as e:
+        if logger:
+            logger.warning(f"PDF text backend {name} is not installed ({e}), using {DEFAULT_BACKEND}")
+        return BACKENDS[DEFAULT_BACKEND]()
+
+
+def available_backends():
+    """
+    Names of the backends whose engine is installed.
+    """
+    names = []
+    for name, backend in BACKENDS.items():
+        try:
+            backend()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
@@ -2,37 +2,98 @@ from path import Path
 from image_pdf import OcrExtractor
 from pdf import PdfExtractor
 from doc import DocxExtractor
-import PyPDF2
-# import subprocess
+from doc_converter import DocConverterPool
+from model_config import WEIGHTS_PATH
 import os
 import time
 import re
 import sys
+import tempfile
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from config.logging_config import setup_logging
+from config.config import load_config
+from source.timing import stage, set_path
 
 # Initialize the logger
 logger = setup_logging()
+sys_config = load_config().get('sys', {})
+
+# Bump whenever a change to the extraction logic can change results (invalidates cached results)
+PIPELINE_VERSION = "4"
 
 class PipelineExtractor:
-    def __init__(self, max_pdf_pages=10):
-        self.ocr_extractor = OcrExtractor(max_pdf_pages)
-        self.pdf_extractor = PdfExtractor()
+    def __init__(self, max_pdf_pages=10, ocr_pool_workers=None, doc_converter=None, role=None):
+        """
+        :param max_pdf_pages: Maximum number of PDF pages searched per document.
+        :param ocr_pool_workers: OCR worker processes, defaults to `ocr.pool_workers` in config.yaml.
+            0 when this pipeline already runs in a worker process.
+        :param doc_converter: DocConverterPool for .doc files, built from config.yaml when not given.
+        :param role: "all", or "text" to never OCR (torch and paddle are then never imported).
+            Defaults to the DATE_EXTRACTOR_ROLE environment variable, then `sys.role` in config.yaml.
+        """
+        self.role = role or os.environ.get("DATE_EXTRACTOR_ROLE") or sys_config.get('role', 'all')
+        if self.role not in ("all", "text"):
+            raise ValueError(f"Unknown pipeline role: {self.role}")
+        self.ocr_enabled = self.role != "text"
+        self.max_pdf_pages = max_pdf_pages
+        self.ocr_extractor = OcrExtractor(max_pdf_pages, pool_workers=ocr_pool_workers)
+        self.pdf_extractor = PdfExtractor(logger=logger)
         self.docx_extractor = DocxExtractor()
+        self.doc_converter = doc_converter if doc_converter is not None else DocConverterPool(logger=logger)
         self.logger = logger
 
+    @property
+    def version(self):
+        """
+        Identify the pipeline code, settings and OCR weights that produced a result.
+        """
+        weights_path = WEIGHTS_PATH["hand_ocr"]
+        weights = "none"
+        if os.path.exists(weights_path):
+            st = os.stat(weights_path)
+            weights = f"{st.st_size}-{int(st.st_mtime)}"
+        return (f"{PIPELINE_VERSION}:{self.max_pdf_pages}:{self.pdf_extractor.backend.name}:{weights}:{self.role}:"
+                f"{self.ocr_extractor.settings}")
+
+    def warm_up(self):
+        """
+        Load what the first documents would otherwise wait for: the OCR models (unless
+        OCR is disabled) and the .doc converter processes (if LibreOffice is installed).
+
+        :raises Exception: The OCR models failed to load.
+        """
+        start = time.time()
+        if self.ocr_enabled:
+            self.ocr_extractor.warm_up()
+        try:
+            self.doc_converter.start()
+        except Exception as e:
+            # .doc files still work through the direct text extractor, or fail on their own
+            self.logger.warning(f"Could not start the .doc converters: {e}")
+        self.logger.info(f"Pipeline warmed up in {time.time() - start:.2f}s")
+
+    def model_status(self):
+        """
+        :return: Dict with "ready" (the OCR models are loaded or not needed) and details.
+        """
+        if not self.ocr_enabled:
+            return {"ready": True, "role": self.role, "ocr": None}
+        ocr_status = self.ocr_extractor.model_status()
+        return {"ready": ocr_status["ready"], "role": self.role, "ocr": ocr_status}
+
     def check_file_type(self, file_path):
         """
         Check the file type (PDF, DOCX, or DOC).
         """
-        if file_path.lower().endswith(".pdf"):
-            return "pdf"
-        elif file_path.lower().endswith(".docx"):
-            return "docx"
-        elif file_path.lower().endswith(".doc"):
-            return "doc"
-        return None
+        with stage("file_type"):
+            if file_path.lower().endswith(".pdf"):
+                return "pdf"
+            elif file_path.lower().endswith(".docx"):
+                return "docx"
+            elif file_path.lower().endswith(".doc"):
+                return "doc"
+            return None
 
     def check_vietnamese_chars(self, text):
         """
@@ -45,58 +106,150 @@ class PipelineExtractor:
         return bool(re.search(vietnamese_pattern, text))
 
 
-    def check_pdf_type(self, file_path):
+    def check_pdf_type(self, file_path, data=None, document=None):
         """
         Check if a PDF file contains text or is a scanned image.
 
         :param file_path: Path to the PDF file.
+        :param data: PDF content in memory, read instead of `file_path` when given.
+        :param document: Already opened PdfDocument of `file_path`. The page texts
+            extracted here are cached on it and reused by the text extraction.
         :return: 
             - 0 if the text-based PDF 
             - 1 if the scanned image or handwriting PDF.
         """
         try:
-            with open(file_path, 'rb') as pdf_file:
-                reader = PyPDF2.PdfReader(pdf_file)
+            if document is None:
+                with self.pdf_extractor.open_document(file_path, data) as document:
+                    return self.check_pdf_type(file_path, data, document)
 
-                if len(reader.pages) > 0:
-                    first_page = reader.pages[0]
-                    last_page = reader.pages[-1]
-                    text = first_page.extract_text() + last_page.extract_text()
+            with stage("pdf_type"):
+                if document.num_pages > 0:
+                    text = document.page_text(0) + document.page_text(-1)
                     if text.strip() and self.check_vietnamese_chars(text):
                         return 0
-            return 1 
+                return 1 
         except Exception as e:
             self.logger.info(f"Error reading PDF file: {e}")
             return 1
+
+    def extract_pdf(self, file_path, data=None, ocr_fallback=True, text_layer=True, content_hash=None):
+        """
+        Extract the date of a PDF: from its text if it has some, with OCR otherwise.
+        The file is parsed once and shared by the type check, the text extraction and the OCR fallback.
+
+        :param file_path: Path to the PDF file.
+        :param data: PDF content in memory, read instead of `file_path` when given.
+        :param ocr_fallback: False to only read the text layer, e.g. when OCR runs elsewhere.
+            Always False in the "text" role.
+        :param text_layer: False when the text layer was already read without a date (e.g. on
+            another lane of the job API): the file is not parsed again and goes straight to OCR.
+        :param content_hash: SHA-256 of the file if already known (the upload digest), so OCR
+            does not hash it again for the raster cache.
+        :return: Date string or None if not found.
+        """
+        ocr_fallback = ocr_fallback and self.ocr_enabled
+        if not text_layer:
+            return self.ocr_extractor.extract(file_path, data, content_hash=content_hash) if ocr_fallback else None
+        try:
+            with stage("pdf_type"):
+                document = self.pdf_extractor.open_document(file_path, data)
+        except Exception as e:
+            # unreadable for the text backend (damaged, encrypted, ...), the rasterizer may still manage
+            self.logger.info(f"Error reading PDF file: {e}")
+            set_path("ocr")
+            return self.ocr_extractor.extract(file_path, data, content_hash=content_hash) if ocr_fallback else None
+
+        with document:
+            # if pdf is text-based, extract date, if error, extract scanned image (backup)
+            if self.check_pdf_type(file_path, data, document) == 0:
+                set_path("text")
+                with stage("text_extraction"):
+                    date = self.pdf_extractor.extract(file_path, self.max_pdf_pages, data, document)
+                if date is not None:
+                    return date
+                if not ocr_fallback:
+                    return None
+                set_path("fallback")
+            else:
+                set_path("ocr")
+                if not ocr_fallback:
+                    return None
+            # the page count is already known, no need for pdfinfo
+            return self.ocr_extractor.extract(file_path, data, num_pages=document.num_pages,
+                                              content_hash=content_hash)
             
+    def _temp_file(self, suffix):
+        """
+        :return: Path of a new, uniquely named empty file in the temp folder.
+        """
+        temp_dir = sys_config.get('temp_extract_path') or None
+        if temp_dir:
+            os.makedirs(temp_dir, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=temp_dir)
+        os.close(fd)
+        return path
+
     def convert_doc_to_docx(self, input_file):
-        return "hehe.doc" 
-    #     """
-    #     Converts .doc to .docx using unoconv (for macOS/Linux).
-    #     Returns the path to the converted .docx file.
-    #     """
-    #     output_file = input_file.replace(".doc", ".docx")
-        
-    #     # Gọi lệnh chuyển đổi
-    #     result = subprocess.run(
-    #         ['libreoffice', '--headless', '--convert-to', 'docx', input_file, '--outdir', os.path.dirname(input_file)],
-    #         stdout=subprocess.PIPE,
-    #         stderr=subprocess.PIPE
-    #     )
-
-    #     # Kiểm tra xem file có được tạo không
-    #     if os.path.exists(output_file):
-    #         print(f"Converted: {output_file}")
-    #         return output_file
-    #     else:
-    #         print("Error in conversion:", result.stderr.decode())
-    #         raise FileNotFoundError(f"Conversion failed: {input_file} to {output_file}")
-
-    def extract_date(self, file_path):
+        """
+        Converts .doc to .docx on the pool of headless office processes.
+        Returns the path to the converted .docx file, a unique file in the temp folder
+        (never next to the input: that could overwrite a real .docx of the same name).
+
+        :raises DocConversionError: The conversion failed or timed out.
+        """
+        output_file = self._temp_file(".docx")
+        try:
+            return self.doc_converter.convert(input_file, output_file)
+        except BaseException:
+            os.remove(output_file)
+            raise
+
+    def extract_doc(self, file_path, data=None):
+        """
+        Extract the date of a .doc file: from its text read directly (antiword / catdoc)
+        when that finds a date, otherwise from the .docx it converts to.
+
+        :param file_path: Path to the .doc file, converters only work on real files.
+        :param data: File content in memory, written to a temp file first when given.
+        :return: Date string or None if not found.
+        :raises DocConversionError: The conversion failed or timed out.
+        """
+        if data is not None:
+            temp_path = self._temp_file(".doc")
+            try:
+                with open(temp_path, "wb") as f:
+                    f.write(data)
+                return self.extract_doc(temp_path)
+            finally:
+                os.remove(temp_path)
+
+        set_path("doc")
+        with stage("text_extraction"):
+            text = self.doc_converter.extract_text(file_path)
+            if text:
+                date_pattern = self.docx_extractor.extract_date_pattern(text)
+                date = self.docx_extractor.extract_and_format_date(date_pattern) if date_pattern else None
+                if date:
+                    return date
+
+            docx_path = self.convert_doc_to_docx(file_path)
+            try:
+                return self.docx_extractor.extract(docx_path)
+            finally:
+                if os.path.exists(docx_path):
+                    os.remove(docx_path)
+
+    def extract_date(self, file_path, data=None, ocr_fallback=True, text_layer=True, content_hash=None):
         """
         Extract the date from the file metadata.
         
         :param file_path: Path to the file. (docx or pdf)
+            When `data` is given only the file name is used, to tell the file type.
+        :param data: File content in memory, or None to read `file_path` from disk.
+        :param ocr_fallback: False to skip OCR when a PDF has no date in its text layer.
+        :param text_layer: False to OCR a PDF without reading its text layer, see extract_pdf.
+        :param content_hash: SHA-256 of the file if already known, see extract_pdf.
         :return: Date string in 'DD-MM-YYYY' format or None if not found.
         """
         try:
@@ -104,17 +257,13 @@ class PipelineExtractor:
             date = None
             file_type = self.check_file_type(file_path)
             if file_type == "doc":
-                pass
+                date = self.extract_doc(file_path, data)
             elif file_type == "docx":
-                date = self.docx_extractor.extract(file_path)
+                set_path("docx")
+                with stage("text_extraction"):
+                    date = self.docx_extractor.extract(file_path, data)
             elif file_type == "pdf":
-                # if pdf is text-based, extract date, if error, extract scanned image (backup)
-                if self.check_pdf_type(file_path) == 0:
-                    date = self.pdf_extractor.extract(file_path)
-                    if date is None:
-                        date = self.ocr_extractor.extract(file_path)
-                else:
-                    date = self.ocr_extractor.extract(file_path)
+                date = self.extract_pdf(file_path, data, ocr_fallback, text_layer, content_hash)
             elif os.path.isdir(file_path):
                 pass
             else:
@@ -0,0 +1,104 @@
+import os
+import sys
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pdf2image import convert_from_path, pdfinfo_from_path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from source.timing import stage
+
+
+# Poppler only reads files: a document in memory is written to disk once by the caller
+# (file_source.on_disk), not once per call as convert_from_bytes / pdfinfo_from_bytes do.
+
+
+def page_count(file_path, cache=None, content_hash=None):
+    """
+    Number of pages of a PDF, read with pdfinfo without rendering anything.
+
+    :param file_path: Path to the PDF file.
+    :param cache: Optional RasterCache, looked up before running pdfinfo.
+    :param content_hash: Hash of the document, the key in `cache`.
+    """
+    use_cache = cache is not None and content_hash is not None
+    if use_cache:
+        num_pages = cache.get_page_count(content_hash)
+        if num_pages is not None:
+            return num_pages
+
+    with stage("rasterization"):
+        info = pdfinfo_from_path(file_path)
+    num_pages = int(info["Pages"])
+    if use_cache:
+        cache.put_page_count(content_hash, num_pages)
+    return num_pages
+
+
+def render_page(file_path, page_num, dpi=300, cache=None, content_hash=None, mode="RGB"):
+    """
+    Render a single PDF page.
+
+    :param file_path: Path to the PDF file.
+    :param page_num: Page number, starting at 1.
+    :param dpi: Rendering resolution.
+    :param cache: Optional RasterCache. Cached pages skip poppler entirely.
+    :param content_hash: Hash of the document, the key in `cache`.
+    :param mode: "RGB" or "L" (grayscale).
+    :return: The page, or None if the page does not exist. A PIL image without
+        cache, a uint8 array (memory-mapped on a hit) with a cache.
+    """
+    with stage("rasterization"):
+        use_cache = cache is not None and content_hash is not None
+        if use_cache:
+            page = cache.get_page(content_hash, page_num, dpi, mode)
+            if page is not None:
+                return page
+
+        grayscale = mode == "L"
+        images = convert_from_path(file_path, first_page=page_num, last_page=page_num, dpi=dpi, grayscale=grayscale)
+        if not images:
+            return None
+        if use_cache:
+            return cache.put_page(content_hash, page_num, dpi, mode, images[0])
+        return images[0]
+
+
+def iter_pages(file_path, page_numbers, dpi=300, prefetch=1, cache=None, content_hash=None):
+    """
+    Lazily render PDF pages in the given order.
+
+    Pages are rendered one at a time, at most `prefetch` pages ahead of the consumer
+    in a background thread, so stopping early (closing the generator) skips the
+    remaining pages and at most `prefetch + 1` page images are alive at once.
+
+    :param page_numbers: Page numbers to render, starting at 1.
+    :param prefetch: Number of pages rendered ahead, 0 to render on demand only.
+    :param cache: Optional RasterCache, see render_page.
+    :param content_hash: Hash of the document, the key in `cache`.
+    :return: Generator of (page_num, page image).
+    """
+    page_numbers = list(page_numbers)
+    if prefetch <= 0:
+        for page_num in page_numbers:
+            yield page_num, render_page(file_path, page_num, dpi, cache, content_hash)
+        return
+
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="raster")
+    pending = deque()
+    next_index = 0
+    try:
+        while pending or next_index < len(page_numbers):
+            while next_index < len(page_numbers) and len(pending) <= prefetch:
+                page_num = page_numbers[next_index]
+                # in the caller's context, so the render time is charged to its document
+                render = contextvars.copy_context().run
+                pending.append((page_num, pool.submit(render, render_page, file_path, page_num, dpi,
+                                                      cache, content_hash)))
+                next_index += 1
+            page_num, future = pending.popleft()
+            yield page_num, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+        pool.shutdown(wait=False)
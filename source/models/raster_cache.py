@@ -0,0 +1,135 @@
+import os
+import queue
+import threading
+import numpy as np
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from source.storage import sweep_directory, touch
+
+# Finished cache files, the only ones evicted: *.tmp files may be another process's write in progress
+CACHE_FILES = ("*.npy", "pages")
+# Temporary files older than this were left by a crashed writer
+STALE_TMP_SECONDS = 3600
+
+
+class RasterCache:
+    """
+    On-disk cache of rendered PDF pages, keyed by (content hash, page, dpi, colour mode).
+
+    Pages are stored as raw uint8 .npy arrays and read back memory-mapped, so a hit
+    costs neither a poppler subprocess nor a decode. The page count of a document is
+    cached next to its pages. The least recently used entries are evicted once the
+    cache grows over `max_bytes`.
+
+    Writes (and evictions) run on a background thread: put_page only queues the page,
+    and drops it when `queue_size` pages already wait to be written.
+    """
+
+    def __init__(self, path, max_bytes=4 * 1024 * 1024 * 1024, queue_size=4, logger=None):
+        """
+        :param queue_size: Pages waiting for the writer thread, more are not cached.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._bytes = None
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+        os.makedirs(path, exist_ok=True)
+        sweep_directory(path, max_age_seconds=STALE_TMP_SECONDS, pattern="*.tmp")
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = threading.Thread(target=self._run_writer, name="raster-cache-writer", daemon=True)
+        self._writer.start()
+
+    def _file(self, content_hash, name):
+        return os.path.join(self.path, content_hash[:2], content_hash, name)
+
+    def _write(self, file_path, write):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, file_path)
+        self._account(os.path.getsize(file_path))
+
+    def _account(self, size):
+        with self._lock:
+            if self._bytes is None:
+                _, self._bytes = sweep_directory(self.path, pattern=CACHE_FILES)
+            else:
+                self._bytes += size
+            over_budget = self._bytes > self.max_bytes
+        if over_budget:
+            # evict down to 90% so we do not sweep again on the next write
+            removed, remaining = sweep_directory(self.path, max_total_bytes=int(self.max_bytes * 0.9),
+                                                 pattern=CACHE_FILES)
+            with self._lock:
+                self._bytes = remaining
+            if self.logger:
+                self.logger.info(f"Raster cache evicted {removed} files, {remaining} bytes on disk")
+
+    def get_page(self, content_hash, page_num, dpi, mode="RGB"):
+        """
+        :return: The cached page as a read-only memory-mapped uint8 array, or None on a miss.
+        """
+        file_path = self._file(content_hash, f"p{page_num}_{dpi}_{mode}.npy")
+        try:
+            page = np.load(file_path, mmap_mode="r")
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        touch(file_path)
+        self.hits += 1
+        return page
+
+    def _submit(self, file_path, write):
+        try:
+            self._queue.put_nowait((file_path, write))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run_writer(self):
+        while True:
+            file_path, write = self._queue.get()
+            try:
+                self._write(file_path, write)
+            except OSError as e:
+                if self.logger:
+                    self.logger.warning(f"Could not cache {file_path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """
+        Wait until the queued pages are written.
+        """
+        self._queue.join()
+
+    def put_page(self, content_hash, page_num, dpi, mode, image):
+        """
+        Store a rendered page, in the background.
+
+        :param image: PIL image or array of the page.
+        :return: The page as a uint8 array.
+        """
+        page = np.ascontiguousarray(np.asarray(image, dtype=np.uint8))
+        file_path = self._file(content_hash, f"p{page_num}_{dpi}_{mode}.npy")
+        self._submit(file_path, lambda f: np.save(f, page, allow_pickle=False))
+        return page
+
+    def get_page_count(self, content_hash):
+        file_path = self._file(content_hash, "pages")
+        try:
+            with open(file_path, "r") as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def put_page_count(self, content_hash, num_pages):
+        self._submit(self._file(content_hash, "pages"), lambda f: f.write(str(num_pages).encode()))
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "dropped": self.dropped, "disk_bytes": self._bytes}
@@ -0,0 +1,259 @@
+"""
+VietOCR (vgg_seq2seq) recognizer running on ONNX Runtime, for CPU-only nodes.
+
+The PyTorch model is exported in three parts: the VGG feature extractor ("cnn"), the
+bidirectional GRU encoder ("encoder") and one step of the attention GRU decoder
+("decoder"). OnnxRecognizer runs them with the same preprocessing and greedy decoding as
+vietocr's Predictor and has the same predict / predict_batch interface, so Ocr uses either.
+
+The encoder and decoder can also be written with int8 dynamic quantization
+(<part>.int8.onnx), the CNN only on request: its convolutions are most of the compute
+but lose the most accuracy. Check a quantized export with benchmarks/check_vietocr_onnx.py
+before enabling it.
+
+    python source/models/vietocr_onnx.py --output source/weights/vietocr_onnx --quantize
+"""
+import os
+import sys
+import json
+import math
+import argparse
+import numpy as np
+from PIL import Image
+
+PARTS = ("cnn", "encoder", "decoder")
+META_FILE = "meta.json"
+
+# Special tokens of vietocr's Vocab, the characters start at index 4
+PAD, SOS, EOS, MASK = 0, 1, 2, 3
+SPECIAL_TOKENS = {PAD: "<pad>", SOS: "<sos>", EOS: "<eos>", MASK: "*"}
+MAX_SEQ_LENGTH = 128
+
+
+def part_path(folder, part, quantized=False):
+    return os.path.join(folder, f"{part}.int8.onnx" if quantized else f"{part}.onnx")
+
+
+def resize(w, h, expected_height, image_min_width, image_max_width):
+    """
+    Same as vietocr.tool.translate.resize: keep the aspect ratio at the model height,
+    width rounded up to a multiple of 10.
+    """
+    new_w = int(expected_height * float(w) / float(h))
+    new_w = math.ceil(new_w / 10) * 10
+    new_w = max(new_w, image_min_width)
+    new_w = min(new_w, image_max_width)
+    return new_w, expected_height
+
+
+def process_input(image, image_height, image_min_width, image_max_width):
+    """
+    Same as vietocr.tool.translate.process_input, with numpy instead of torch.
+
+    :param image: PIL image of one text line.
+    :return: float32 array of shape (1, 3, image_height, width).
+    """
+    image = image.convert("RGB")
+    w, h = image.size
+    new_w, image_height = resize(w, h, image_height, image_min_width, image_max_width)
+    image = image.resize((new_w, image_height), Image.LANCZOS)
+    image = np.asarray(image).transpose(2, 0, 1).astype(np.float32) / 255
+    return image[np.newaxis]
+
+
+class OnnxRecognizer:
+    def __init__(self, folder, quantized=True, threads=None):
+        """
+        :param folder: Folder written by `export`.
+        :param quantized: Use the int8 parts of the export where there are any.
+        :param threads: Intra-op threads of each session, None for the ONNX Runtime default.
+        """
+        import onnxruntime
+
+        meta_path = os.path.join(folder, META_FILE)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"No VietOCR ONNX export in {folder} (missing {META_FILE})")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        self.image_height = self.meta["image_height"]
+        self.image_min_width = self.meta["image_min_width"]
+        self.image_max_width = self.meta["image_max_width"]
+        self.max_seq_length = self.meta.get("max_seq_length", MAX_SEQ_LENGTH)
+        self.i2c = dict(SPECIAL_TOKENS)
+        self.i2c.update({i + 4: c for i, c in enumerate(self.meta["vocab"])})
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.parts = {}
+        self.sessions = {}
+        for part in PARTS:
+            path = part_path(folder, part, quantized)
+            if not os.path.exists(path):
+                path = part_path(folder, part)
+            self.parts[part] = os.path.basename(path)
+            self.sessions[part] = onnxruntime.InferenceSession(
+                path, options, providers=["CPUExecutionProvider"])
+
+    @property
+    def quantized(self):
+        return any(name.endswith(".int8.onnx") for name in self.parts.values())
+
+    def translate(self, images):
+        """
+        Greedy decoding, same as vietocr.tool.translate.translate.
+
+        :param images: float32 array of shape (batch, 3, height, width), all of one width.
+        :return: int64 array of token ids, shape (batch, steps), starting with SOS.
+        """
+        src = self.sessions["cnn"].run(None, {"img": images})[0]
+        encoder_outputs, hidden = self.sessions["encoder"].run(None, {"src": src})
+
+        tokens = np.full(images.shape[0], SOS, dtype=np.int64)
+        sentences = [tokens]
+        finished = np.zeros(images.shape[0], dtype=bool)
+        for _ in range(self.max_seq_length + 1):
+            output, hidden, _ = self.sessions["decoder"].run(
+                None, {"tgt": tokens, "hidden": hidden, "encoder_outputs": encoder_outputs})
+            tokens = output.argmax(axis=-1).astype(np.int64)
+            sentences.append(tokens)
+            finished |= tokens == EOS
+            if finished.all():
+                break
+        return np.stack(sentences, axis=1)
+
+    def decode(self, ids):
+        """
+        Same as vietocr's Vocab.decode.
+        """
+        ids = list(ids)
+        first = 1 if SOS in ids else 0
+        last = ids.index(EOS) if EOS in ids else None
+        return "".join(self.i2c[i] for i in ids[first:last])
+
+    def _process(self, image):
+        return process_input(image, self.image_height, self.image_min_width, self.image_max_width)
+
+    def predict(self, image):
+        return self.decode(self.translate(self._process(image))[0])
+
+    def predict_batch(self, images):
+        """
+        Recognize several line images, batched by resized width like Predictor.predict_batch.
+        """
+        buckets = {}
+        for index, image in enumerate(images):
+            array = self._process(image)
+            buckets.setdefault(array.shape[-1], []).append((index, array))
+        texts = [None] * len(images)
+        for bucket in buckets.values():
+            ids = self.translate(np.concatenate([array for _, array in bucket]))
+            for (index, _), row in zip(bucket, ids):
+                texts[index] = self.decode(row)
+        return texts
+
+
+def export(predictor, folder, quantize=False, quantize_cnn=False, opset=13):
+    """
+    Export the model of a vietocr Predictor (vgg_seq2seq) to ONNX.
+
+    :param predictor: vietocr.tool.predictor.Predictor with the weights to export.
+    :param folder: Output folder, gets cnn.onnx, encoder.onnx, decoder.onnx and meta.json.
+    :param quantize: Also write int8 dynamically quantized encoder and decoder.
+    :param quantize_cnn: Also write an int8 dynamically quantized CNN.
+    :return: List of the written files.
+    """
+    import torch
+
+    config = predictor.config
+    if config.get("seq_modeling") != "seq2seq":
+        raise ValueError(f"Only seq2seq VietOCR models can be exported, not {config.get('seq_modeling')}")
+
+    os.makedirs(folder, exist_ok=True)
+    model = predictor.model.to("cpu").eval()
+    dataset = config["dataset"]
+    written = []
+
+    with torch.no_grad():
+        # dummy batch of 2 line images; batch size, width and sequence length stay dynamic
+        img = torch.rand(2, 3, dataset["image_height"], 160)
+        src = model.cnn(img)
+        torch.onnx.export(
+            model.cnn, img, part_path(folder, "cnn"), opset_version=opset, do_constant_folding=True,
+            input_names=["img"], output_names=["src"],
+            dynamic_axes={"img": {0: "batch", 3: "width"}, "src": {0: "steps", 1: "batch"}},
+        )
+
+        encoder = model.transformer.encoder
+        encoder_outputs, hidden = encoder(src)
+        torch.onnx.export(
+            encoder, src, part_path(folder, "encoder"), opset_version=opset, do_constant_folding=True,
+            input_names=["src"], output_names=["encoder_outputs", "hidden"],
+            dynamic_axes={"src": {0: "steps", 1: "batch"},
+                          "encoder_outputs": {0: "steps", 1: "batch"},
+                          "hidden": {0: "batch"}},
+        )
+
+        tgt = torch.full((2,), SOS, dtype=torch.long)
+        torch.onnx.export(
+            model.transformer.decoder, (tgt, hidden, encoder_outputs), part_path(folder, "decoder"),
+            opset_version=opset, do_constant_folding=True,
+            input_names=["tgt", "hidden", "encoder_outputs"],
+            output_names=["output", "hidden_out", "attention"],
+            dynamic_axes={"tgt": {0: "batch"}, "hidden": {0: "batch"},
+                          "encoder_outputs": {0: "steps", 1: "batch"},
+                          "output": {0: "batch"}, "hidden_out": {0: "batch"},
+                          "attention": {0: "batch", 1: "steps"}},
+        )
+    written += [part_path(folder, part) for part in PARTS]
+
+    quantized = []
+    if quantize or quantize_cnn:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        parts = (["cnn"] if quantize_cnn else []) + (["encoder", "decoder"] if quantize else [])
+        for part in parts:
+            quantize_dynamic(part_path(folder, part), part_path(folder, part, quantized=True),
+                             weight_type=QuantType.QInt8)
+            written.append(part_path(folder, part, quantized=True))
+            quantized.append(part)
+
+    meta = {
+        "vocab": config["vocab"],
+        "image_height": dataset["image_height"],
+        "image_min_width": dataset["image_min_width"],
+        "image_max_width": dataset["image_max_width"],
+        "max_seq_length": MAX_SEQ_LENGTH,
+        "quantized": quantized,
+        "opset": opset,
+        "weights": config.get("weights"),
+    }
+    with open(os.path.join(folder, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    written.append(os.path.join(folder, META_FILE))
+    return written
+
+
+def main():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from ocr import build_torch_vietocr
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=os.path.join("source", "weights", "vietocr_onnx"),
+                        help="Folder to write the ONNX models to (ocr.onnx_path in config.yaml)")
+    parser.add_argument("--quantize", action="store_true", help="Also write int8 encoder and decoder")
+    parser.add_argument("--quantize-cnn", action="store_true", help="Also write an int8 CNN")
+    parser.add_argument("--opset", type=int, default=13)
+    args = parser.parse_args()
+
+    predictor = build_torch_vietocr(device="cpu")
+    for path in export(predictor, args.output, args.quantize, args.quantize_cnn, args.opset):
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import os
+import time
+from pathlib import Path
+
+
+def sweep_directory(folder, max_age_seconds=None, max_total_bytes=None, pattern="*"):
+    """
+    Keep a folder of cached / temporary files within an age and size budget.
+
+    Files older than `max_age_seconds` are deleted first, then the least recently
+    used files (oldest mtime, readers refresh it on use) until the folder holds at
+    most `max_total_bytes`. Empty sub-folders left behind are removed.
+
+    :param folder: Folder to sweep, searched recursively.
+    :param max_age_seconds: Maximum file age, None for no age limit.
+    :param max_total_bytes: Maximum total size, None for no size limit.
+    :param pattern: Glob pattern of the files managed by the sweep, or a tuple of patterns.
+    :return: Tuple (number of removed files, bytes remaining).
+    """
+    folder = Path(folder)
+    if not folder.exists():
+        return 0, 0
+
+    now = time.time()
+    removed = 0
+    entries = []
+    patterns = (pattern,) if isinstance(pattern, str) else pattern
+    for path in {path for glob in patterns for path in folder.rglob(glob)}:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        if not path.is_file():
+            continue
+        if max_age_seconds is not None and now - st.st_mtime > max_age_seconds:
+            if _remove(path):
+                removed += 1
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    if max_total_bytes is not None and total > max_total_bytes:
+        entries.sort(key=lambda entry: entry[0])
+        for _, size, path in entries:
+            if total <= max_total_bytes:
+                break
+            if _remove(path):
+                removed += 1
+                total -= size
+
+    for sub_folder in sorted((p for p in folder.rglob("*") if p.is_dir()), reverse=True):
+        try:
+            sub_folder.rmdir()
+        except OSError:
+            pass  # not empty
+    return removed, total
+
+
+def touch(path):
+    """
+    Mark a cached file as recently used for sweep_directory.
+    """
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def _remove(path):
+    try:
+        path.unlink()
+        return True
+    except OSError:
+        return False
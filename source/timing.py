@@ -0,0 +1,126 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Stages timed through the pipeline, in processing order
+STAGES = (
+    "file_type",        # check_file_type
+    "pdf_type",         # text layer or scanned image
+    "text_extraction",  # PDF text layer, DOCX XML, .doc text / conversion
+    "rasterization",    # poppler rendering (or raster cache reads)
+    "detection",        # PaddleOCR text detection
+    "angle_cls",        # PaddleOCR angle classification
+    "paddle_rec",       # PaddleOCR printed text recognition
+    "vietocr",          # VietOCR recognition of the date line
+    "regex",            # date line search and date parsing
+)
+
+_current = contextvars.ContextVar("stage_timings", default=None)
+# [seconds spent in nested stages] of the innermost running stage, subtracted from its own time
+_enclosing = contextvars.ContextVar("enclosing_stage", default=None)
+
+
+class StageTimings:
+    """
+    Seconds spent per pipeline stage for one document, and the path it took.
+
+    path is "text" (PDF text layer), "ocr" (scanned PDF), "fallback" (text PDF without
+    a date in its text, OCR-ed), "docx", "doc" or None. Stages may run in several threads
+    (page prefetch), so `add` is locked.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.path = None
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def merge(self, stages):
+        """
+        Add the stage times measured elsewhere, e.g. in an OCR worker process.
+        """
+        for stage, seconds in (stages or {}).items():
+            self.add(stage, seconds)
+
+    def get(self, *stages):
+        """
+        :return: Total seconds of the given stages, None if none of them ran.
+        """
+        with self._lock:
+            times = [self.stages[stage] for stage in stages if stage in self.stages]
+        return round(sum(times), 4) if times else None
+
+    def to_dict(self):
+        with self._lock:
+            return {stage: round(seconds, 4) for stage, seconds in self.stages.items()}
+
+
+@contextmanager
+def collect(timings=None):
+    """
+    Record the stage times of the code run inside the block (and of the threads it
+    starts with copy_context) into `timings`.
+
+    :return: The StageTimings, a new one if none is given.
+    """
+    timings = timings if timings is not None else StageTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def current():
+    """
+    :return: The StageTimings being collected, or None outside of collect().
+    """
+    return _current.get()
+
+
+@contextmanager
+def stage(name):
+    """
+    Time the block as stage `name`. Costs next to nothing outside of collect().
+
+    Stages may nest (e.g. regex inside text extraction): a stage is charged its own
+    time only, without the time of the stages run inside it.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    parent = _enclosing.get()
+    nested = [0.0]
+    token = _enclosing.set(nested)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _enclosing.reset(token)
+        timings.add(name, elapsed - nested[0])
+        if parent is not None:
+            parent[0] += elapsed
+
+
+def record(name, seconds):
+    """
+    Charge `seconds` measured elsewhere (e.g. by PaddleOCR itself) to stage `name`.
+    """
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+        parent = _enclosing.get()
+        if parent is not None:
+            parent[0] += seconds
+
+
+def set_path(path):
+    timings = _current.get()
+    if timings is not None:
+        timings.path = path
@@ -0,0 +1,48 @@
+import os
+import sys
+import inspect
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def fake_main(monkeypatch):
+    """
+    The main module with run_pipeline replaced by a fake and the result cache bypassed.
+
+    The fake reads the date from the document itself: its content is the date, or
+    "scan:<date>" for a PDF without a date in its text layer, found only with OCR.
+
+    :return: Tuple (main module, list of (filename, ocr_fallback, text_layer) run_pipeline calls).
+    """
+    monkeypatch.chdir(ROOT)  # config/config.yaml is read relative to the repo root
+    import main
+
+    calls = []
+
+    def run_pipeline(upload, ocr_fallback=True, timings=None, text_layer=True):
+        calls.append((upload.filename, ocr_fallback, text_layer))
+        # the document must still be readable when the worker gets it
+        data = upload.data if upload.data is not None else open(upload.path, "rb").read()
+        text = data.decode().strip()
+        if text.startswith("scan:"):
+            return text[len("scan:"):] if ocr_fallback else None
+        return text or None
+
+    async def get_or_compute(key, compute):
+        return await compute()
+
+    assert inspect.signature(run_pipeline) == inspect.signature(main.run_pipeline)
+    monkeypatch.setattr(main, "run_pipeline", run_pipeline)
+    monkeypatch.setattr(main.result_cache, "get_or_compute", get_or_compute)
+    return main, calls
+
+
+@pytest.fixture
+def client(fake_main):
+    from fastapi.testclient import TestClient
+
+    return TestClient(fake_main[0].app)
@@ -0,0 +1,41 @@
+import io
+import json
+import zipfile
+
+
+def post_batch(client, files):
+    response = client.post("/contracts/batch", files=[("files", file) for file in files])
+    assert response.status_code == 200
+    return {result["filename"]: result for result in map(json.loads, response.text.splitlines())}
+
+
+def test_batch_plain_files(client):
+    results = post_batch(client, [
+        ("a.pdf", b"01/02/2023", "application/pdf"),
+        ("b.docx", b"03/04/2024", "application/octet-stream"),
+    ])
+    assert results["a.pdf"]["status_code"] == 200
+    assert results["a.pdf"]["data"] == "01/02/2023"
+    assert results["b.docx"]["data"] == "03/04/2024"
+
+
+def test_batch_zip_and_plain_files(client):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("inner/c.pdf", "05/06/2022")
+    results = post_batch(client, [
+        ("a.pdf", b"01/02/2023", "application/pdf"),
+        ("docs.zip", archive.getvalue(), "application/zip"),
+    ])
+    assert results["a.pdf"]["data"] == "01/02/2023"
+    assert results["inner/c.pdf"]["data"] == "05/06/2022"
+
+
+def test_batch_zip_member_over_limit(client, fake_main, monkeypatch):
+    main, _ = fake_main
+    monkeypatch.setattr(main, "batch_max_member_bytes", 1024)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("big.pdf", b"0" * 1024 * 1024)
+    results = post_batch(client, [("docs.zip", archive.getvalue(), "application/zip")])
+    assert results["big.pdf"]["status_code"] == 400
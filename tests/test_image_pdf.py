@@ -0,0 +1,61 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "source", "models"))
+
+import image_pdf
+
+
+def test_pdf_in_memory_is_written_to_disk_once(monkeypatch, tmp_path):
+    monkeypatch.setattr(image_pdf, "temp_folder", str(tmp_path))
+    paths = []
+
+    def page_count(file_path, cache=None, content_hash=None):
+        paths.append(file_path)
+        with open(file_path, "rb") as f:
+            assert f.read() == b"%PDF-1.4"
+        return 2
+
+    def iter_pages(file_path, page_numbers, **kwargs):
+        paths.append(file_path)
+        for page_num in page_numbers:
+            yield page_num, None
+
+    def ocr_page(file_path, page_num, num_pages, page_image, content_hash=None, orientation=None):
+        paths.append(file_path)
+        return None, []
+
+    monkeypatch.setattr(image_pdf, "page_count", page_count)
+    monkeypatch.setattr(image_pdf, "iter_pages", iter_pages)
+    extractor = image_pdf.OcrExtractor(pool_workers=0, raster_cache=None)
+    monkeypatch.setattr(extractor, "ocr_page", ocr_page)
+
+    assert extractor.extract_with_strategy("a.pdf", b"%PDF-1.4") == (None, [])
+    # pdfinfo, the renderer and both pages all read the same file, removed afterwards
+    assert len(paths) == 4 and len(set(paths)) == 1
+    assert not os.path.exists(paths[0])
+
+
+def test_blank_roi_band_falls_through_to_the_full_page(monkeypatch):
+    extractor = image_pdf.OcrExtractor(pool_workers=0, raster_cache=None, roi_bands={"first": [0.0, 0.35]})
+    results = {"band": "Blank date", "page": "01/02/2023"}
+    monkeypatch.setattr(extractor, "process_single_page_pdf",
+                        lambda *args, band=None, **kwargs: results["band" if band else "page"])
+
+    assert extractor.ocr_page("a.pdf", 1, 3, None) == ("01/02/2023", [("roi_first", False), ("page_first", True)])
+
+    results["band"] = "05/06/2024"
+    assert extractor.ocr_page("a.pdf", 1, 3, None) == ("05/06/2024", [("roi_first", True)])
+
+
+def test_known_digest_is_not_computed_again(monkeypatch):
+    keys = []
+    monkeypatch.setattr(image_pdf, "get_content_hash", lambda *args: "computed")
+    monkeypatch.setattr(image_pdf, "page_count", lambda file_path, cache=None, content_hash=None: keys.append(content_hash) or 0)
+    extractor = image_pdf.OcrExtractor(pool_workers=0, raster_cache=object())
+
+    extractor.extract_with_strategy("a.pdf", b"%PDF-1.4", content_hash="upload-sha256")
+    extractor.extract_with_strategy("a.pdf", b"%PDF-1.4")
+    assert keys == ["upload-sha256", "computed"]
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+
+class Upload:
+    def __init__(self, filename, data):
+        self.filename = filename
+        self.file_path = filename
+        self.path = None
+        self.data = data
+        self.size = len(data)
+        self.sha256 = filename
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def submit(fake_main):
+    main, calls = fake_main
+
+    def run(filename, data):
+        # same steps as POST /jobs, then the background part
+        upload = Upload(filename, data)
+        lane = main.choose_lane(upload)
+        main.lanes.reserve(lane)
+        job = main.jobs.create(filename, lane)
+        asyncio.run(main.run_job(job, upload))
+        return job
+    return run, calls
+
+
+def test_doc_runs_on_its_own_lane(submit):
+    submit, calls = submit
+    job = submit("a.doc", b"01/02/2023")
+    assert job.result["data"] == "01/02/2023"
+    assert job.lane == "doc"
+    assert calls == [("a.doc", True, True)]
+
+
+def test_pdf_is_classified_on_the_fast_lane_once(submit):
+    submit, calls = submit
+    job = submit("scan.pdf", b"scan:01/02/2023")
+    assert job.result["data"] == "01/02/2023"
+    assert job.lane == "ocr"
+    # text layer on the fast lane, then OCR only
+    assert calls == [("scan.pdf", False, True), ("scan.pdf", True, False)]
@@ -0,0 +1,85 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "source", "models"))
+
+import ocr
+import image_pdf
+
+
+class FakeClassifier:
+    def __init__(self, label):
+        self.label = label
+        self.calls = 0
+
+    def __call__(self, crops):
+        self.calls += 1
+        return crops, [(self.label, 0.9)] * len(crops), 0.0
+
+
+class FakePaddle:
+    """
+    The parts of PaddleOCR's text system Ocr calls: detection, and the angle classifier.
+    """
+
+    def __init__(self, label):
+        self.text_classifier = FakeClassifier(label)
+        self.detections = []
+
+    def __call__(self, image, cls):
+        self.detections.append((image.copy(), cls))
+        box = np.array([[10, 10], [150, 10], [150, 40], [10, 40]], dtype=float)
+        return [box], [("ngày 01 tháng 02 năm 2023", 0.9)], {"det": 0.0}
+
+
+@pytest.fixture
+def extractor(monkeypatch):
+    def build(label):
+        paddle = FakePaddle(label)
+        page_ocr = ocr.Ocr(logger=image_pdf.logger, orientation="per_document")
+        monkeypatch.setattr(ocr.Ocr, "paddle_ocr", property(lambda self: paddle))
+        processed = []
+        monkeypatch.setattr(page_ocr, "process_page", lambda **kwargs: processed.append(kwargs))
+        monkeypatch.setattr(image_pdf, "_ocr", page_ocr)
+        ocr_extractor = image_pdf.OcrExtractor(pool_workers=0, recognition_dpi=300, detection_dpi=300,
+                                               roi_bands={}, raster_cache=None)
+        return ocr_extractor, paddle, processed
+    return build
+
+
+def page():
+    image = np.zeros((300, 200), dtype=np.uint8)
+    image[0, 0] = 255  # top left, bottom right once rotated by 180 degrees
+    return image
+
+
+def test_upright_document_reuses_the_first_detection(extractor):
+    ocr_extractor, paddle, processed = extractor("0")
+    orientation = {"angle": None}
+    ocr_extractor.process_single_page_pdf("a.pdf", 0, page(), orientation=orientation)
+    ocr_extractor.process_single_page_pdf("a.pdf", 1, page(), orientation=orientation)
+
+    assert orientation == {"angle": 0}
+    assert [cls for _, cls in paddle.detections] == [False]
+    assert paddle.text_classifier.calls == 1
+    assert processed[0]["detection_results"] is not None
+    assert processed[1]["detection_results"] is None
+    assert not processed[0]["cls"] and not processed[1]["cls"]
+
+
+def test_upside_down_document_is_rotated_and_detected_again(extractor):
+    ocr_extractor, paddle, processed = extractor("180")
+    orientation = {"angle": None}
+    ocr_extractor.process_single_page_pdf("a.pdf", 0, page(), orientation=orientation)
+    ocr_extractor.process_single_page_pdf("a.pdf", 1, page(), orientation=orientation)
+
+    assert orientation == {"angle": 180}
+    assert paddle.text_classifier.calls == 1
+    # page 1 detected once upright for the vote, then detected again by process_page
+    assert [call["detection_results"] for call in processed] == [None, None]
+    assert all(call["page_image"][-1, -1] == 255 for call in processed)
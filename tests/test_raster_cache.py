@@ -0,0 +1,34 @@
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "source", "models"))
+
+from raster_cache import RasterCache
+
+
+def test_pages_are_written_in_the_background(tmp_path):
+    cache = RasterCache(str(tmp_path))
+    page = np.full((20, 10, 3), 7, dtype=np.uint8)
+    assert cache.put_page("abcd", 1, 300, "RGB", page) is not None
+    cache.put_page_count("abcd", 3)
+    cache.flush()
+
+    assert np.array_equal(cache.get_page("abcd", 1, 300, "RGB"), page)
+    assert cache.get_page_count("abcd") == 3
+
+
+def test_eviction_leaves_writes_in_progress_alone(tmp_path):
+    cache = RasterCache(str(tmp_path), max_bytes=1000)
+    in_progress = tmp_path / "ab" / "abcd" / "p2_300_RGB.npy.123.456.tmp"
+    in_progress.parent.mkdir(parents=True)
+    in_progress.write_bytes(b"\0" * 5000)
+
+    cache.put_page("abcd", 1, 300, "RGB", np.zeros((40, 40, 3), dtype=np.uint8))
+    cache.flush()
+
+    assert in_progress.exists()
+    assert cache.get_page("abcd", 1, 300, "RGB") is None  # over budget on its own, evicted
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import asyncio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from service.result_cache import ResultCache
+
+
+def test_none_is_cached_until_its_ttl(tmp_path, monkeypatch):
+    cache = ResultCache(disk_path=str(tmp_path), negative_ttl_seconds=60)
+    calls = []
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+
+    async def compute():
+        calls.append(1)
+        return None if len(calls) == 1 else "01/02/2023"
+
+    async def get():
+        return await cache.get_or_compute("key", compute)
+
+    assert asyncio.run(get()) is None
+    assert asyncio.run(get()) is None
+    assert ResultCache(disk_path=str(tmp_path))._get_disk("key") == (True, None)
+    assert len(calls) == 1
+
+    now[0] += 61
+    assert ResultCache(disk_path=str(tmp_path))._get_disk("key") == (False, None)
+    assert asyncio.run(get()) == "01/02/2023"
+    now[0] += 3600
+    assert asyncio.run(get()) == "01/02/2023"
+    assert len(calls) == 2
+    assert ResultCache(disk_path=str(tmp_path))._get_disk("key") == (True, "01/02/2023")
+
+
+def test_none_is_not_cached_without_a_ttl(tmp_path):
+    cache = ResultCache(disk_path=str(tmp_path), negative_ttl_seconds=0)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return None
+
+    async def run():
+        await cache.get_or_compute("key", compute)
+        await cache.get_or_compute("key", compute)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+    assert not os.listdir(tmp_path)
+
+
+def test_waiter_takes_over_a_cancelled_computation():
+    cache = ResultCache()
+    started = []
+
+    async def compute():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return "01/02/2023"
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(run()) == "01/02/2023"
+    assert len(started) == 2